@@ -4,11 +4,27 @@ Provides the ability to execute batches of operations using yield
 statements.  See the comments for BatchExecutor.execute.
 """
 
+from batching_analyzer import BatchingAnalyzer
+from caching_batcher import CachedOperation
+from caching_batcher import CachingBatcher
+from chrome_trace_tracer import ChromeTraceTracer
+from coalescing_executor import CoalescingBatchExecutor
 from decorators import cached_generator
 from executor import BatchExecutor
 from gen_result import GenResult
 from gen_utils import GenUtils
 from generator_cache import GeneratorCache
+from lru_cache import LruCache
+from operation import AsyncBatcher
 from operation import BatchableOperation
 from operation import Batcher
+from operation_error import OperationError
+from retry_policy import RetryPolicy
+from scheduler import BatchScheduler
+from scheduler import BatcherPriorityScheduler
+from scheduler import CriticalPathScheduler
+from scheduler import LargestBatchFirstScheduler
 from shared_generator import SharedGenerator
+from trace_collector import Histogram
+from trace_collector import TraceCollector
+from tracer import Tracer
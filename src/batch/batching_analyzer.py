@@ -0,0 +1,170 @@
+from operation import BatchableOperation
+from tracer import Tracer
+
+
+class BatchingAnalyzer(Tracer):
+    """A Tracer that reports patterns that cost extra rounds of batches.
+
+    BatchingAnalyzer records the generators and BatchableOperations that
+    each generator yields, and it looks for three patterns that tend to
+    increase the number of round trips to the data stores:
+
+    - A generator yields BatchableOperations, then yields more
+      BatchableOperations in its next iteration, as in
+      "a = yield X; b = yield Y".  If X and Y are independent, yielding
+      them together as in "a, b = yield X, Y" saves a round trip.  We
+      cannot tell whether the operations are independent, so we report
+      these as candidates to review.
+    - A generator calls BatchExecutor.execute or a similar method,
+      starting a nested execution whose operations are not batched
+      with those of the outer execution.  We only detect this when the
+      nested execution starts during an iteration of a generator that
+      the outer execution is running.
+    - A Batcher executes several small batches in the same execution,
+      which suggests that the operations were not yielded together.
+
+    We estimate the number of round trips that each generator added as
+    the number of times it yielded generators or BatchableOperations,
+    minus one.  We identify generator functions by their names and
+    Batchers by their class names, and we aggregate the statistics
+    across all of the executions in which we use the analyzer.
+
+    Public attributes:
+
+    dict<basestring, int> generator_counts - A map from the names of the
+        generator functions to the number of generators for the
+        function that yielded generators or BatchableOperations.
+    dict<basestring, int> nested_execute_counts - A map from the names
+        of the generator functions to the number of nested executions
+        that their generators started.
+    dict<basestring, int> round_trip_counts - A map from the names of
+        the generator functions to the estimated number of round trips
+        that their generators added.
+    dict<basestring, int> sequential_yield_counts - A map from the names
+        of the generator functions to the number of times one of their
+        generators yielded only BatchableOperations after yielding only
+        BatchableOperations in its previous iteration.
+    dict<basestring, int> small_batch_counts - A map from the names of
+        the Batcher classes to the number of small batches they executed
+        in executions in which they executed more than one batch.
+    """
+
+    # Private attributes:
+    # dict<basestring, list<int>> _batch_sizes - A map from the names of
+    #     the Batcher classes that executed batches in the current
+    #     execution to the numbers of operations in their batches.
+    # int _execute_depth - The number of executions using the analyzer
+    #     that are running, including nested executions.
+    # dict<Generator, bool> _generator_states - A map from each
+    #     generator that yielded generators or BatchableOperations in
+    #     the current execution to whether its most recent yield
+    #     consisted only of BatchableOperations.
+    # int _small_batch_size - The maximum number of operations in a
+    #     small batch.
+
+    def __init__(self, small_batch_size=3):
+        """Initialize a BatchingAnalyzer.
+
+        int small_batch_size - The maximum number of operations in a
+            batch that we regard as small.
+        """
+        self._small_batch_size = small_batch_size
+        self._execute_depth = 0
+        self._generator_states = {}
+        self._batch_sizes = {}
+        self.generator_counts = {}
+        self.round_trip_counts = {}
+        self.sequential_yield_counts = {}
+        self.nested_execute_counts = {}
+        self.small_batch_counts = {}
+
+    @staticmethod
+    def _increment(counts, name):
+        """Increment the count for the specified name in "counts"."""
+        counts[name] = counts.get(name, 0) + 1
+
+    def execute_started(self):
+        self._execute_depth += 1
+
+    def execute_finished(self, exception_info):
+        self._execute_depth -= 1
+        if self._execute_depth:
+            return
+        for name, sizes in self._batch_sizes.iteritems():
+            if len(sizes) > 1:
+                small_count = len([
+                    size for size in sizes if size <= self._small_batch_size])
+                if small_count:
+                    self.small_batch_counts[name] = (
+                        self.small_batch_counts.get(name, 0) + small_count)
+        self._batch_sizes = {}
+        self._generator_states = {}
+
+    def batch_started(self, batcher, operation_count):
+        self._batch_sizes.setdefault(
+            batcher.__class__.__name__, []).append(operation_count)
+
+    def generator_yielded(self, generator, generators_and_operations):
+        if not generators_and_operations:
+            return
+        name = generator.gi_code.co_name
+        is_operations = all(
+            isinstance(generator_or_operation, BatchableOperation)
+            for generator_or_operation in generators_and_operations)
+        was_operations = self._generator_states.get(generator)
+        if was_operations is None:
+            BatchingAnalyzer._increment(self.generator_counts, name)
+        else:
+            BatchingAnalyzer._increment(self.round_trip_counts, name)
+            if was_operations and is_operations:
+                BatchingAnalyzer._increment(
+                    self.sequential_yield_counts, name)
+        self._generator_states[generator] = is_operations
+
+    def nested_execute_started(self, generator):
+        BatchingAnalyzer._increment(
+            self.nested_execute_counts, generator.gi_code.co_name)
+
+    def ranked_generators(self):
+        """Return the generator functions that added round trips.
+
+        return list<tuple<basestring, int>> - The pairs consisting of
+            the name of each generator function that added round trips
+            or started nested executions and the estimated number of
+            round trips it added, in decreasing order of the number of
+            round trips.  We count each nested execution as one round
+            trip, although it may have taken several.
+        """
+        counts = dict(self.round_trip_counts)
+        for name, count in self.nested_execute_counts.iteritems():
+            counts[name] = counts.get(name, 0) + count
+        return sorted(
+            counts.iteritems(), key=lambda item: (-item[1], item[0]))
+
+    def format(self):
+        """Return a human-readable report of the patterns we observed.
+
+        return str - A table with one row per generator function that
+            added round trips, in decreasing order of the number of
+            round trips, followed by a table with one row per Batcher
+            class that executed small batches.
+        """
+        lines = [
+            '{:<30s}{:>12s}{:>12s}{:>12s}{:>12s}'.format(
+                'generator', 'generators', 'round trips', 'sequential',
+                'nested')]
+        for name, count in self.ranked_generators():
+            lines.append(
+                '{:<30s}{:>12d}{:>12d}{:>12d}{:>12d}'.format(
+                    name, self.generator_counts.get(name, 0), count,
+                    self.sequential_yield_counts.get(name, 0),
+                    self.nested_execute_counts.get(name, 0)))
+        if self.small_batch_counts:
+            lines.append('')
+            lines.append(
+                '{:<30s}{:>12s}'.format('batcher', 'small batches'))
+            for name, count in sorted(
+                    self.small_batch_counts.iteritems(),
+                    key=lambda item: (-item[1], item[0])):
+                lines.append('{:<30s}{:>12d}'.format(name, count))
+        return '\n'.join(lines)
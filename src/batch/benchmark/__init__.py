@@ -0,0 +1,5 @@
+"""Benchmarks for measuring the overhead of batch execution.
+
+Run "python -m batch.benchmark --help" from the src directory for
+usage instructions.
+"""
@@ -0,0 +1,99 @@
+"""Measures the overhead of calling functions decorated with cached_generator.
+
+Each call to such a function computes a cache key from the arguments.
+We report the time per call, in nanoseconds, for repeated calls with
+hashable arguments, using the fast path that uses the arguments as
+they are; with hashable arguments, converting them using
+_to_hashable_value as for collections; with collection arguments; and
+with collection arguments and a "key" function.  Run
+"python -m batch.benchmark.decorator_benchmark --help" from the src
+directory for usage instructions.
+"""
+
+import argparse
+import timeit
+
+from batch import cached_generator
+from batch import GenResult
+from batch.decorators import _to_hashable_value
+from operation import BenchmarkOperation
+
+
+def _gen_value(value):
+    result = yield BenchmarkOperation(value)
+    yield GenResult(result)
+
+
+@cached_generator
+def _gen_hashable(value, label='foo'):
+    return _gen_value(value)
+
+
+@cached_generator(key=lambda *args, **kwargs: _to_hashable_value(
+    (args, kwargs)))
+def _gen_hashable_converted(value, label='foo'):
+    return _gen_value(value)
+
+
+@cached_generator
+def _gen_collection(values, label='foo'):
+    return _gen_value(len(values))
+
+
+@cached_generator(key=lambda values, label='foo': (tuple(values), label))
+def _gen_collection_with_key(values, label='foo'):
+    return _gen_value(len(values))
+
+
+def _measure(func, args_list, repeat):
+    """Return the fastest time per call to a function, in nanoseconds.
+
+    callable func - The function.
+    list<tuple> args_list - The positional arguments for each call.
+    int repeat - The number of times to call the function for each
+        element of args_list.
+    return float - The time per call.
+    """
+    best_seconds = None
+    for _ in xrange(repeat):
+        start = timeit.default_timer()
+        for args in args_list:
+            func(*args, label='bar')
+        seconds = timeit.default_timer() - start
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+    return 1e9 * best_seconds / len(args_list)
+
+
+def main():
+    """Run the benchmark using the command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Measure the time to compute cached_generator cache '
+        'keys.')
+    parser.add_argument(
+        '--calls', type=int, default=100000,
+        help='The number of calls for each measurement')
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help='The number of times to repeat each measurement.  We report '
+        'the fastest.')
+    args = parser.parse_args()
+
+    int_args = list([(index % 100,) for index in xrange(args.calls)])
+    list_args = list([
+        ([index % 100, index % 7, index % 3],)
+        for index in xrange(args.calls)])
+    measurements = [
+        ('hashable args', _gen_hashable, int_args),
+        ('hashable args, converted', _gen_hashable_converted, int_args),
+        ('collection args', _gen_collection, list_args),
+        ('collection args, key', _gen_collection_with_key, list_args),
+    ]
+    print '{:<30s}{:>12s}'.format('arguments', 'ns/call')
+    for name, func, args_list in measurements:
+        print '{:<30s}{:>12.0f}'.format(
+            name, _measure(func, args_list, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
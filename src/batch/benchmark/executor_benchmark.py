@@ -0,0 +1,152 @@
+from batch import cached_generator
+from batch import GenResult
+from batch import GeneratorCache
+from batch import SharedGenerator
+from operation import BenchmarkOperation
+
+
+class Benchmark(object):
+    """A benchmark that executes a synthetic batch generator DAG.
+
+    Public attributes:
+
+    final basestring description - A description of the DAG's shape.
+    final basestring name - The name of the benchmark.
+    """
+
+    # Private attributes:
+    # callable _create_root - A function that returns a pair consisting
+    #     of the root batch generator to execute and the number of
+    #     generators and BatchableOperations in its DAG.
+
+    def __init__(self, name, description, create_root):
+        self.name = name
+        self.description = description
+        self._create_root = create_root
+
+    def create_root(self):
+        """Return a new root batch generator for the benchmark.
+
+        return tuple<Generator, int> - A pair consisting of the root
+            and the number of generators and BatchableOperations that
+            executing it produces.  We use the number to compute the
+            time per node.
+        """
+        return self._create_root()
+
+
+def _gen_leaf(value):
+    result = yield BenchmarkOperation(value)
+    yield GenResult(result)
+
+
+def _gen_wide_fan_out(width):
+    results = yield list([_gen_leaf(index) for index in xrange(width)])
+    yield GenResult(sum(results))
+
+
+def _create_wide_fan_out():
+    width = 20000
+    return _gen_wide_fan_out(width), 2 * width + 1
+
+
+def _gen_deep_chain(depth):
+    value = yield BenchmarkOperation(depth)
+    if depth > 1:
+        value += yield _gen_deep_chain(depth - 1)
+    yield GenResult(value)
+
+
+def _create_deep_chain():
+    depth = 5000
+    return _gen_deep_chain(depth), 2 * depth
+
+
+def _gen_fan_in_child(shared_generator, value):
+    results = yield (shared_generator.gen(), BenchmarkOperation(value))
+    yield GenResult(sum(results))
+
+
+def _gen_fan_in(width):
+    shared_generator = SharedGenerator(_gen_leaf(0))
+    results = yield list([
+        _gen_fan_in_child(shared_generator, index) for index in xrange(width)])
+    yield GenResult(sum(results))
+
+
+def _create_fan_in():
+    width = 10000
+    return _gen_fan_in(width), 3 * width + 4
+
+
+class _BenchmarkError(Exception):
+    pass
+
+
+def _gen_raise_after_operation(value):
+    yield BenchmarkOperation(value)
+    raise _BenchmarkError()
+
+
+def _gen_catch(value):
+    try:
+        yield _gen_raise_after_operation(value)
+    except _BenchmarkError:
+        yield GenResult(1)
+
+
+def _gen_exception_storm(width):
+    results = yield list([_gen_catch(index) for index in xrange(width)])
+    yield GenResult(sum(results))
+
+
+def _create_exception_storm():
+    width = 10000
+    return _gen_exception_storm(width), 3 * width + 1
+
+
+_CACHE = GeneratorCache()
+
+
+@cached_generator(_CACHE)
+def _gen_cached_leaf(value):
+    result = yield BenchmarkOperation(value)
+    yield GenResult(result)
+
+
+def _gen_cached_hot_loop(call_count, distinct_count):
+    results = yield list([
+        _gen_cached_leaf(index % distinct_count)
+        for index in xrange(call_count)])
+    yield GenResult(sum(results))
+
+
+def _create_cached_hot_loop():
+    _CACHE.clear()
+    call_count = 20000
+    distinct_count = 100
+    return (
+        _gen_cached_hot_loop(call_count, distinct_count),
+        call_count + 3 * distinct_count + 1)
+
+
+# The executor benchmarks
+BENCHMARKS = [
+    Benchmark(
+        'wide_fan_out', 'One generator yielding 20000 leaf generators',
+        _create_wide_fan_out),
+    Benchmark(
+        'deep_chain', 'A chain of 5000 generators, one round per link',
+        _create_deep_chain),
+    Benchmark(
+        'fan_in', '10000 generators sharing one SharedGenerator',
+        _create_fan_in),
+    Benchmark(
+        'exception_storm', '10000 generators raising caught exceptions',
+        _create_exception_storm),
+    Benchmark(
+        'cached_hot_loop',
+        '20000 calls to a cached_generator function with 100 distinct '
+        'arguments',
+        _create_cached_hot_loop),
+]
@@ -0,0 +1,251 @@
+"""Measures the wall-clock benefit of batching with simulated latency.
+
+We execute realistic request graphs against SimulatedBackends in three
+ways: naively, executing each BatchableOperation in its own round trip
+as soon as a generator yields it; using BatchExecutor.execute; and
+using BatchExecutor.execute with a thread pool.  For each, we report the
+number of round trips per request, the fraction of requests that
+failed, the median and 99th percentile request latency, and the
+throughput.  The backends may fail at random, and BatchExecutor may
+retry the failed batches.  Run
+"python -m batch.benchmark.latency_benchmark --help" from the src
+directory for usage instructions.
+"""
+
+import argparse
+from multiprocessing.pool import ThreadPool
+import timeit
+from types import GeneratorType
+
+from batch import BatchableOperation
+from batch import BatchExecutor
+from batch import GenResult
+from batch import RetryPolicy
+from latency_operation import SimulatedBackend
+from latency_operation import SimulatedBackendError
+from latency_operation import SimulatedOperation
+
+
+class _RequestGraphs(object):
+    """Provides request graphs that fetch users from SimulatedBackends.
+
+    Each user has an ID, a spouse, and five friends.  We fetch the
+    spouse and friend IDs from one backend and the user data from
+    another.
+    """
+
+    # Private attributes:
+    # SimulatedBackend _graph_backend - The backend for the spouse and
+    #     friend IDs.
+    # SimulatedBackend _user_backend - The backend for the user data.
+
+    def __init__(self, graph_backend, user_backend):
+        self._graph_backend = graph_backend
+        self._user_backend = user_backend
+
+    @staticmethod
+    def lookup_graph(key):
+        """Return the value of a key in the graph backend."""
+        relation, user_id = key
+        if relation == 'spouseId':
+            return user_id ^ 1
+        else:
+            return list([(user_id * 7 + index) % 1000 for index in xrange(5)])
+
+    @staticmethod
+    def lookup_user(user_id):
+        """Return the user data for the user with the specified ID."""
+        return {'id': user_id, 'favoriteFood': 'pizza'}
+
+    def gen_user(self, user_id):
+        user = yield SimulatedOperation(self._user_backend, user_id)
+        yield GenResult(user)
+
+    def gen_spouse(self, user_id):
+        spouse_id = yield SimulatedOperation(
+            self._graph_backend, ('spouseId', user_id))
+        spouse = yield self.gen_user(spouse_id)
+        yield GenResult(spouse)
+
+    def gen_spouses(self, user_id):
+        """Return the user with the specified ID and his spouse."""
+        spouses = yield (self.gen_user(user_id), self.gen_spouse(user_id))
+        yield GenResult(spouses)
+
+    def gen_friend_spouses(self, user_id):
+        """Return the user's friends, each paired with the friend's spouse.
+        """
+        friend_ids = yield SimulatedOperation(
+            self._graph_backend, ('friendIds', user_id))
+        friend_spouses = yield list([
+            self.gen_spouses(friend_id) for friend_id in friend_ids])
+        yield GenResult(friend_spouses)
+
+
+def _execute_naively(generator_or_operation):
+    """Execute a batch generator or BatchableOperation without batching.
+
+    Execute each BatchableOperation in its own call to gen_batch as soon
+    as a generator yields it, and execute the elements of a yielded list
+    one at a time.  This simulates code that fetches each value
+    separately.
+
+    object generator_or_operation - The batch generator or
+        BatchableOperation.
+    return mixed - The result.
+    """
+    if isinstance(generator_or_operation, BatchableOperation):
+        generator = generator_or_operation.batcher().gen_batch(
+            [generator_or_operation])
+        return _execute_naively(generator)[0]
+    elif not isinstance(generator_or_operation, GeneratorType):
+        raise TypeError('Expected a generator or BatchableOperation')
+
+    generator = generator_or_operation
+    try:
+        value = generator.next()
+        while not isinstance(value, GenResult):
+            if isinstance(value, (list, tuple)):
+                result = list([_execute_naively(element) for element in value])
+            else:
+                result = _execute_naively(value)
+            value = generator.send(result)
+    except StopIteration:
+        return None
+    generator.close()
+    return value._value
+
+
+def _percentile(sorted_values, fraction):
+    """Return the specified percentile of a sorted, non-empty list."""
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def run_benchmark(
+        graph_name, execute, request_count, round_trip_latency,
+        per_item_latency, jitter, failure_rate=0, retry_policy=None):
+    """Execute a request graph repeatedly, and return measurements.
+
+    basestring graph_name - The name of the _RequestGraphs method that
+        returns the request graph for a given user ID.
+    callable execute - The function that executes a request graph and
+        returns its result.
+    int request_count - The number of requests to execute.
+    float round_trip_latency - The latency of a round trip to a backend,
+        in seconds.
+    float per_item_latency - The latency of each operation in a batch,
+        in seconds.
+    float jitter - The maximum fraction by which to randomly vary the
+        latency of a batch.
+    float failure_rate - The probability that a batch fails.
+    RetryPolicy retry_policy - The policy for retrying failed batches,
+        or None if we should not retry them.  _execute_naively does not
+        retry batches.
+    return dict<basestring, float> - A map from 'round_trips' to the
+        average number of round trips per request, from 'failures' to
+        the fraction of requests that failed, from 'p50_ms' and 'p99_ms'
+        to the median and 99th percentile latency in milliseconds, and
+        from 'throughput' to the number of requests per second.  The
+        latencies include those of the failed requests.
+    """
+    graph_backend = SimulatedBackend(
+        'graph', round_trip_latency, per_item_latency, jitter,
+        failure_rate, lookup=_RequestGraphs.lookup_graph, seed=0,
+        retry_policy=retry_policy)
+    user_backend = SimulatedBackend(
+        'user', round_trip_latency, per_item_latency, jitter, failure_rate,
+        lookup=_RequestGraphs.lookup_user, seed=1,
+        retry_policy=retry_policy)
+    graphs = _RequestGraphs(graph_backend, user_backend)
+    gen_graph = getattr(graphs, graph_name)
+
+    latencies = []
+    failure_count = 0
+    start = timeit.default_timer()
+    for user_id in xrange(request_count):
+        request_start = timeit.default_timer()
+        try:
+            execute(gen_graph(user_id))
+        except SimulatedBackendError:
+            failure_count += 1
+        latencies.append(timeit.default_timer() - request_start)
+    total_seconds = timeit.default_timer() - start
+
+    latencies.sort()
+    round_trips = (
+        graph_backend.round_trip_count + user_backend.round_trip_count)
+    return {
+        'failures': float(failure_count) / request_count,
+        'p50_ms': 1000 * _percentile(latencies, 0.5),
+        'p99_ms': 1000 * _percentile(latencies, 0.99),
+        'round_trips': float(round_trips) / request_count,
+        'throughput': request_count / total_seconds,
+    }
+
+
+def main():
+    """Run the benchmark using the command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Compare batched and naive execution with simulated '
+        'backend latency.')
+    parser.add_argument(
+        '--requests', type=int, default=50,
+        help='The number of requests to execute for each measurement')
+    parser.add_argument(
+        '--round-trip-ms', type=float, default=2.0,
+        help='The latency of a round trip to a backend, in milliseconds')
+    parser.add_argument(
+        '--per-item-ms', type=float, default=0.01,
+        help='The latency of each operation in a batch, in milliseconds')
+    parser.add_argument(
+        '--jitter', type=float, default=0.2,
+        help='The maximum fraction by which to vary the latency of a batch')
+    parser.add_argument(
+        '--failure-rate', type=float, default=0,
+        help='The probability that a batch fails')
+    parser.add_argument(
+        '--max-attempts', type=int, default=1,
+        help='The maximum number of times BatchExecutor executes each '
+        'operation of a failed batch, waiting one round trip between the '
+        'first two attempts')
+    args = parser.parse_args()
+    if args.max_attempts > 1:
+        retry_policy = RetryPolicy(
+            args.max_attempts, initial_delay=args.round_trip_ms / 1000.0)
+    else:
+        retry_policy = None
+
+    thread_pool = ThreadPool(4)
+    try:
+        executions = [
+            ('naive', _execute_naively),
+            ('execute', BatchExecutor.execute),
+            (
+                'execute+pool',
+                lambda root: BatchExecutor.execute(
+                    root, thread_pool=thread_pool)),
+        ]
+        print '{:<20s}{:<14s}{:>13s}{:>10s}{:>10s}{:>10s}{:>12s}'.format(
+            'graph', 'execution', 'round trips', 'failed', 'p50 ms',
+            'p99 ms', 'req/s')
+        for graph_name in ['gen_spouses', 'gen_friend_spouses']:
+            for execution_name, execute in executions:
+                measurements = run_benchmark(
+                    graph_name, execute, args.requests,
+                    args.round_trip_ms / 1000.0, args.per_item_ms / 1000.0,
+                    args.jitter, args.failure_rate, retry_policy)
+                print (
+                    '{:<20s}{:<14s}{:>13.1f}{:>10.1%}{:>10.2f}{:>10.2f}'
+                    '{:>12.1f}'.format(
+                        graph_name, execution_name,
+                        measurements['round_trips'], measurements['failures'],
+                        measurements['p50_ms'], measurements['p99_ms'],
+                        measurements['throughput']))
+    finally:
+        thread_pool.close()
+        thread_pool.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import random
+import threading
+import time
+
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+
+
+class SimulatedBackendError(Exception):
+    """An exception indicating a simulated failure of a SimulatedBackend."""
+    pass
+
+
+class SimulatedOperation(BatchableOperation):
+    """An operation that fetches a key from a SimulatedBackend."""
+
+    # Private attributes:
+    # SimulatedBackend _backend - The backend.
+    # object _key - The key to fetch.
+
+    def __init__(self, backend, key):
+        self._backend = backend
+        self._key = key
+
+    def batcher(self):
+        return self._backend
+
+
+class SimulatedBackend(Batcher):
+    """A stand-in for a data store that takes time to respond.
+
+    SimulatedBackend is the Batcher for SimulatedOperations.  Each batch
+    sleeps for the simulated latency of one round trip to the data
+    store, plus a latency for each operation in the batch, scaled by a
+    random jitter factor.  A batch may also fail at random, by raising a
+    SimulatedBackendError, in which case BatchExecutor may retry it
+    according to the backend's RetryPolicy.  SimulatedBackends are only
+    equal to themselves, so operations for different backends are
+    batched separately.  It is safe to execute batches for a SimulatedBackend
+    from multiple threads at the same time.
+
+    Public attributes:
+
+    int item_count - The total number of operations in the batches we
+        have executed.
+    final basestring name - The name of the backend.
+    int round_trip_count - The number of batches we have executed.
+    """
+
+    # Private attributes:
+    # float _failure_rate - The probability that a batch fails.
+    # float _jitter - The maximum fraction by which to randomly increase
+    #     or decrease the latency of a batch.
+    # threading.Lock _lock - The lock for item_count, round_trip_count,
+    #     and _random.
+    # callable _lookup - The function that returns the result of a
+    #     SimulatedOperation, given its key.
+    # float _per_item_latency - The latency of each operation in a
+    #     batch, in seconds.
+    # random.Random _random - The random number generator for the
+    #     jitter and failures.
+    # RetryPolicy _retry_policy - The policy for retrying failed batches,
+    #     or None.
+    # float _round_trip_latency - The latency of a round trip, in
+    #     seconds.
+
+    def __init__(
+            self, name, round_trip_latency, per_item_latency=0, jitter=0,
+            failure_rate=0, lookup=None, seed=None, retry_policy=None):
+        """Initialize a SimulatedBackend.
+
+        basestring name - The name of the backend.
+        float round_trip_latency - The latency of a round trip, in
+            seconds.
+        float per_item_latency - The latency of each operation in a
+            batch, in seconds.
+        float jitter - The maximum fraction by which to randomly
+            increase or decrease the latency of a batch.  For example,
+            if this is 0.1, the latency of a batch varies by up to 10%.
+        float failure_rate - The probability that a batch fails.
+        callable lookup - The function that returns the result of a
+            SimulatedOperation, given its key, or None to use the key as
+            the result.
+        int seed - The seed for the random number generator, or None to
+            use a seed based on the current time.
+        RetryPolicy retry_policy - The policy for retrying failed
+            batches, or None if we should not retry them.
+        """
+        self.name = name
+        self.round_trip_count = 0
+        self.item_count = 0
+        self._round_trip_latency = round_trip_latency
+        self._per_item_latency = per_item_latency
+        self._jitter = jitter
+        self._failure_rate = failure_rate
+        self._lookup = lookup
+        self._random = random.Random(seed)
+        self._retry_policy = retry_policy
+        self._lock = threading.Lock()
+
+    def reset_counts(self):
+        """Set round_trip_count and item_count to 0."""
+        with self._lock:
+            self.round_trip_count = 0
+            self.item_count = 0
+
+    def fetch(self, keys):
+        """Simulate fetching the specified keys in one round trip.
+
+        list keys - The keys.
+        return list - The results for the keys.
+        """
+        with self._lock:
+            self.round_trip_count += 1
+            self.item_count += len(keys)
+            jitter_factor = 1 + self._jitter * (2 * self._random.random() - 1)
+            is_failure = self._random.random() < self._failure_rate
+        latency = (
+            self._round_trip_latency + self._per_item_latency * len(keys))
+        time.sleep(max(0, latency * jitter_factor))
+        if is_failure:
+            raise SimulatedBackendError(
+                'Simulated failure in {:s}'.format(self.name))
+        if self._lookup is None:
+            return list(keys)
+        else:
+            return list([self._lookup(key) for key in keys])
+
+    def retry_policy(self):
+        return self._retry_policy
+
+    def gen_batch(self, operations):
+        yield GenResult(
+            self.fetch(list([operation._key for operation in operations])))
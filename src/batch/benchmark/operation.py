@@ -0,0 +1,47 @@
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+
+
+class BenchmarkOperation(BatchableOperation):
+    """An operation whose result is the argument to the constructor.
+
+    BenchmarkOperation does as little work as possible, so that
+    benchmarks using it measure the overhead of batch execution.
+    """
+
+    # Private attributes:
+    # mixed _value - The result.
+
+    def __init__(self, value):
+        self._value = value
+
+    def batcher(self):
+        return BenchmarkBatcher.instance()
+
+
+class BenchmarkBatcher(Batcher):
+    """The Batcher for BenchmarkOperation.
+
+    Public attributes:
+
+    int batch_count - The number of batches we have executed.
+    """
+
+    # The singleton instance of BenchmarkBatcher, or None if we have not
+    # created it yet.
+    _instance = None
+
+    def __init__(self):
+        self.batch_count = 0
+
+    @staticmethod
+    def instance():
+        """Return the singleton instance of BenchmarkBatcher."""
+        if BenchmarkBatcher._instance is None:
+            BenchmarkBatcher._instance = BenchmarkBatcher()
+        return BenchmarkBatcher._instance
+
+    def gen_batch(self, operations):
+        self.batch_count += 1
+        yield GenResult(list([operation._value for operation in operations]))
@@ -0,0 +1,221 @@
+"""Runs the benchmarks and compares their results to a baseline.
+
+For each benchmark, we report the time per node in nanoseconds, where
+a node is a generator or BatchableOperation, as well as the peak memory
+usage in kilobytes and the number of rounds, i.e. batches.  We run each benchmark
+in a separate process, so that the peak memory usage of one benchmark
+does not affect that of another.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import timeit
+
+from batch import BatchExecutor
+import executor_benchmark
+from operation import BenchmarkBatcher
+
+
+# The benchmarks, in the order in which to run them
+BENCHMARKS = executor_benchmark.BENCHMARKS
+
+# The default number of times to run each benchmark.  We report the fastest
+# run.
+DEFAULT_REPEAT = 5
+
+# The default ratio by which the time per node may exceed that of the
+# baseline before we consider the difference a regression
+DEFAULT_THRESHOLD = 1.2
+
+
+def _peak_memory_kb():
+    """Return the peak resident set size of this process, in kilobytes."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # On Mac OS X, ru_maxrss is in bytes rather than kilobytes
+        return max_rss // 1024
+    return max_rss
+
+
+def _measure(benchmark, repeat):
+    """Run a benchmark in this process.
+
+    Benchmark benchmark - The benchmark.
+    int repeat - The number of times to run it.
+    return dict<basestring, object> - The measurements, as in the values
+        of the return value of run_benchmarks.
+    """
+    best_seconds = None
+    for _ in xrange(repeat):
+        root, node_count = benchmark.create_root()
+        batcher = BenchmarkBatcher.instance()
+        batcher.batch_count = 0
+        start = timeit.default_timer()
+        BatchExecutor.execute(root)
+        seconds = timeit.default_timer() - start
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+    return {
+        'nodes': node_count,
+        'ns_per_node': 1e9 * best_seconds / node_count,
+        'peak_memory_kb': _peak_memory_kb(),
+        'rounds': batcher.batch_count,
+        'seconds': best_seconds,
+    }
+
+
+def _measure_in_subprocess(benchmark, repeat):
+    """Run a benchmark in a new process.
+
+    Benchmark benchmark - The benchmark.
+    int repeat - The number of times to run it.
+    return dict<basestring, object> - The measurements, as in the values
+        of the return value of run_benchmarks.
+    """
+    src_dir = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [src_dir] + list(filter(None, [env.get('PYTHONPATH')])))
+    output = subprocess.check_output(
+        [
+            sys.executable, '-m', 'batch.benchmark', '--single',
+            benchmark.name, '--repeat', str(repeat)],
+        env=env)
+    return json.loads(output)
+
+
+def run_benchmarks(names=None, repeat=DEFAULT_REPEAT):
+    """Run the specified benchmarks, each in a separate process.
+
+    list<basestring> names - The names of the benchmarks to run, or
+        None to run all of them.
+    int repeat - The number of times to run each benchmark.
+    return dict<basestring, dict<basestring, object>> - A map from the
+        names of the benchmarks to their measurements.  The measurements
+        map from 'nodes' to the number of generators and
+        BatchableOperations in the benchmark's DAG, from 'ns_per_node'
+        to the time per node in nanoseconds, from 'peak_memory_kb' to
+        the peak resident set size of the process in kilobytes, from
+        'rounds' to the number of batches, and from 'seconds' to the
+        total running time.
+    """
+    results = {}
+    for benchmark in BENCHMARKS:
+        if names is None or benchmark.name in names:
+            results[benchmark.name] = _measure_in_subprocess(
+                benchmark, repeat)
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return the benchmarks that regressed relative to a baseline.
+
+    dict<basestring, dict<basestring, object>> results - The current
+        measurements, as returned by run_benchmarks.
+    dict<basestring, dict<basestring, object>> baseline - The baseline
+        measurements, as returned by run_benchmarks.
+    float threshold - The ratio by which the time per node may exceed
+        that of the baseline before we consider the difference a
+        regression.
+    return list<basestring> - The names of the benchmarks whose time per
+        node or number of rounds exceeds the baseline by too much.
+    """
+    regressions = []
+    for name, measurements in sorted(results.iteritems()):
+        baseline_measurements = baseline.get(name)
+        if baseline_measurements is None:
+            continue
+        if (measurements['ns_per_node'] >
+                threshold * baseline_measurements['ns_per_node'] or
+                measurements['rounds'] > baseline_measurements['rounds']):
+            regressions.append(name)
+    return regressions
+
+
+def _format_results(results, baseline):
+    """Return a human-readable table of benchmark results.
+
+    dict<basestring, dict<basestring, object>> results - The
+        measurements, as returned by run_benchmarks.
+    dict<basestring, dict<basestring, object>> baseline - The baseline
+        measurements, or None if there is no baseline.
+    return basestring - The table.
+    """
+    lines = ['{:<20s}{:>12s}{:>14s}{:>10s}{:>12s}'.format(
+        'benchmark', 'ns/node', 'peak mem KB', 'rounds', 'vs base')]
+    for benchmark in BENCHMARKS:
+        measurements = results.get(benchmark.name)
+        if measurements is None:
+            continue
+        if baseline is not None and benchmark.name in baseline:
+            ratio = '{:.2f}x'.format(
+                measurements['ns_per_node'] /
+                baseline[benchmark.name]['ns_per_node'])
+        else:
+            ratio = '-'
+        lines.append('{:<20s}{:>12.0f}{:>14d}{:>10d}{:>12s}'.format(
+            benchmark.name, measurements['ns_per_node'],
+            measurements['peak_memory_kb'], measurements['rounds'], ratio))
+    return '\n'.join(lines)
+
+
+def main():
+    """Run the benchmarks using the command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Measure the overhead of BatchExecutor.')
+    parser.add_argument(
+        'names', nargs='*', metavar='NAME',
+        help='The benchmarks to run (default: all).  Choices: {:s}'.format(
+            ', '.join([benchmark.name for benchmark in BENCHMARKS])))
+    parser.add_argument(
+        '--repeat', type=int, default=DEFAULT_REPEAT,
+        help='The number of times to run each benchmark')
+    parser.add_argument(
+        '--save-baseline', metavar='PATH',
+        help='Save the results as a baseline in the specified JSON file')
+    parser.add_argument(
+        '--compare', metavar='PATH',
+        help='Compare the results to the baseline in the specified file, '
+        'and exit with status 1 if any benchmark regressed')
+    parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help='The ratio of ns/node to the baseline above which we report '
+        'a regression')
+    parser.add_argument('--single', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        # We are running one benchmark in a subprocess
+        benchmarks = list([
+            benchmark for benchmark in BENCHMARKS
+            if benchmark.name == args.single])
+        if not benchmarks:
+            parser.error('Unknown benchmark {:s}'.format(args.single))
+        print json.dumps(_measure(benchmarks[0], args.repeat))
+        return
+
+    known_names = set([benchmark.name for benchmark in BENCHMARKS])
+    for name in args.names:
+        if name not in known_names:
+            parser.error('Unknown benchmark {:s}'.format(name))
+    results = run_benchmarks(args.names or None, args.repeat)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print _format_results(results, baseline)
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+    if baseline is not None:
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        if regressions:
+            print 'Regressions: {:s}'.format(', '.join(regressions))
+            sys.exit(1)
@@ -0,0 +1,139 @@
+from gen_result import GenResult
+from operation import BatchableOperation
+from operation import Batcher
+from operation_error import OperationError
+
+
+class CachedOperation(BatchableOperation):
+    """A BatchableOperation whose result we fetch through a cache.
+
+    The result of a CachedOperation is the result of the operation it
+    wraps.  A CachingBatcher computes it, using a cache in front of the
+    wrapped operation's own Batcher.  Since operations with the same
+    cache key share a cached result, the identity key of a
+    CachedOperation is its cache key.
+    """
+
+    # Private attributes:
+    # CachingBatcher _caching_batcher - The batcher for the operation.
+    # BatchableOperation _operation - The wrapped operation.
+
+    def __init__(self, operation, caching_batcher):
+        """Initialize a CachedOperation.
+
+        BatchableOperation operation - The operation whose result to
+            fetch through the cache.
+        CachingBatcher caching_batcher - The CachingBatcher to compute
+            the result.
+        """
+        self._operation = operation
+        self._caching_batcher = caching_batcher
+
+    def batcher(self):
+        return self._caching_batcher
+
+    def identity_key(self):
+        return self._caching_batcher.cache_key(self._operation)
+
+
+class CachingBatcher(Batcher):
+    """A read-through cache in front of other BatchableOperations.
+
+    The abstract superclass of Batchers that compute the results of
+    BatchableOperations by first looking them up in a cache, then
+    executing the operations whose results were not cached, and then
+    storing those results in the cache.  This replaces the common
+    pattern of a batch generator that yields a cache lookup, then the
+    operation, then a cache write.  A CachingBatcher performs each of
+    the three steps for all of the operations in a batch at once, so
+    a batch costs at most three rounds of batches, and the cache
+    lookups and writes are batched with each other and with any other
+    operations for the cache's Batchers.
+
+    Subclasses describe the cache by implementing cache_key,
+    cache_get_operation, and cache_set_operation.  To fetch the result
+    of an operation through the cache, we yield a CachedOperation that
+    wraps the operation, e.g.:
+
+    user_data = yield CachedOperation(
+        DbUserOperation(user_id), UserCachingBatcher.instance())
+
+    We regard a cached value of None as a cache miss, so we do not
+    cache results of None.  We also do not cache the results of
+    operations that fail.  If writing a result to the cache fails, we
+    ignore the failure, since the result is correct regardless.
+    """
+
+    def cache_key(self, operation):
+        """Return the key for storing an operation's result in the cache.
+
+        Operations with equal cache keys must have the same result.
+
+        BatchableOperation operation - The wrapped operation, as passed
+            to the CachedOperation constructor.
+        return object - The hashable key.
+        """
+        raise NotImplementedError('Subclass must override')
+
+    def cache_get_operation(self, key):
+        """Return a BatchableOperation that fetches a value from the cache.
+
+        object key - The key, as returned by cache_key.
+        return BatchableOperation - The operation.  Its result is the
+            cached value, or None if there is no cached value.
+        """
+        raise NotImplementedError('Subclass must override')
+
+    def cache_set_operation(self, key, value):
+        """Return a BatchableOperation that stores a value in the cache.
+
+        object key - The key, as returned by cache_key.
+        mixed value - The non-None value to store.
+        return BatchableOperation - The operation.  We ignore its
+            result.
+        """
+        raise NotImplementedError('Subclass must override')
+
+    def _gen_origin_result(self, operation):
+        """Return the result of an operation whose result was not cached.
+
+        If the operation fails, return an OperationError rather than
+        raising an exception, so that the failure only affects the
+        corresponding CachedOperation.
+        """
+        try:
+            result = yield operation
+        except Exception as exception:
+            yield GenResult(OperationError(exception))
+        yield GenResult(result)
+
+    def _gen_ignore_exception(self, operation):
+        """Execute the specified operation, ignoring any exception."""
+        try:
+            yield operation
+        except Exception:
+            pass
+
+    def gen_batch(self, operations):
+        keys = list([
+            self.cache_key(operation._operation) for operation in operations])
+        results = yield list([self.cache_get_operation(key) for key in keys])
+        results = list(results)
+        miss_indices = list([
+            index for index, result in enumerate(results) if result is None])
+        if not miss_indices:
+            yield GenResult(results)
+
+        origin_results = yield list([
+            self._gen_origin_result(operations[index]._operation)
+            for index in miss_indices])
+        set_operations = []
+        for index, result in zip(miss_indices, origin_results):
+            results[index] = result
+            if result is not None and not isinstance(result, OperationError):
+                set_operations.append(
+                    self._gen_ignore_exception(
+                        self.cache_set_operation(keys[index], result)))
+        if set_operations:
+            yield set_operations
+        yield GenResult(results)
@@ -0,0 +1,293 @@
+import json
+import os
+import timeit
+
+from tracer import Tracer
+
+
+class _TracedExecution(object):
+    """The state of an execution that ChromeTraceTracer is recording."""
+
+    __slots__ = ('number', 'round_count', 'round_start_time', 'start_time')
+
+    def __init__(self, number, start_time):
+        self.number = number
+        self.start_time = start_time
+        self.round_count = 0
+        self.round_start_time = None
+
+
+class ChromeTraceTracer(Tracer):
+    """A Tracer that records executions in the Chrome trace event format.
+
+    We may load the resulting JSON files in chrome://tracing or in
+    Perfetto (https://ui.perfetto.dev) to view each execution as a
+    timeline.  The timeline has a track for the executor, showing the
+    executions, the rounds, and the iterations of the generators, and an
+    asynchronous track for each Batcher, showing its batches and the
+    number of operations in each.  Since a Batcher's batches may overlap
+    in time, e.g. when we split a batch into several calls to gen_batch
+    and execute them using a thread pool, each batch is a separate
+    asynchronous event.  Nested executions appear on separate executor
+    tracks, one for each level of nesting.  Exceptions appear as instant
+    events.
+
+    Public attributes:
+
+    list<dict<basestring, object>> events - The trace events we have
+        recorded, in the format of the "traceEvents" field of a Chrome
+        trace file.  If we are writing the events to a file after each
+        execution, this only contains the events we have not written
+        yet.  Otherwise, we may clear it after calling "write" to limit
+        memory usage.
+    """
+
+    # The process ID for the events
+    _PID = 1
+
+    # The end of the contents of a Chrome trace file that "write" writes
+    _TRACE_FILE_SUFFIX = ']}'
+
+    # The thread ID of the track for executions that are not nested.  The
+    # track for executions nested N levels deep has thread ID
+    # _EXECUTOR_TID + N.
+    _EXECUTOR_TID = 0
+
+    # Private attributes:
+    # int _batch_count - The number of batches we have recorded.
+    # dict<Batcher, basestring> _batcher_names - A map from the Batchers
+    #     whose batches we have recorded to the names of their tracks.
+    # int _execute_count - The number of executions we have started.
+    # list<_TracedExecution> _executions - The executions that are
+    #     running, from the outermost to the most deeply nested.
+    # int _executor_track_count - The number of executor tracks we have
+    #     named.
+    # bool _is_file_started - Whether we have written the file at _path.
+    # basestring _path - The filename to which to write the events after
+    #     each execution, or None.
+    # float _start_time - The time from which we measure the events'
+    #     timestamps, as returned by timeit.default_timer().
+
+    def __init__(self, path=None):
+        """Initialize a ChromeTraceTracer.
+
+        basestring path - The filename to which to write the events we
+            have recorded after each execution that is not nested, or
+            None if we will call "write" explicitly.  Each time, we
+            append the new events to the file and remove them from
+            "events".
+        """
+        self.events = []
+        self._path = path
+        self._is_file_started = False
+        self._start_time = timeit.default_timer()
+        self._batch_count = 0
+        self._batcher_names = {}
+        self._execute_count = 0
+        self._executions = []
+        self._executor_track_count = 0
+
+    def _timestamp(self, time):
+        """Return the timestamp for an event at the specified time.
+
+        float time - The time, as returned by timeit.default_timer().
+        return float - The timestamp, in microseconds.
+        """
+        return 1e6 * (time - self._start_time)
+
+    def _add_thread_name(self, tid, name):
+        """Add a metadata event naming the track with the given thread ID."""
+        self.events.append({
+            'args': {'name': name},
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': ChromeTraceTracer._PID,
+            'tid': tid,
+        })
+
+    def _add_slice(self, tid, name, start_time, end_time, args=None):
+        """Add an event for a span of time to the track with the given ID.
+
+        int tid - The thread ID of the track.
+        basestring name - The name of the event.
+        float start_time - The start time, as returned by
+            timeit.default_timer().
+        float end_time - The end time, as returned by
+            timeit.default_timer().
+        dict<basestring, object> args - The JSON-serializable arguments
+            to display for the event, or None.
+        """
+        event = {
+            'dur': 1e6 * (end_time - start_time),
+            'name': name,
+            'ph': 'X',
+            'pid': ChromeTraceTracer._PID,
+            'tid': tid,
+            'ts': self._timestamp(start_time),
+        }
+        if args is not None:
+            event['args'] = args
+        self.events.append(event)
+
+    def _add_instant(self, tid, name, args):
+        """Add an event for an instant in time to the specified track.
+
+        int tid - The thread ID of the track.
+        basestring name - The name of the event.
+        dict<basestring, object> args - The JSON-serializable arguments
+            to display for the event.
+        """
+        self.events.append({
+            'args': args,
+            'name': name,
+            'ph': 'i',
+            'pid': ChromeTraceTracer._PID,
+            's': 't',
+            'tid': tid,
+            'ts': self._timestamp(timeit.default_timer()),
+        })
+
+    def _add_async_slice(self, name, start_time, end_time, args):
+        """Add an asynchronous event for a span of time.
+
+        Add a pair of events marking the beginning and the end of the
+        span, with an ID that no other span shares, so that the span
+        may overlap other spans with the same name.
+
+        basestring name - The name of the event.  Events with the same
+            name appear on the same track.
+        float start_time - The start time, as returned by
+            timeit.default_timer().
+        float end_time - The end time, as returned by
+            timeit.default_timer().
+        dict<basestring, object> args - The JSON-serializable arguments
+            to display for the event.
+        """
+        self._batch_count += 1
+        for phase, time in (('b', start_time), ('e', end_time)):
+            event = {
+                'cat': 'batch',
+                'id': self._batch_count,
+                'name': name,
+                'ph': phase,
+                'pid': ChromeTraceTracer._PID,
+                'tid': ChromeTraceTracer._EXECUTOR_TID,
+                'ts': self._timestamp(time),
+            }
+            if phase == 'b':
+                event['args'] = args
+            self.events.append(event)
+
+    def _batcher_name(self, batcher):
+        """Return the name of the track for the specified Batcher."""
+        name = self._batcher_names.get(batcher)
+        if name is None:
+            name = '{:s} #{:d}'.format(
+                batcher.__class__.__name__, len(self._batcher_names) + 1)
+            self._batcher_names[batcher] = name
+        return name
+
+    def _executor_tid(self):
+        """Return the thread ID of the track for the current execution."""
+        return ChromeTraceTracer._EXECUTOR_TID + len(self._executions) - 1
+
+    @staticmethod
+    def _exception_args(exception_info):
+        """Return the event arguments describing an exception."""
+        return {
+            'exception': '{:s}: {:s}'.format(
+                exception_info[0].__name__, str(exception_info[1])),
+        }
+
+    def execute_started(self):
+        self._execute_count += 1
+        self._executions.append(
+            _TracedExecution(self._execute_count, timeit.default_timer()))
+        if len(self._executions) > self._executor_track_count:
+            self._executor_track_count += 1
+            if self._executor_track_count == 1:
+                name = 'executor'
+            else:
+                name = 'executor (nested {:d})'.format(
+                    self._executor_track_count - 1)
+            self._add_thread_name(self._executor_tid(), name)
+
+    def execute_finished(self, exception_info):
+        if exception_info is not None:
+            args = ChromeTraceTracer._exception_args(exception_info)
+        else:
+            args = None
+        execution = self._executions[-1]
+        self._add_slice(
+            self._executor_tid(), 'execute #{:d}'.format(execution.number),
+            execution.start_time, timeit.default_timer(), args)
+        self._executions.pop()
+        if self._path is not None and not self._executions:
+            self._append_events()
+
+    def round_started(self):
+        execution = self._executions[-1]
+        execution.round_count += 1
+        execution.round_start_time = timeit.default_timer()
+
+    def round_finished(self):
+        execution = self._executions[-1]
+        self._add_slice(
+            self._executor_tid(), 'round {:d}'.format(execution.round_count),
+            execution.round_start_time, timeit.default_timer())
+
+    def batch_finished(
+            self, batcher, operation_count, seconds, exception_info):
+        args = {'operations': operation_count}
+        if exception_info is not None:
+            args.update(ChromeTraceTracer._exception_args(exception_info))
+        end_time = timeit.default_timer()
+        self._add_async_slice(
+            self._batcher_name(batcher), end_time - seconds, end_time, args)
+
+    def generator_stepped(self, generator, seconds):
+        end_time = timeit.default_timer()
+        self._add_slice(
+            self._executor_tid(), generator.gi_code.co_name,
+            end_time - seconds, end_time)
+
+    def generator_raised(self, generator, exception_info):
+        self._add_instant(
+            self._executor_tid(),
+            'raise in {:s}'.format(generator.gi_code.co_name),
+            ChromeTraceTracer._exception_args(exception_info))
+
+    def _append_events(self):
+        """Append the events in "events" to the file at _path.
+
+        Afterwards, clear "events".  To keep the cost of each execution
+        proportional to the number of events it records, we overwrite
+        the end of the file, rather than rewriting the whole file.
+        """
+        if not self._is_file_started:
+            self.write(self._path)
+            self._is_file_started = True
+        else:
+            with open(self._path, 'r+b') as file_:
+                file_.seek(
+                    -len(ChromeTraceTracer._TRACE_FILE_SUFFIX), os.SEEK_END)
+                for event in self.events:
+                    file_.write(', ')
+                    json.dump(event, file_)
+                file_.write(ChromeTraceTracer._TRACE_FILE_SUFFIX)
+        del self.events[:]
+
+    def write(self, path):
+        """Write the events we have recorded to a Chrome trace file.
+
+        To avoid leaving a partially written file if writing fails, we
+        write to a temporary file and then rename it.
+
+        basestring path - The filename.
+        """
+        temp_path = '{:s}.tmp'.format(path)
+        with open(temp_path, 'w') as file_:
+            file_.write('{"displayTimeUnit": "ms", "traceEvents": ')
+            json.dump(self.events, file_)
+            file_.write('}')
+        os.rename(temp_path, path)
@@ -0,0 +1,242 @@
+import sys
+import threading
+import time
+from types import GeneratorType
+
+from executor import BatchExecutor
+from gen_result import GenResult
+from operation import BatchableOperation
+
+
+class _CoalescedFuture(object):
+    """A future for the result of a root passed to CoalescingBatchExecutor.
+    """
+
+    # Private attributes:
+    # threading.Event _event - The event indicating that the result is
+    #     available.
+    # tuple<type, mixed, traceback> _exception_info - Information about
+    #     the exception the root raised, as returned by sys.exc_info(),
+    #     or None if it did not raise an exception.
+    # mixed _result - The result of the root.
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._exception_info = None
+
+    def _set_result(self, result, exception_info):
+        """Store the outcome of the root and wake up any waiting threads.
+
+        mixed result - The result of the root.
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception the root raised, or None if it did not raise
+            an exception.
+        """
+        self._result = result
+        self._exception_info = exception_info
+        self._event.set()
+
+    def done(self):
+        """Return whether the root is finished executing."""
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the root to finish, and return its result.
+
+        Raise the exception the root raised, if any.
+
+        float timeout - The maximum number of seconds to wait, or None
+            to wait indefinitely.
+        return mixed - The result.
+        """
+        if not self._event.wait(timeout):
+            raise RuntimeError('Timed out waiting for the result')
+        if self._exception_info is not None:
+            raise self._exception_info[1], None, self._exception_info[2]
+        return self._result
+
+
+class CoalescingBatchExecutor(object):
+    """Batches operations across concurrent callers.
+
+    Each call to BatchExecutor.execute* only batches operations within
+    its own generators.  A CoalescingBatchExecutor is a long-lived
+    object that many threads may use at the same time.  It collects the
+    generators and BatchableOperations that the threads submit within a
+    short time window, and executes them together in a single call to
+    BatchExecutor.executev, routing each result back to the thread that
+    submitted it.  That way, a server handling many concurrent requests
+    can batch their operations with each other, at the cost of delaying
+    each request by up to the length of the window.
+
+    If a root raises an exception, we only raise it to the caller that
+    submitted the root.  However, the roots that we execute together
+    fail together if the execution raises an error that does not belong
+    to any one root, e.g. if a generator yields a value of the wrong
+    type or a Batcher returns a result of the wrong length.  In that
+    case, each of their callers receives the error.  Note that all of
+    the roots run on a single worker thread, so a
+    CoalescingBatchExecutor is only beneficial if the roots spend most
+    of their time waiting on Batchers.
+    """
+
+    # Private attributes:
+    # threading.Condition _condition - The condition variable for
+    #     _pending and _is_shut_down.
+    # dict _execute_kwargs - The keyword arguments to pass to
+    #     BatchExecutor.executev.
+    # bool _is_shut_down - Whether we have called shutdown().
+    # float _max_delay - The maximum number of seconds by which to delay
+    #     the execution of a root, in order to collect other roots to
+    #     execute with it.
+    # int _max_pending - The maximum number of roots to execute
+    #     together, or None if there is no maximum.
+    # list<tuple<object, _CoalescedFuture, float>> _pending - The roots
+    #     that we have yet to start executing, in the order in which
+    #     they were submitted.  Each entry consists of the root, its
+    #     future, and the time at which it was submitted, as returned by
+    #     time.time().
+    # threading.Thread _worker - The thread that executes the roots.
+
+    def __init__(self, max_delay=0.002, max_pending=None, **kwargs):
+        """Initialize a CoalescingBatchExecutor and start its worker thread.
+
+        float max_delay - The maximum number of seconds by which to
+            delay the execution of a root, in order to collect other
+            roots to execute with it.
+        int max_pending - The maximum number of roots to execute
+            together, or None if there is no maximum.  Once this many
+            roots are waiting, we start executing them without waiting
+            for the rest of the window.
+        dict kwargs - Keyword arguments for the executions, as in the
+            "kwargs" argument to BatchExecutor.execute.
+        """
+        self._max_delay = max_delay
+        self._max_pending = max_pending
+        self._execute_kwargs = kwargs
+        self._condition = threading.Condition()
+        self._pending = []
+        self._is_shut_down = False
+        self._worker = threading.Thread(target=self._run)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def submit(self, generator_or_operation):
+        """Submit a batch generator or BatchableOperation for execution.
+
+        object generator_or_operation - The batch generator or
+            BatchableOperation.
+        return object - A future for the result of
+            generator_or_operation.  This is an object with a
+            result(timeout=None) method that waits for
+            generator_or_operation to finish and returns its result or
+            raises its exception, and a done() method that returns
+            whether it is finished.
+        """
+        if not isinstance(
+                generator_or_operation, (GeneratorType, BatchableOperation)):
+            raise TypeError(
+                'CoalescingBatchExecutor accepts only generators and '
+                'BatchableOperations')
+        future = _CoalescedFuture()
+        with self._condition:
+            if self._is_shut_down:
+                raise RuntimeError(
+                    'Cannot submit to a CoalescingBatchExecutor that has '
+                    'been shut down')
+            self._pending.append(
+                (generator_or_operation, future, time.time()))
+            self._condition.notify()
+        return future
+
+    def execute(self, generator_or_operation):
+        """Execute a batch generator or BatchableOperation.
+
+        Execute generator_or_operation along with the roots that other
+        threads submit at around the same time.  See the comments for
+        BatchExecutor.execute.
+
+        object generator_or_operation - The batch generator or
+            BatchableOperation.
+        return mixed - The result of generator_or_operation.
+        """
+        return self.submit(generator_or_operation).result()
+
+    def shutdown(self):
+        """Stop the worker thread once it executes the submitted roots."""
+        with self._condition:
+            self._is_shut_down = True
+            self._condition.notify()
+        self._worker.join()
+
+    def _is_window_full(self):
+        """Return whether we have collected the maximum number of roots."""
+        return (
+            self._max_pending is not None and
+            len(self._pending) >= self._max_pending)
+
+    def _take_pending(self):
+        """Wait for the next window to close, and return its roots.
+
+        return list<tuple<object, _CoalescedFuture>> - The roots to
+            execute together, paired with their futures, or None if we
+            have shut down and there are no roots left to execute.
+        """
+        with self._condition:
+            while not self._pending and not self._is_shut_down:
+                self._condition.wait()
+            # The window closes max_delay seconds after the oldest
+            # pending root was submitted
+            while not self._is_shut_down and not self._is_window_full():
+                remaining = self._pending[0][2] + self._max_delay - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            if not self._pending:
+                return None
+
+            if self._max_pending is None:
+                pending = self._pending
+                self._pending = []
+            else:
+                pending = self._pending[:self._max_pending]
+                self._pending = self._pending[self._max_pending:]
+            return list([
+                (generator_or_operation, future)
+                for generator_or_operation, future, submit_time in pending])
+
+    @staticmethod
+    def _gen_capture(generator_or_operation):
+        """Capture the outcome of a root.
+
+        Return a pair consisting of the result of generator_or_operation
+        and information about the exception it raised, as returned by
+        sys.exc_info(), or None if it did not raise an exception.
+        """
+        try:
+            result = yield generator_or_operation
+        except Exception:
+            yield GenResult((None, sys.exc_info()))
+        yield GenResult((result, None))
+
+    def _run(self):
+        """Execute the submitted roots until we shut down."""
+        while True:
+            pending = self._take_pending()
+            if pending is None:
+                return
+            roots = list([
+                CoalescingBatchExecutor._gen_capture(generator_or_operation)
+                for generator_or_operation, future in pending])
+            try:
+                outcomes = BatchExecutor.executev(
+                    roots, **self._execute_kwargs)
+            except Exception:
+                # An error that is not specific to any one root, such as a
+                # Batcher returning a result of the wrong length
+                exception_info = sys.exc_info()
+                outcomes = [(None, exception_info)] * len(pending)
+            for (root, future), (result, exception_info) in (
+                    zip(pending, outcomes)):
+                future._set_result(result, exception_info)
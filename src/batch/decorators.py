@@ -2,6 +2,7 @@ import collections
 import frozendict
 import sys
 
+from generator_cache import GeneratorCache
 from shared_generator import SharedGenerator
 
 
@@ -36,7 +37,49 @@ def _to_hashable_value(value):
         return value
 
 
-def cached_generator(generator_cache_or_func):
+# The types of values that _to_hashable_value converts to hashable values
+_UNHASHABLE_TYPES = (
+    list, tuple, set, frozenset, dict, frozendict.frozendict,
+    frozendict.FrozenOrderedDict)
+
+# A map from each type we have checked to whether it is a subclass of one of
+# the _UNHASHABLE_TYPES.  We cache this because frozendict's types are
+# abstract base classes, which makes isinstance relatively slow.
+_is_unhashable_type = {}
+
+
+def _is_unhashable(value):
+    """Return whether _to_hashable_value must convert "value"."""
+    value_type = type(value)
+    is_unhashable = _is_unhashable_type.get(value_type)
+    if is_unhashable is None:
+        is_unhashable = issubclass(value_type, _UNHASHABLE_TYPES)
+        _is_unhashable_type[value_type] = is_unhashable
+    return is_unhashable
+
+
+def _cache_key(args, kwargs):
+    """Return the cache key for cached_generator for the given arguments.
+
+    If none of the arguments is a collection, we may use the arguments
+    as is, so we avoid the expense of calling _to_hashable_value.
+
+    tuple args - The positional arguments.
+    dict<basestring, mixed> kwargs - The keyword arguments.
+    return object - The cache key.
+    """
+    for arg in args:
+        if _is_unhashable(arg):
+            return _to_hashable_value((args, kwargs))
+    if not kwargs:
+        return args
+    for arg in kwargs.itervalues():
+        if _is_unhashable(arg):
+            return _to_hashable_value((args, kwargs))
+    return (args, frozenset(kwargs.iteritems()))
+
+
+def cached_generator(generator_cache_or_func=None, key=None):
     """Decorator for caching generator functions.
 
     Decorate a function to be the same as the decorated generator
@@ -71,48 +114,103 @@ def cached_generator(generator_cache_or_func):
     psuedo-hashable, including the "self" or "cls" argument.  A
     "pseudo-hashable" value is a hashable value, a list, tuple, set, or
     frozenset with pseudo-hashable elements, or a dict, frozendict, or
-    FrozenOrderedDict with pseudo-hashable values.
+    FrozenOrderedDict with pseudo-hashable values.  Converting
+    collections to hashable values takes time, so for frequently called
+    functions, it is faster to pass hashable arguments such as ints and
+    strings.  Alternatively, we may pass a "key" function that computes
+    the cache key from the arguments, e.g.:
+
+    @cached_generator(key=lambda user_ids: tuple(sorted(user_ids)))
+    def gen_users(user_ids):
+        ...
+
+    By default, we cache the results of all calls to the function
+    indefinitely.  To limit the memory usage of the cache, pass a
+    GeneratorCache that bounds the number, size, and / or age of the
+    cached calls.  The GeneratorCache also reports the number of cache
+    hits, misses, and evictions.  To call the function from concurrent
+    executions on multiple threads, pass a thread-safe GeneratorCache.
+    An execution that calls the function with the same arguments as a
+    call that is still running on another thread then waits for the
+    result of that call rather than repeating it.  We do not hold the
+    cache's lock while calling the decorated function, so if two
+    threads call it with the same arguments at the same time, both
+    calls may happen, but we only use the generator from one of them.
 
     mixed generator_cache_or_func - If the cached_generator decorator
-        receives an argument, this must be of type GeneratorCache.  We
-        may use the GeneratorCache to clear the results of previous
-        calls to the function.
+        receives arguments, this must be of type GeneratorCache or None.
+        We may use the GeneratorCache to clear the results of previous
+        calls to the function or to bound them.
+    callable key - The function that returns the cache key for a call,
+        given the call's arguments, or None to use the arguments
+        themselves.  The cache key must be hashable, and calls with the
+        same cache key must have the same result.
     """
-    has_cache = not callable(generator_cache_or_func)
+    if callable(generator_cache_or_func):
+        generator_cache = None
+    else:
+        generator_cache = generator_cache_or_func
 
     def decorator(func):
-        shared_generators_list = [{}]
+        if generator_cache is not None:
+            cache = generator_cache
+        else:
+            cache = GeneratorCache()
+
+        def get_or_call(cache_key, args, kwargs):
+            """Return the SharedGenerator or exception info for a call.
+
+            Call "func" and cache the outcome if we have not cached the
+            call already.  We call "func" and create the SharedGenerator
+            without holding cache._lock, so that slow calls do not block
+            other threads.  If another thread caches the call in the
+            meantime, we return its outcome instead of ours.
+            """
+            if cache._lock is None:
+                shared_generator_or_exception_info = cache._get(
+                    func, cache_key)
+            else:
+                with cache._lock:
+                    shared_generator_or_exception_info = cache._get(
+                        func, cache_key)
+            if shared_generator_or_exception_info is not None:
+                return shared_generator_or_exception_info
+
+            try:
+                generator = func(*args, **kwargs)
+            except:
+                shared_generator_or_exception_info = sys.exc_info()
+            else:
+                shared_generator_or_exception_info = SharedGenerator(
+                    generator, cache._is_thread_safe)
+            if cache._lock is None:
+                cache._set(
+                    func, cache_key, shared_generator_or_exception_info)
+                return shared_generator_or_exception_info
+            with cache._lock:
+                cached_shared_generator_or_exception_info = cache._get(
+                    func, cache_key)
+                if cached_shared_generator_or_exception_info is not None:
+                    return cached_shared_generator_or_exception_info
+                cache._set(
+                    func, cache_key, shared_generator_or_exception_info)
+            return shared_generator_or_exception_info
 
         def gen_with_cache(*args, **kwargs):
-            cache_key = _to_hashable_value((args, kwargs))
-            shared_generators = shared_generators_list[0]
-            if has_cache and not shared_generators:
-                # Either we have never called the function or GeneratorCache
-                # has cleared shared_generators
-                shared_generators = (
-                    generator_cache_or_func._create_shared_generators_map())
-                shared_generators_list[0] = shared_generators
-
-            shared_generator_or_exception_info = shared_generators.get(
-                cache_key)
-            if shared_generator_or_exception_info is None:
-                try:
-                    generator = func(*args, **kwargs)
-                except:
-                    shared_generators[cache_key] = sys.exc_info()
-                    raise
-                shared_generator = SharedGenerator(generator)
-                shared_generators[cache_key] = shared_generator
-                return shared_generator.gen()
-            elif (isinstance(
-                    shared_generator_or_exception_info, SharedGenerator)):
+            if key is not None:
+                cache_key = key(*args, **kwargs)
+            else:
+                cache_key = _cache_key(args, kwargs)
+            shared_generator_or_exception_info = get_or_call(
+                cache_key, args, kwargs)
+            if isinstance(
+                    shared_generator_or_exception_info, SharedGenerator):
                 return shared_generator_or_exception_info.gen()
             else:
-                raise (
-                    shared_generator_or_exception_info[1], None,
-                    shared_generator_or_exception_info[2])
+                exception_info = shared_generator_or_exception_info
+                raise exception_info[1], None, exception_info[2]
         return gen_with_cache
-    if has_cache:
-        return decorator
-    else:
+    if callable(generator_cache_or_func):
         return decorator(generator_cache_or_func)
+    else:
+        return decorator
@@ -1,9 +1,31 @@
+import collections
+import heapq
+import itertools
 import sys
+import threading
+import time
+import timeit
 from types import GeneratorType
 
 from gen_result import GenResult
-from node import BatchNode
+from node import BatcherNode
+from node import GeneratorNode
+from node import OperationNode
+from node import RootNode
+from operation import AsyncBatcher
 from operation import BatchableOperation
+from operation import Batcher
+from operation_error import OperationError
+from shared_generator import SharedGenerator
+
+
+# The thread-local state for detecting nested executions.  The
+# "traced_generator" attribute, if present and not None, is a pair of the
+# Tracer of the execution that is advancing a generator on the thread and
+# the generator.  The "executor" attribute, if present and not None, is
+# the BatchExecutor that is advancing a generator on the thread, provided
+# that the thread is the one that is running the execution.
+_thread_state = threading.local()
 
 
 class BatchExecutor(object):
@@ -13,35 +35,102 @@ class BatchExecutor(object):
     """
 
     # Private attributes:
-    # dict<Generator, BatchNode> _generator_nodes - A map to the
+    # dict<BatcherNode, float> _batch_start_times - A map from the
+    #     batcher nodes of the batches we have started executing and
+    #     have not finished to the times at which we started them, as
+    #     returned by timeit.default_timer().  This is None if _tracer is
+    #     None.
+    # deque<int> _completed_root_indices - The indices of the results of
+    #     executev_iter that are finished but that we have not yielded,
+    #     or None if we are not computing executev_iter.
+    # dict<Batcher, list<OperationNode>> _deferred_writes - A map from
+    #     the last-write-wins Batchers to the operation nodes whose
+    #     batches we are deferring until we have nothing else to do, or
+    #     None if we are not deferring writes.  See the defer_writes
+    #     argument to "execute".
+    # iterator<int> _delayed_batch_sequence - The sequence numbers for
+    #     _delayed_batches.
+    # list<tuple<float, int, BatcherNode>> _delayed_batches - A heap of
+    #     the batches we are waiting to retry, as suggested by
+    #     Batcher.retry_policy().  Each entry consists of the time at
+    #     which to retry the batch, as returned by time.time(), a
+    #     sequence number for breaking ties, and the batcher node for the
+    #     retry.
+    # set<tuple<Batcher, Batcher>> _dependencies - The dependencies
+    #     between Batchers we have observed, as in the argument to
+    #     BatchScheduler.observe_dependencies, or None if _scheduler does
+    #     not track dependencies.
+    # bool _fail_fast - Whether to cancel the remaining children of a
+    #     generator node as soon as it receives an exception, as in the
+    #     fail_fast argument to "execute".
+    # dict<Generator, GeneratorNode> _generator_nodes - A map to the
     #     generator nodes in the graph from their generators.
-    # set<BatchNode> _leaf_generator_nodes - The generator nodes in the
-    #     graph that have no children.
-    # dict<Batcher, set<BatchNode>> _leaf_operation_nodes - A map from
-    #     the batchers of the operation nodes in the graph that have no
-    #     children to the operation nodes.
-    # BatchNode _root_node - The graph's root node.
+    # dict<Batcher, int> _in_flight_batch_counts - A map from the
+    #     batchers of the batches we have started executing and have
+    #     not finished to the numbers of such batches.
+    # set<GeneratorNode> _leaf_generator_nodes - The generator nodes in
+    #     the graph that have no children.
+    # dict<Batcher, list<OperationNode>> _leaf_operation_nodes - A map
+    #     from the batchers of the operation nodes in the graph that
+    #     have no children to the operation nodes.
+    # set<OperationNode> _merged_operation_nodes - The operation nodes
+    #     we took from _outer_executor's graph to execute in our
+    #     batches, whose results we must forward to _outer_executor.
+    # deque<tuple<OperationNode, object, tuple<type, mixed, traceback>>>
+    #     _merged_results - The results that nested executions computed
+    #     for operation nodes they took from our graph, which we have
+    #     not transmitted.  Each entry consists of the operation node,
+    #     the result, and information about the exception the operation
+    #     raised, as returned by sys.exc_info().  At most one of the
+    #     last two elements is not None.
+    # BatchExecutor _outer_executor - The executor that was advancing a
+    #     generator on the current thread when we started executing,
+    #     whose pending operations we merge into our batches, or None.
+    # deque<tuple<BatcherNode, object>> _pending_batches - The batches of
+    #     AsyncBatchers that we have started executing but whose results
+    #     we have not obtained, in the order in which we started them.
+    #     Each pair consists of the batcher node and the future returned
+    #     by AsyncBatcher.start_batch.
+    # dict<GeneratorNode, Batcher> _resuming_batchers - A map from
+    #     generator nodes to the Batchers of the batches whose results
+    #     most recently resumed them, directly or through finished
+    #     generators.  This is None if we are not tracking _dependencies.
+    # RootNode _root_node - The graph's root node.
+    # BatchScheduler _scheduler - The scheduler for choosing the next
+    #     batch to execute, as in the scheduler argument to "execute",
+    #     or None to choose arbitrarily.
+    # bool _strict_rounds - Whether to proceed in rounds even if
+    #     _thread_pool is None, as in the strict_rounds argument to
+    #     "execute".
+    # object _thread_pool - The thread pool for advancing the Generators
+    #     returned by Batcher.gen_batch concurrently, as in the
+    #     thread_pool argument to "execute", or None if we are not
+    #     running them concurrently.
+    # Tracer _tracer - The tracer to notify of the events in the
+    #     execution, as in the tracer argument to "execute", or None.
 
     def _generator_node(self, generator, parent, result_index):
-        """Return a BatchNode for the specified Generator.
+        """Return a GeneratorNode for the specified Generator.
 
         Reuse the generator's existing node if it is present, and create
-        a new node if not.  Add a mapping from "parent" to result_index
-        in the node's parent_to_result_index field, and add the node to
-        parent.children.
+        a new node if not.  Add "parent" to the node's parents with the
+        specified result index.  If "parent" was not already a parent of
+        the node, increment parent.pending_count, unless "parent" is a
+        batcher node.
 
         Generator generator - The generator.
         BatchNode parent - The parent node.
         int result_index - The result index.
-        return BatchNode - The generator node.
+        return GeneratorNode - The generator node.
         """
         generator_node = self._generator_nodes.get(generator)
         if generator_node is None:
-            generator_node = BatchNode.create_generator_node(generator)
+            generator_node = GeneratorNode(generator)
             self._generator_nodes[generator] = generator_node
             self._leaf_generator_nodes.add(generator_node)
-        generator_node.parent_to_result_index[parent] = result_index
-        parent.children.add(generator_node)
+        if (generator_node.add_parent(parent, result_index) and
+                not parent.is_batcher_node()):
+            parent.pending_count += 1
         return generator_node
 
     def _generator_or_operation_node(
@@ -65,36 +154,110 @@ class BatchExecutor(object):
                 generator_or_operation, parent, result_index)
         elif isinstance(generator_or_operation, BatchableOperation):
             # Create an operation node
-            operation_node = BatchNode.create_operation_node(
+            operation_node = OperationNode(
                 generator_or_operation, parent, result_index)
+            if self._resuming_batchers is not None:
+                resuming_batcher = self._resuming_batchers.get(parent)
+                if resuming_batcher is not None:
+                    self._dependencies.add(
+                        (resuming_batcher, operation_node.batcher))
             self._leaf_operation_nodes.setdefault(
-                operation_node.batcher, set()).add(operation_node)
+                operation_node.batcher, []).append(operation_node)
             return operation_node
         else:
             return None
 
-    def __init__(self, generators_and_operations):
+    def __init__(
+            self, generators_and_operations, thread_pool=None,
+            fail_fast=False, scheduler=None, strict_rounds=False,
+            tracer=None, defer_writes=False):
         """Initialize a BatchGenerator.
 
         Initialize a BatchGenerator for computing
-        executev(generators_and_operations).  The _run()
-        method will perform the computation.
+        executev(generators_and_operations, thread_pool=thread_pool,
+        fail_fast=fail_fast, scheduler=scheduler,
+        strict_rounds=strict_rounds, tracer=tracer,
+        defer_writes=defer_writes).  The _run() method will perform the
+        computation.
         """
+        if defer_writes:
+            self._deferred_writes = {}
+        else:
+            self._deferred_writes = None
+        self._thread_pool = thread_pool
+        self._tracer = tracer
+        if tracer is not None:
+            self._batch_start_times = {}
+        else:
+            self._batch_start_times = None
+        self._strict_rounds = strict_rounds
+        self._fail_fast = fail_fast
+        self._scheduler = scheduler
+        if scheduler is not None and scheduler.tracks_dependencies():
+            self._dependencies = set()
+            self._resuming_batchers = {}
+        else:
+            self._dependencies = None
+            self._resuming_batchers = None
         self._leaf_generator_nodes = set()
         self._leaf_operation_nodes = {}
+        self._outer_executor = None
+        self._merged_operation_nodes = None
+        self._merged_results = collections.deque()
+        self._pending_batches = collections.deque()
+        self._delayed_batches = []
+        self._delayed_batch_sequence = itertools.count()
+        self._in_flight_batch_counts = {}
         self._generator_nodes = {}
-        self._root_node = BatchNode.create_root_node()
-        self._root_node.results = [None] * len(generators_and_operations)
-
-        # Add the root node's children
+        self._completed_root_indices = None
+        self._root_node = RootNode(len(generators_and_operations))
         for (index, generator_or_operation) in (
                 enumerate(generators_and_operations)):
-            node = self._generator_or_operation_node(
-                generator_or_operation, self._root_node, index)
-            if node is None:
-                raise TypeError(
-                    'execute_batches and the like accept only generators and '
-                    'BatchableOperations as arguments')
+            self._add_root(generator_or_operation, index)
+
+    def _add_root(self, generator_or_operation, index):
+        """Add a child of the root node for one of the executor's results.
+
+        mixed generator_or_operation - The generator or
+            BatchableOperation whose result to compute.
+        int index - The index of the result.
+        """
+        node = self._generator_or_operation_node(
+            generator_or_operation, self._root_node, index)
+        if node is None:
+            raise TypeError(
+                'execute_batches and the like accept only generators and '
+                'BatchableOperations as arguments')
+
+    def _store_result(self, parent, result, result_index):
+        """Store a child's result in a root or generator node.
+
+        Store the result in parent.results, and record that the child is
+        finished.
+
+        BatchNode parent - The root or generator node.
+        mixed result - The result value.
+        int result_index - The index in parent.results in which to store
+            the result.
+        """
+        parent.results[result_index] = result
+        if (self._completed_root_indices is not None and
+                parent.is_root_node()):
+            self._completed_root_indices.append(result_index)
+        self._finish_child(parent)
+
+    def _finish_child(self, parent):
+        """Record that a child of a root or generator node is finished.
+
+        Decrement parent.pending_count, and add "parent" to
+        _leaf_generator_nodes if it is a generator node that is no
+        longer waiting on any children.
+
+        BatchNode parent - The root or generator node.
+        """
+        parent.pending_count -= 1
+        if parent.pending_count == 0 and parent.is_generator_node():
+            self._leaf_generator_nodes.add(parent)
 
     def _transmit_result(self, generator_node, parent, result, result_index):
         """Send the result of a generator node in a parent node.
@@ -102,7 +265,7 @@ class BatchExecutor(object):
         Send the result "result" of the generator node generator_node to
         the parent node "parent".
 
-        BatchNode generator_node - The generator node.
+        GeneratorNode generator_node - The generator node.
         BatchNode parent - The parent node.
         mixed result - The result value.
         int result_index - The index in parent.results in which to store
@@ -110,10 +273,13 @@ class BatchExecutor(object):
         """
         if not parent.is_batcher_node():
             # Transmit the result to a root or generator node
-            parent.results[result_index] = result
-            parent.children.remove(generator_node)
-            if not parent.children and not parent.is_root_node():
-                self._leaf_generator_nodes.add(parent)
+            if (self._resuming_batchers is not None and
+                    parent.is_generator_node()):
+                resuming_batcher = self._resuming_batchers.get(
+                    generator_node)
+                if resuming_batcher is not None:
+                    self._resuming_batchers[parent] = resuming_batcher
+            self._store_result(parent, result, result_index)
         else:
             batcher_node = parent
 
@@ -124,26 +290,83 @@ class BatchExecutor(object):
                     'list or tuple'.format(
                         batcher_node.batcher.__class__.__name__,
                         result.__class__.__name__))
-            elif len(result) != batcher_node.operation_count:
+            elif len(result) != len(batcher_node.operation_nodes):
                 raise ValueError(
                     'The result of {:s}.gen_batch did not have the same '
                     'length as the argument to gen_batch'.format(
                         batcher_node.batcher.__class__.__name__))
 
+            self._finish_in_flight_batch(batcher_node.batcher)
+            if self._tracer is not None:
+                self._trace_batch_finished(batcher_node, None)
+            result_cache = batcher_node.batcher.result_cache()
+            if result_cache is not None:
+                BatchExecutor._cache_results(
+                    result_cache, batcher_node.operation_nodes, result)
+
             # Transmit the batch's results to the operation nodes
             for (operation_node, index) in (
-                    batcher_node.parent_to_operation_index.iteritems()):
-                operation_node.parent.results[operation_node.result_index] = (
-                    result[index])
-                operation_node.parent.children.remove(operation_node)
-                if (not operation_node.parent.children and
-                        not operation_node.parent.is_root_node()):
-                    self._leaf_generator_nodes.add(operation_node.parent)
+                    batcher_node.iter_operation_nodes()):
+                if operation_node.is_cancelled:
+                    continue
+                operation_result = result[index]
+                if (self._resuming_batchers is not None and
+                        operation_node.parent.is_generator_node()):
+                    self._resuming_batchers[operation_node.parent] = (
+                        batcher_node.batcher)
+                if isinstance(operation_result, OperationError):
+                    self._transmit_operation_exception(
+                        operation_node, operation_result._exception_info)
+                elif not self._forward_merged_result(
+                        operation_node, operation_result, None):
+                    self._store_result(
+                        operation_node.parent, operation_result,
+                        operation_node.result_index)
+
+    @staticmethod
+    def _cache_results(result_cache, operation_nodes, results):
+        """Store the results of a batch in a Batcher's result cache.
+
+        LruCache result_cache - The cache, as returned by
+            Batcher.result_cache().
+        list<OperationNode> operation_nodes - The operation nodes whose
+            operations we passed to the Batcher.
+        list|tuple results - The results of the operations.
+        """
+        for operation_node, result in zip(operation_nodes, results):
+            if result is not None and not isinstance(result, OperationError):
+                key = operation_node.operation.identity_key()
+                if key is not None:
+                    result_cache.set(key, result)
+
+    def _transmit_cached_results(self, result_cache, operation_nodes):
+        """Transmit the results of operations from a Batcher's result cache.
+
+        LruCache result_cache - The cache, as returned by
+            Batcher.result_cache().
+        list<OperationNode> operation_nodes - The operation nodes for
+            the operations we are about to execute.
+        return list<OperationNode> - The operation nodes whose results
+            were not cached.
+        """
+        uncached_nodes = []
+        for operation_node in operation_nodes:
+            key = operation_node.operation.identity_key()
+            if key is None:
+                result = None
+            else:
+                result = result_cache.get(key)
+            if result is None:
+                uncached_nodes.append(operation_node)
+            elif not self._forward_merged_result(operation_node, result, None):
+                self._store_result(
+                    operation_node.parent, result, operation_node.result_index)
+        return uncached_nodes
 
     def _transmit_exception(self, generator_node, parent, exception_info):
         """Propagate an exception from generator_node to its parent "parent".
 
-        BatchNode generator_node - The generator node from which to
+        GeneratorNode generator_node - The generator node from which to
             propagate the exception.  If the exception did not occur in
             a generator node, this is None.
         BatchNode parent - The parent of generator_node to which to
@@ -156,23 +379,113 @@ class BatchExecutor(object):
             # of _run().
             raise exception_info[1], None, exception_info[2]
         elif parent.is_generator_node():
-            parent.exception_info = exception_info
-            parent.children.remove(generator_node)
-            if not parent.children:
-                self._leaf_generator_nodes.add(parent)
+            if self._fail_fast:
+                self._fail_generator_node(parent, exception_info)
+            else:
+                parent.exception_info = exception_info
+                self._finish_child(parent)
         else:
             # Batcher node
-            for operation_node in parent.parent_to_operation_index.iterkeys():
-                grandparent = operation_node.parent
-                grandparent.exception_info = exception_info
-                grandparent.children.remove(operation_node)
-                if not grandparent.children:
-                    self._leaf_generator_nodes.add(grandparent)
+            self._finish_in_flight_batch(parent.batcher)
+            if self._tracer is not None:
+                self._trace_batch_finished(parent, exception_info)
+            if self._retry_batch(parent, exception_info):
+                return
+            for operation_node, index in parent.iter_operation_nodes():
+                if not operation_node.is_cancelled:
+                    self._transmit_operation_exception(
+                        operation_node, exception_info)
 
-    def _iterate_generator_node(self, node):
+    def _transmit_operation_exception(self, operation_node, exception_info):
+        """Propagate an exception from an operation node to its parent.
+
+        OperationNode operation_node - The operation node.
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception, as returned by sys.exc_info().
+        """
+        if self._forward_merged_result(operation_node, None, exception_info):
+            return
+        parent = operation_node.parent
+        if parent.is_root_node():
+            raise exception_info[1], None, exception_info[2]
+        elif self._fail_fast:
+            self._fail_generator_node(parent, exception_info)
+        else:
+            parent.exception_info = exception_info
+            self._finish_child(parent)
+
+    def _fail_generator_node(self, node, exception_info):
+        """Propagate an exception to a generator node in fail-fast mode.
+
+        Cancel the node's remaining children, and make it ready to
+        receive the exception.
+
+        GeneratorNode node - The generator node.
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception, as returned by sys.exc_info().
+        """
+        node.exception_info = exception_info
+        self._cancel_children(node)
+        node.pending_count = 0
+        self._leaf_generator_nodes.add(node)
+
+    def _cancel_children(self, node):
+        """Cancel the children of a generator node in fail-fast mode.
+
+        Cancel the operation nodes, so that we do not execute their
+        operations, or if we already have, so that we ignore their
+        results.  Detach the generator nodes from "node", and cancel
+        those that have no other parents, closing their generators.  We
+        do not close the Generators that SharedGenerators share, since
+        other generators may yield them later, but we keep running them
+        in order to compute their results.
+
+        GeneratorNode node - The generator node.
+        """
+        if node.children is None:
+            return
+        children = node.children
+        node.children = None
+        for child in children:
+            if child.is_operation_node():
+                child.is_cancelled = True
+            elif self._generator_nodes.get(child.generator) is child:
+                child.remove_parent(node)
+                if (child.parent is None and
+                        not SharedGenerator._is_shared_generator(
+                            child.generator)):
+                    self._cancel_children(child)
+                    self._leaf_generator_nodes.discard(child)
+                    del self._generator_nodes[child.generator]
+                    child.generator.close()
+
+    def _trace_batch_finished(self, batcher_node, exception_info):
+        """Notify _tracer that a batch is finished.
+
+        BatcherNode batcher_node - The batcher node for the batch.
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception the batch raised, as returned by
+            sys.exc_info(), or None if it did not raise an exception.
+        """
+        start_time = self._batch_start_times.pop(batcher_node)
+        self._tracer.batch_finished(
+            batcher_node.batcher, len(batcher_node.operation_nodes),
+            timeit.default_timer() - start_time, exception_info)
+
+    def _advance_generator(self, node):
         """Perform one iteration on the specified generator node's Generator.
 
-        BatchNode node - The generator node.
+        Send the node's results or exception to its Generator, and
+        return the outcome without changing the graph.  This method
+        does not access any state other than that of "node", so it is
+        safe to call from a thread other than the one that is running
+        the executor.
+
+        GeneratorNode node - The generator node.
+        return tuple<mixed, tuple<type, mixed, traceback>> - A pair
+            consisting of the value the generator yielded and
+            information about the exception it raised, as returned by
+            sys.exc_info().  Exactly one of the elements is None.
         """
         try:
             if node.exception_info is not None:
@@ -193,36 +506,59 @@ class BatchExecutor(object):
                     results = results[0]
                 yield_value = node.generator.send(results)
         except StopIteration:
-            yield_value = GenResult(None)
+            return GenResult(None), None
         except Exception:
-            exception_info = sys.exc_info()
-            for parent in node.parent_to_result_index.copy().iterkeys():
-                if parent in node.parent_to_result_index:
-                    self._transmit_exception(node, parent, exception_info)
+            return None, sys.exc_info()
+        return yield_value, None
+
+    def _process_yield_value(self, node, yield_value, exception_info):
+        """Update the graph to reflect an iteration of a generator node.
+
+        GeneratorNode node - The generator node.
+        mixed yield_value - The value node.generator yielded, as
+            returned by _advance_generator.
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception node.generator raised, as returned by
+            _advance_generator.
+        """
+        if exception_info is not None:
+            if self._tracer is not None:
+                self._tracer.generator_raised(node.generator, exception_info)
+            for parent, result_index in node.parent_items():
+                self._transmit_exception(node, parent, exception_info)
             return
 
         if isinstance(yield_value, GenResult):
             # Transmit the result and destroy the generator node
-            for (parent, result_index) in (
-                    node.parent_to_result_index.iteritems()):
+            for (parent, result_index) in node.parent_items():
                 self._transmit_result(
                     node, parent, yield_value._value, result_index)
             node.generator.close()
             self._generator_nodes.pop(node.generator)
+            if self._resuming_batchers is not None:
+                self._resuming_batchers.pop(node, None)
         else:
             # Create child nodes for the generators and / or
             # BatchableOperations that node.generator just yielded
             node.is_result_list = isinstance(yield_value, (list, tuple))
             if not node.is_result_list:
                 yield_value = (yield_value,)
+            if self._tracer is not None:
+                self._tracer.generator_yielded(
+                    node.generator, list(yield_value))
+            if self._fail_fast:
+                node.children = []
             for (index, generator_or_operation) in enumerate(yield_value):
                 try:
                     child = self._generator_or_operation_node(
                         generator_or_operation, node, index)
                 except Exception:
                     # e.g. BatchableOperation.batcher() raised an exception
-                    node.exception_info = sys.exc_info()
-                    self._leaf_generator_nodes.add(node)
+                    if self._fail_fast:
+                        self._fail_generator_node(node, sys.exc_info())
+                    else:
+                        node.exception_info = sys.exc_info()
+                        self._leaf_generator_nodes.add(node)
                     return
                 else:
                     if child is None:
@@ -230,22 +566,363 @@ class BatchExecutor(object):
                             'Batch generators may only yield generators, '
                             'BatchableOperations, lists or tuples containing '
                             'the two, and GenResults')
+                    if node.children is not None:
+                        node.children.append(child)
             node.results = [None] * len(yield_value)
             if not yield_value:
                 self._leaf_generator_nodes.add(node)
 
+    def _iterate_generator_node(self, node):
+        """Perform one iteration on the specified generator node's Generator.
+
+        GeneratorNode node - The generator node.
+        """
+        previous_executor = getattr(_thread_state, 'executor', None)
+        _thread_state.executor = self
+        try:
+            if self._tracer is None:
+                yield_value, exception_info = self._advance_generator(node)
+            else:
+                yield_value, exception_info, seconds = (
+                    self._advance_generator_timed(node))
+        finally:
+            _thread_state.executor = previous_executor
+        if self._tracer is not None:
+            self._tracer.generator_stepped(node.generator, seconds)
+        self._process_yield_value(node, yield_value, exception_info)
+        if self._merged_results:
+            self._transmit_merged_results()
+
+    def _transmit_merged_results(self):
+        """Transmit the results in _merged_results to the operation nodes.
+        """
+        while self._merged_results:
+            operation_node, result, exception_info = (
+                self._merged_results.popleft())
+            if operation_node.is_cancelled:
+                continue
+            if exception_info is not None:
+                self._transmit_operation_exception(
+                    operation_node, exception_info)
+            else:
+                self._store_result(
+                    operation_node.parent, result,
+                    operation_node.result_index)
+
+    def _forward_merged_result(self, operation_node, result, exception_info):
+        """Forward an operation's result to _outer_executor, if appropriate.
+
+        OperationNode operation_node - The operation node.
+        mixed result - The result of the operation, if it did not raise
+            an exception.
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception the operation raised, as returned by
+            sys.exc_info(), or None.
+        return bool - Whether we forwarded the result, because we took
+            operation_node from _outer_executor's graph.
+        """
+        if (self._merged_operation_nodes is None or
+                operation_node not in self._merged_operation_nodes):
+            return False
+        self._merged_operation_nodes.remove(operation_node)
+        self._outer_executor._merged_results.append(
+            (operation_node, result, exception_info))
+        return True
+
+    def _return_merged_operation_nodes(self):
+        """Return the merged operation nodes we did not finish to the owner.
+
+        If we stop executing before computing the results of the
+        operation nodes we took from _outer_executor's graph, e.g.
+        because of an exception, add them back to the graph, so that
+        _outer_executor executes them itself.
+        """
+        if not self._merged_operation_nodes:
+            return
+        outer_leaf_operation_nodes = self._outer_executor._leaf_operation_nodes
+        for operation_node in self._merged_operation_nodes:
+            outer_leaf_operation_nodes.setdefault(
+                operation_node.batcher, []).append(operation_node)
+        self._merged_operation_nodes = None
+
+    def _merge_outer_operation_nodes(self, batcher, operation_nodes):
+        """Add _outer_executor's pending operations to a batch, if any.
+
+        Take the operation nodes for "batcher" that are waiting to be
+        executed in _outer_executor's graph, so that they join our batch
+        instead of costing the outer execution a separate round trip.
+        We forward their results to _outer_executor, which transmits
+        them once the generator that started our execution yields.  We
+        do not take the operation nodes if _outer_executor would not
+        execute them yet, because another of its batchers must precede
+        "batcher", or because it defers the writes for "batcher".
+
+        Batcher batcher - The batcher for the batch.
+        list<OperationNode> operation_nodes - The operation nodes in our
+            graph for the batch.
+        return list<OperationNode> - The operation nodes for the batch,
+            including those we took from _outer_executor.
+        """
+        outer_executor = self._outer_executor
+        if (batcher not in outer_executor._leaf_operation_nodes or
+                (outer_executor._deferred_writes is not None and
+                    batcher.is_last_write_wins()) or
+                BatchExecutor._is_blocked(
+                    batcher, outer_executor._blocking_batchers())):
+            return operation_nodes
+        outer_nodes = outer_executor._leaf_operation_nodes.pop(batcher)
+        if self._merged_operation_nodes is None:
+            self._merged_operation_nodes = set()
+        merged_nodes = list(operation_nodes)
+        for outer_node in outer_nodes:
+            if not outer_node.is_cancelled:
+                self._merged_operation_nodes.add(outer_node)
+                merged_nodes.append(outer_node)
+        return merged_nodes
+
+    def _advance_generator_timed(self, node):
+        """Perform one iteration on the specified generator node's Generator.
+
+        This is the same as _advance_generator, but it also measures the
+        wall-clock duration of the iteration.
+
+        GeneratorNode node - The generator node.
+        return tuple<mixed, tuple<type, mixed, traceback>, float> - A
+            triple consisting of the elements of the return value of
+            _advance_generator and the number of seconds the iteration
+            took.
+        """
+        previous_traced_generator = getattr(
+            _thread_state, 'traced_generator', None)
+        _thread_state.traced_generator = (self._tracer, node.generator)
+        try:
+            start_time = timeit.default_timer()
+            yield_value, exception_info = self._advance_generator(node)
+            seconds = timeit.default_timer() - start_time
+        finally:
+            _thread_state.traced_generator = previous_traced_generator
+        return yield_value, exception_info, seconds
+
+    @staticmethod
+    def _trace_nested_execute():
+        """Notify the Tracer of the enclosing execution, if any.
+
+        If the current thread is advancing a generator for an execution
+        with a Tracer, call the Tracer's nested_execute_started method.
+        """
+        traced_generator = getattr(_thread_state, 'traced_generator', None)
+        if traced_generator is not None:
+            tracer, generator = traced_generator
+            tracer.nested_execute_started(generator)
+
+    def _iterate_generator_nodes_concurrently(self, nodes):
+        """Perform one iteration on each of the specified generator nodes.
+
+        Advance the nodes' Generators at the same time using
+        _thread_pool, if any, then update the graph on the current
+        thread.
+
+        list<GeneratorNode> nodes - The generator nodes.
+        """
+        if self._tracer is None:
+            advance_generator = self._advance_generator
+        else:
+            advance_generator = self._advance_generator_timed
+        if len(nodes) == 1 or self._thread_pool is None:
+            steps = list([advance_generator(node) for node in nodes])
+        else:
+            steps = self._thread_pool.map(advance_generator, nodes)
+        for node, step in zip(nodes, steps):
+            if self._tracer is not None:
+                self._tracer.generator_stepped(node.generator, step[2])
+            self._process_yield_value(node, step[0], step[1])
+
+    def _deduplicate(self, operation_nodes):
+        """Deduplicate operation nodes whose operations have the same result.
+
+        Deduplicate operation nodes whose operations have equal,
+        non-None identity keys, as returned by
+        BatchableOperation.identity_key().  For each set of such nodes,
+        we return the first, and we store the others in its
+        "duplicates" field.
+
+        list<OperationNode> operation_nodes - The operation nodes.  Their
+            batchers must be equal.
+        return list<OperationNode> - The deduplicated operation nodes.
+        """
+        deduplicated_nodes = []
+        key_to_node = None
+        for operation_node in operation_nodes:
+            key = operation_node.operation.identity_key()
+            if key is None:
+                deduplicated_nodes.append(operation_node)
+                continue
+            if key_to_node is None:
+                key_to_node = {}
+            first_node = key_to_node.get(key)
+            if first_node is None:
+                key_to_node[key] = operation_node
+                deduplicated_nodes.append(operation_node)
+            elif first_node.duplicates is None:
+                first_node.duplicates = [operation_node]
+            else:
+                first_node.duplicates.append(operation_node)
+        return deduplicated_nodes
+
+    def _coalesce_writes(self, batcher, operation_nodes):
+        """Coalesce operation nodes that write to the same key.
+
+        For each set of operation nodes whose operations have the same
+        non-None write key, as returned by batcher.write_key, we return
+        the last, and we store the others in its "duplicates" field.
+
+        Batcher batcher - The last-write-wins batcher for the operation
+            nodes.
+        list<OperationNode> operation_nodes - The operation nodes, as
+            returned by _deduplicate.
+        return list<OperationNode> - The coalesced operation nodes.
+        """
+        coalesced_nodes = []
+        key_to_index = {}
+        for operation_node in operation_nodes:
+            key = batcher.write_key(operation_node.operation)
+            if key is None:
+                coalesced_nodes.append(operation_node)
+                continue
+            index = key_to_index.get(key)
+            if index is None:
+                key_to_index[key] = len(coalesced_nodes)
+                coalesced_nodes.append(operation_node)
+                continue
+
+            # Replace the earlier write with this one
+            previous_node = coalesced_nodes[index]
+            duplicates = [previous_node]
+            if previous_node.duplicates is not None:
+                duplicates.extend(previous_node.duplicates)
+                previous_node.duplicates = None
+            if operation_node.duplicates is not None:
+                duplicates.extend(operation_node.duplicates)
+            operation_node.duplicates = duplicates
+            coalesced_nodes[index] = operation_node
+        return coalesced_nodes
+
+    def _split_batch(self, batcher, operation_nodes):
+        """Split a batch of operations into the batches we pass to gen_batch.
+
+        Split the batch in accordance with batcher.max_batch_size() and
+        batcher.max_batch_bytes().
+
+        Batcher batcher - The batcher for computing the batch's results.
+        list<OperationNode> operation_nodes - The operation nodes.
+        return list<list<OperationNode>> - The operation nodes for each
+            of the batches.
+        """
+        max_size = batcher.max_batch_size()
+        max_bytes = batcher.max_batch_bytes()
+        if max_bytes is None:
+            if max_size is None or len(operation_nodes) <= max_size:
+                return [operation_nodes]
+            return list([
+                operation_nodes[index:index + max_size]
+                for index in xrange(0, len(operation_nodes), max_size)])
+
+        chunks = []
+        chunk = []
+        chunk_bytes = 0
+        for operation_node in operation_nodes:
+            operation_bytes = batcher.operation_bytes(operation_node.operation)
+            if (chunk and
+                    (chunk_bytes + operation_bytes > max_bytes or
+                        (max_size is not None and len(chunk) >= max_size))):
+                chunks.append(chunk)
+                chunk = []
+                chunk_bytes = 0
+            chunk.append(operation_node)
+            chunk_bytes += operation_bytes
+        chunks.append(chunk)
+        return chunks
+
     def _execute_batch(self, batcher, operation_nodes):
         """Start computing the results of a batch of operations.
 
+        Add nodes to compute the results of a batch of operations for
+        the specified operation nodes.  If the batch exceeds the size
+        limits of "batcher", we add one node for each of the batches we
+        split it into.
+
+        Batcher batcher - The batcher for computing the batch's results.
+        list<OperationNode> operation_nodes - The operation nodes.
+        """
+        if (self._deferred_writes is not None and
+                batcher.is_last_write_wins()):
+            self._deferred_writes.setdefault(batcher, []).extend(
+                operation_nodes)
+            return
+        self._execute_ready_batch(batcher, operation_nodes)
+
+    def _execute_ready_batch(self, batcher, operation_nodes):
+        """Start computing the results of a batch of operations now.
+
+        This is the same as _execute_batch, but it does not defer the
+        batch.
+        """
+        if self._fail_fast:
+            operation_nodes = list([
+                operation_node for operation_node in operation_nodes
+                if not operation_node.is_cancelled])
+            if not operation_nodes:
+                return
+        if self._outer_executor is not None:
+            operation_nodes = self._merge_outer_operation_nodes(
+                batcher, operation_nodes)
+        result_cache = batcher.result_cache()
+        if result_cache is not None:
+            operation_nodes = self._transmit_cached_results(
+                result_cache, operation_nodes)
+            if not operation_nodes:
+                return
+        operation_nodes = self._deduplicate(operation_nodes)
+        if batcher.is_last_write_wins():
+            operation_nodes = self._coalesce_writes(batcher, operation_nodes)
+        for chunk in self._split_batch(batcher, operation_nodes):
+            self._start_batch(batcher, chunk)
+
+    def _start_batch(self, batcher, operation_nodes):
+        """Start computing the results of a batch of operations.
+
         Add a node to compute the results of a batch of operations for
         the specified operation nodes.
 
         Batcher batcher - The batcher for computing the batch's results.
-        object operation_nodes - A list or tuple of operation
-            BatchNodes.
+        list<OperationNode> operation_nodes - The operation nodes.  We
+            pass their operations to gen_batch, and we also transmit the
+            results to the nodes in their "duplicates" fields.
         """
-        batcher_node = BatchNode.create_batcher_node(batcher, operation_nodes)
-        operations = list([node.operation for node in operation_nodes])
+        self._start_batcher_node(BatcherNode(batcher, operation_nodes))
+
+    def _start_batcher_node(self, batcher_node):
+        """Start computing the results of a batch of operations.
+
+        BatcherNode batcher_node - The batcher node for the batch.
+        """
+        batcher = batcher_node.batcher
+        operations = list([
+            node.operation for node in batcher_node.operation_nodes])
+        self._in_flight_batch_counts[batcher] = (
+            self._in_flight_batch_counts.get(batcher, 0) + 1)
+        if self._tracer is not None:
+            self._tracer.batch_started(batcher, len(operations))
+            self._batch_start_times[batcher_node] = timeit.default_timer()
+        if isinstance(batcher, AsyncBatcher):
+            try:
+                future = batcher.start_batch(operations)
+            except Exception:
+                self._transmit_exception(None, batcher_node, sys.exc_info())
+            else:
+                self._pending_batches.append((batcher_node, future))
+            return
+
         try:
             generator = batcher.gen_batch(operations)
         except Exception:
@@ -259,27 +936,386 @@ class BatchExecutor(object):
                 generator, batcher_node, None)
             self._leaf_generator_nodes.add(generator_node)
 
-    def _run(self):
-        """Compute the executor's results.
+    def _finish_in_flight_batch(self, batcher):
+        """Record that we finished executing a batch for the given Batcher.
+        """
+        count = self._in_flight_batch_counts[batcher]
+        if count == 1:
+            del self._in_flight_batch_counts[batcher]
+        else:
+            self._in_flight_batch_counts[batcher] = count - 1
 
-        Compute the results of the generators and BatchableOperations
-        passed to the constructor.  This method may only be called once
-        per instance.
+    def _blocking_batchers(self):
+        """Return the batchers whose batches may block those of others.
+
+        These are the batchers with operations that are ready to
+        execute, with batches that are executing, and with batches that
+        we are deferring or waiting to retry.  We omit batchers that do
+        not override Batcher.must_precede, since they cannot block other
+        batchers.  Typically, this is all of them, so we can skip
+        comparing each pair of batchers.
+
+        return set<Batcher> - The batchers.
+        """
+        batchers = set(self._leaf_operation_nodes)
+        batchers.update(self._in_flight_batch_counts)
+        if self._deferred_writes:
+            batchers.update(self._deferred_writes)
+        for retry_time, sequence, batcher_node in self._delayed_batches:
+            batchers.add(batcher_node.batcher)
+        return set([
+            batcher for batcher in batchers
+            if BatchExecutor._overrides_must_precede(batcher)])
+
+    @staticmethod
+    def _overrides_must_precede(batcher):
+        """Return whether the specified batcher overrides must_precede.
+
+        Batcher batcher - The batcher.
+        return bool - Whether type(batcher) overrides
+            Batcher.must_precede.
+        """
+        return (
+            type(batcher).must_precede.__func__ is not
+            Batcher.must_precede.__func__)
+
+    @staticmethod
+    def _is_blocked(batcher, blocking_batchers):
+        """Return whether one of the specified batchers must precede another.
+
+        Batcher batcher - The batcher that may be blocked.
+        set<Batcher> blocking_batchers - The batchers that may block it,
+            as returned by _blocking_batchers().
+        return bool - Whether one of blocking_batchers other than
+            "batcher" must precede "batcher", as indicated by
+            Batcher.must_precede.
+        """
+        for other_batcher in blocking_batchers:
+            if (other_batcher != batcher and
+                    other_batcher.must_precede(batcher)):
+                return True
+        return False
+
+    def _unblocked_batchers(self):
+        """Return the batchers in _leaf_operation_nodes we may execute now.
+
+        A batcher is blocked if another batcher in _blocking_batchers()
+        must precede it, as indicated by Batcher.must_precede.  If every
+        batcher is blocked, and none of the blocking batches can finish
+        without executing more batches, we ignore the constraints, since
+        they must form a cycle.
+
+        return list<Batcher> - The unblocked batchers.  This is empty
+            only if we are deferring writes, executing a batch for an
+            AsyncBatcher, or waiting to retry a batch, and each of the
+            batchers in _leaf_operation_nodes must wait.  In this case,
+            we should call _unblock_batchers().
+        """
+        batchers = self._leaf_operation_nodes.keys()
+        if (len(batchers) == 1 and not self._in_flight_batch_counts and
+                not self._deferred_writes and not self._delayed_batches):
+            return batchers
+        blocking_batchers = self._blocking_batchers()
+        if not blocking_batchers:
+            return batchers
+        unblocked_batchers = list([
+            batcher for batcher in batchers
+            if not BatchExecutor._is_blocked(batcher, blocking_batchers)])
+        if (unblocked_batchers or self._deferred_writes or
+                self._pending_batches or self._delayed_batches):
+            return unblocked_batchers
+        return batchers
+
+    def _unblock_batchers(self):
+        """Make progress when all of the ready batchers are blocked.
+
+        Start executing the deferred writes, if any.  Otherwise, wait
+        for the results of the oldest batch in _pending_batches, if
+        any, or else for the first batch in _delayed_batches to be due.
+        This method assumes that _unblocked_batchers() returned an empty
+        list.
+        """
+        if self._deferred_writes:
+            self._execute_deferred_writes()
+        elif self._pending_batches:
+            self._finish_pending_batch()
+        else:
+            self._start_delayed_batches(True)
+
+    def _retry_batch(self, batcher_node, exception_info):
+        """Schedule a failed batch to be retried, if appropriate.
+
+        Consult batcher_node.batcher.retry_policy() to determine whether
+        to retry the batch.  If so, add one or two batcher nodes to
+        _delayed_batches, depending on whether we are bisecting the
+        batch.  Bisecting a batch does not count as an attempt, so that
+        we can bisect batches of any size down to single operations.
+
+        BatcherNode batcher_node - The batcher node for the batch.
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception the batch raised, as returned by
+            sys.exc_info().
+        return bool - Whether we will retry the batch.
+        """
+        retry_policy = batcher_node.batcher.retry_policy()
+        if retry_policy is None:
+            return False
+        operation_nodes = batcher_node.operation_nodes
+        if retry_policy.bisect and len(operation_nodes) > 1:
+            if not isinstance(
+                    exception_info[1], retry_policy.retryable_exceptions):
+                return False
+            middle = len(operation_nodes) // 2
+            chunks = [operation_nodes[:middle], operation_nodes[middle:]]
+            attempt = batcher_node.attempt
+        elif retry_policy.is_retryable(
+                exception_info[1], batcher_node.attempt):
+            chunks = [operation_nodes]
+            attempt = batcher_node.attempt + 1
+        else:
+            return False
+
+        retry_time = time.time() + retry_policy.delay(batcher_node.attempt)
+        for chunk in chunks:
+            retry_node = BatcherNode(batcher_node.batcher, chunk, attempt)
+            heapq.heappush(
+                self._delayed_batches,
+                (retry_time, self._delayed_batch_sequence.next(), retry_node))
+        return True
+
+    def _start_delayed_batches(self, should_wait):
+        """Start executing the batches in _delayed_batches that are due.
+
+        bool should_wait - Whether to wait until at least one batch is
+            due, if none is.
+        """
+        if should_wait:
+            delay = self._delayed_batches[0][0] - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        now = time.time()
+        while self._delayed_batches and self._delayed_batches[0][0] <= now:
+            retry_time, sequence, batcher_node = heapq.heappop(
+                self._delayed_batches)
+            self._start_batcher_node(batcher_node)
+
+    def _finish_pending_batch(self):
+        """Wait for the results of the oldest batch in _pending_batches.
+
+        Wait for the results of the AsyncBatcher batch that we started
+        executing the longest time ago, and transmit them to the
+        operation nodes.
+        """
+        batcher_node, future = self._pending_batches.popleft()
+        try:
+            results = future.result()
+        except Exception:
+            self._transmit_exception(None, batcher_node, sys.exc_info())
+        else:
+            self._transmit_result(None, batcher_node, results, None)
+
+    def _is_batch_generator_node(self, node):
+        """Return whether "node" is for a Generator returned by gen_batch.
+
+        GeneratorNode node - The generator node.
+        return bool - The result.
         """
-        while self._leaf_generator_nodes or self._leaf_operation_nodes:
+        for parent in node.iter_parents():
+            if parent.is_batcher_node():
+                return True
+        return False
+
+    def _run_round(self):
+        """Perform one round of the computation.
+
+        Run the generator nodes that are ready to run, advancing the
+        Generators returned by Batcher.gen_batch concurrently if we have
+        a thread pool, and then start executing every batch of
+        operations that is ready to execute.
+        """
+        while self._leaf_generator_nodes:
+            batch_generator_nodes = []
+            while self._leaf_generator_nodes:
+                node = self._leaf_generator_nodes.pop()
+                if self._is_batch_generator_node(node):
+                    batch_generator_nodes.append(node)
+                else:
+                    self._iterate_generator_node(node)
+            if batch_generator_nodes:
+                self._iterate_generator_nodes_concurrently(
+                    batch_generator_nodes)
+
+        if not self._leaf_operation_nodes:
+            return
+        batchers = self._unblocked_batchers()
+        if not batchers:
+            self._unblock_batchers()
+        elif len(batchers) == len(self._leaf_operation_nodes):
+            leaf_operation_nodes = self._leaf_operation_nodes
+            self._leaf_operation_nodes = {}
+            for batcher, operation_nodes in leaf_operation_nodes.iteritems():
+                self._execute_batch(batcher, operation_nodes)
+        else:
+            for batcher in batchers:
+                self._execute_batch(
+                    batcher, self._leaf_operation_nodes.pop(batcher))
+
+    def _has_work(self):
+        """Return whether there are any nodes that are ready to make progress.
+        """
+        return bool(
+            self._leaf_generator_nodes or self._leaf_operation_nodes or
+            self._pending_batches or self._delayed_batches or
+            self._deferred_writes)
+
+    def _execute_deferred_writes(self):
+        """Start executing all of the batches in _deferred_writes."""
+        deferred_writes = self._deferred_writes
+        self._deferred_writes = {}
+        for batcher, operation_nodes in deferred_writes.iteritems():
+            self._execute_ready_batch(batcher, operation_nodes)
+
+    def _run_step(self):
+        """Make progress on the computation.
+
+        Run the generator nodes that are ready to run, and execute one or
+        more batches of operations, or wait for the results of a batch
+        for an AsyncBatcher or for the time to retry a failed batch.
+        This method assumes that _has_work() returns True.
+        """
+        if self._tracer is not None:
+            self._tracer.round_started()
+        if (self._deferred_writes and
+                not self._leaf_generator_nodes and
+                not self._leaf_operation_nodes and
+                not self._pending_batches and
+                not self._delayed_batches):
+            # Everything else is waiting on the deferred writes
+            self._execute_deferred_writes()
+        if self._delayed_batches:
+            self._start_delayed_batches(
+                not self._leaf_generator_nodes and
+                not self._leaf_operation_nodes and
+                not self._pending_batches)
+        if not self._leaf_generator_nodes and not self._leaf_operation_nodes:
+            if self._pending_batches:
+                # Everything else is waiting on an AsyncBatcher
+                self._finish_pending_batch()
+        elif self._thread_pool is None and not self._strict_rounds:
             while self._leaf_generator_nodes:
                 self._iterate_generator_node(self._leaf_generator_nodes.pop())
             if self._leaf_operation_nodes:
-                batcher, operation_nodes = self._leaf_operation_nodes.popitem()
-                self._execute_batch(batcher, list(operation_nodes))
-        if self._root_node.children:
+                batchers = self._unblocked_batchers()
+                if not batchers:
+                    self._unblock_batchers()
+                else:
+                    if self._scheduler is None:
+                        batcher = batchers[0]
+                    else:
+                        batcher = self._scheduler.choose_batcher(
+                            dict(
+                                (batcher, len(
+                                    self._leaf_operation_nodes[batcher]))
+                                for batcher in batchers))
+                    self._execute_batch(
+                        batcher, self._leaf_operation_nodes.pop(batcher))
+        else:
+            self._run_round()
+        if self._tracer is not None:
+            self._tracer.round_finished()
+
+    def _check_finished(self):
+        """Finish the computation once no nodes are ready to make progress.
+
+        Raise if the root node is waiting on nodes that cannot progress.
+        Otherwise, report the dependencies we observed to _scheduler.
+        This method assumes that _has_work() returns False.
+        """
+        if self._root_node.pending_count:
             raise RuntimeError(
                 'The generators form a cycle, i.e. there is a generator that '
                 'is waiting on its own results')
+        if self._dependencies is not None:
+            self._scheduler.observe_dependencies(self._dependencies)
+
+    def _run(self):
+        """Compute the executor's results.
+
+        Compute the results of the generators and BatchableOperations
+        passed to the constructor.  This method may only be called once
+        per instance.
+        """
+        BatchExecutor._trace_nested_execute()
+        self._outer_executor = getattr(_thread_state, 'executor', None)
+        if self._tracer is not None:
+            self._tracer.execute_started()
+        try:
+            while self._has_work():
+                self._run_step()
+            self._check_finished()
+        except Exception:
+            exception_info = sys.exc_info()
+            self._return_merged_operation_nodes()
+            if self._tracer is not None:
+                self._tracer.execute_finished(exception_info)
+            raise exception_info[1], None, exception_info[2]
+        if self._tracer is not None:
+            self._tracer.execute_finished(None)
         return self._root_node.results
 
+    def _run_iter(self, generators_and_operations, max_in_flight):
+        """Compute the results of executev_iter.
+
+        This method may only be called once per instance, and the
+        instance must have been constructed with no generators or
+        BatchableOperations.  See the comments for executev_iter.
+        """
+        self._root_node = RootNode()
+        self._completed_root_indices = collections.deque()
+        iterator = iter(generators_and_operations)
+        next_index = 0
+        is_exhausted = False
+        BatchExecutor._trace_nested_execute()
+        if self._tracer is not None:
+            self._tracer.execute_started()
+        try:
+            while True:
+                while self._completed_root_indices:
+                    index = self._completed_root_indices.popleft()
+                    yield index, self._root_node.results.pop(index)
+
+                # Keep max_in_flight results in flight
+                while (not is_exhausted and
+                        self._root_node.pending_count < max_in_flight):
+                    try:
+                        generator_or_operation = iterator.next()
+                    except StopIteration:
+                        is_exhausted = True
+                    else:
+                        self._add_root(generator_or_operation, next_index)
+                        next_index += 1
+
+                if not self._has_work():
+                    self._check_finished()
+                    break
+                self._run_step()
+        except GeneratorExit:
+            # The caller stopped iterating before we finished
+            self._return_merged_operation_nodes()
+            if self._tracer is not None:
+                self._tracer.execute_finished(None)
+            raise
+        except Exception:
+            exception_info = sys.exc_info()
+            self._return_merged_operation_nodes()
+            if self._tracer is not None:
+                self._tracer.execute_finished(exception_info)
+            raise exception_info[1], None, exception_info[2]
+        if self._tracer is not None:
+            self._tracer.execute_finished(None)
+
     @staticmethod
-    def execute(generator_or_operation):
+    def execute(generator_or_operation, **kwargs):
         """Execute batches from a generator or BatchableOperation.
 
         This coroutine assists in batching BatchableOperations in the
@@ -377,7 +1413,13 @@ class BatchExecutor(object):
         highest level possible.  In particular, calling "execute" within
         a batch generator is harmful to performance, because it
         eliminates opportunities for batching.  Batch generators should
-        use yielding instead of calling "execute".
+        use yielding instead of calling "execute".  To soften the cost
+        of existing code that does so, a nested call to "execute" merges
+        the operations that the enclosing execution has ready for the
+        same Batchers into its batches, so that the enclosing execution
+        does not need separate round trips for them.  However, the
+        nested call still blocks the generator that made it, along with
+        the rest of the enclosing execution, until it finishes.
 
         If a batch generator yields another generator or a
         BatchableOperation, and the yielded generator or the yielded
@@ -385,7 +1427,11 @@ class BatchExecutor(object):
         propagate the exception to the yielding generator.  If a
         Batcher's gen_batch method raises an exception, "execute" will
         propagate the exception to the generators that yielded the
-        BatchableOperations it is batching.  In the case of an
+        BatchableOperations it is batching.  To fail only some of the
+        operations in a batch, gen_batch may return OperationErrors in
+        place of their results, in which case "execute" propagates each
+        OperationError's exception to the generator that yielded the
+        corresponding operation.  In the case of an
         exception, we finish any generators or BatchableOperations that
         were running in parallel with the one that raised the exception
         before propagating it.
@@ -405,14 +1451,124 @@ class BatchExecutor(object):
         Two batchable generators are said to be running "in parallel" if
         the generators are both partway through execution.
 
+        By default, "execute" runs one batch of BatchableOperations at a
+        time.  If the batches' Batchers perform blocking I/O, we may
+        pass a thread pool using the thread_pool keyword argument to
+        perform the I/O for different batches at the same time.  In this
+        case, "execute" proceeds in rounds.  In each round, it runs all
+        of the generators that are ready to run, and then it starts all
+        of the batches that are ready to execute.  The iterations of
+        the Generators returned by Batcher.gen_batch take place on the
+        thread pool, so gen_batch implementations must be thread-safe.
+        All other generators run on the calling thread.
+
+        We may also have "execute" proceed in rounds without a thread
+        pool by passing strict_rounds=True.  This increases the batching
+        of BatchableOperations that Batchers' gen_batch methods yield,
+        since the gen_batch methods for all of the batches in a round
+        run before we execute any of the operations they yield.
+
+        Alternatively, Batchers that are capable of non-blocking I/O may
+        extend AsyncBatcher.  "execute" starts executing an
+        AsyncBatcher's batches without waiting for the results, and it
+        only waits for them when there is nothing else to do.  That way,
+        the round trips for multiple batches can be in flight at the
+        same time, without the need for a thread pool.
+
+        If a Batcher limits the size of its batches using
+        Batcher.max_batch_size or Batcher.max_batch_bytes, "execute"
+        splits larger batches into multiple calls to gen_batch.  Each
+        such call receives its own list of operations, and it returns
+        the results for that list.  The calls are executed at the same
+        time, in the sense that none of them waits for the others to
+        finish, so they benefit from a thread pool or AsyncBatcher in
+        the same manner as batches for different Batchers.
+
+        If we pass fail_fast=True, then rather than finishing the
+        generators and BatchableOperations running in parallel with one
+        that raised an exception, we cancel them as soon as the
+        exception reaches the generator that yielded them, by closing
+        the generators and skipping the operations, so that we do not
+        perform I/O whose results we will discard.  We do not cancel
+        generators that other generators are also waiting on, such as
+        those of SharedGenerators.
+
+        If a Batcher returns a RetryPolicy from Batcher.retry_policy,
+        "execute" retries its failed batches with exponential backoff,
+        and optionally splits them into halves to isolate the operations
+        that cause them to fail.  While waiting to retry a batch,
+        "execute" continues to run any other generators and batches that
+        are ready.
+
+        If a Batcher returns an LruCache from Batcher.result_cache,
+        "execute" reuses the results of its operations across
+        executions, keyed by identity key, and only executes the
+        operations whose results are not cached.
+
+        If a Batcher's is_last_write_wins method returns True, "execute"
+        coalesces the operations in each of its batches that write to
+        the same key, executing only the last of them.  Passing
+        defer_writes=True defers such batches until the rest of the
+        execution is waiting on them, so that writes issued at
+        different points in the execution share a batch, and redundant
+        writes are coalesced.  This delays the generators that yield
+        the writes.
+
+        When "execute" runs one batch at a time and several batches are
+        ready to execute, it chooses one arbitrarily.  To choose in a
+        particular order, such as executing the batches on the longest
+        chain of dependent batches first in order to reduce the total
+        number of batches, pass a BatchScheduler using the scheduler
+        keyword argument.  Regardless of the order, "execute" finishes
+        the batches of a Batcher before starting those of the Batchers
+        it must precede, as indicated by Batcher.must_precede.
+
+        To monitor an execution, pass a Tracer using the tracer keyword
+        argument.  TraceCollector is a Tracer that aggregates statistics
+        about the batches of each type of Batcher, and ChromeTraceTracer
+        records a timeline of the execution that we may view in Chrome
+        or Perfetto.  BatchingAnalyzer reports patterns that cost extra
+        rounds, such as generators that yield independent operations one
+        at a time.
+
+        If BatchableOperations have identity keys, as returned by
+        BatchableOperation.identity_key(), "execute" only passes one
+        operation with a given identity key to each call to gen_batch,
+        and it uses the result for all such operations.
+
         object generator_or_operation - The batch generator or
             BatchableOperation.
+        dict kwargs - Keyword arguments for the execution.  These are
+            as follows:
+
+            object thread_pool - The thread pool for advancing the
+                Generators returned by Batcher.gen_batch concurrently,
+                or None to advance them one at a time.  This is an
+                object with a map(func, iterable) method that applies
+                "func" to each element of "iterable" using multiple
+                threads and returns the results in order, such as a
+                multiprocessing.pool.ThreadPool.
+            bool fail_fast - Whether to cancel the generators and
+                BatchableOperations running in parallel with one that
+                raised an exception, rather than finishing them.
+            BatchScheduler scheduler - The scheduler for choosing which
+                batch to execute next, or None to choose arbitrarily.
+                We do not use the scheduler if thread_pool is not None
+                or strict_rounds is True, since we execute all of the
+                ready batches at once.
+            bool strict_rounds - Whether to proceed in rounds, even if
+                thread_pool is None.
+            Tracer tracer - The tracer to notify of the events in the
+                execution, or None.
+            bool defer_writes - Whether to defer the batches of
+                Batchers whose is_last_write_wins() methods return True
+                until nothing else is ready to make progress.
         return mixed - The result of generator_or_operation.
         """
-        return BatchExecutor([generator_or_operation])._run()[0]
+        return BatchExecutor([generator_or_operation], **kwargs)._run()[0]
 
     @staticmethod
-    def executev(generators_and_operations):
+    def executev(generators_and_operations, **kwargs):
         """Execute batches from generators and / or BatchableOperations.
 
         Compute the results of the specified list or tuple of generators
@@ -421,13 +1577,15 @@ class BatchExecutor(object):
 
         list|tuple generators_and_operations - A list or tuple of the
             generators and / or BatchOperations.
+        dict kwargs - Keyword arguments for the execution, as in the
+            "kwargs" argument to "execute".
         return list - A list of the results of the generators and / or
             BatchableOperations.  The list is parallel to the argument.
         """
-        return BatchExecutor(generators_and_operations)._run()
+        return BatchExecutor(generators_and_operations, **kwargs)._run()
 
     @staticmethod
-    def executeva(*args):
+    def executeva(*args, **kwargs):
         """Execute batches from generators and / or BatchableOperations.
 
         Compute the results of the specified generators and / or
@@ -435,7 +1593,46 @@ class BatchExecutor(object):
         method's comments.
 
         tuple args - The generators and / or BatchOperations.
+        dict kwargs - Keyword arguments for the execution, as in the
+            "kwargs" argument to "execute".
         return list - A list of the results of the generators and / or
             BatchableOperations.  The list is parallel to "args".
         """
-        return BatchExecutor(args)._run()
+        return BatchExecutor(args, **kwargs)._run()
+
+    @staticmethod
+    def executev_iter(
+            generators_and_operations, max_in_flight=1000, **kwargs):
+        """Execute batches from a stream of generators and / or operations.
+
+        Compute the results of the generators and / or
+        BatchableOperations produced by the specified iterable, and
+        return an iterator over the results in the order in which they
+        finish.  This is a variant of "execute".  See that method's
+        comments.
+
+        Unlike executev, executev_iter only keeps up to max_in_flight
+        generators and / or operations from the iterable in progress at
+        a time.  Whenever one finishes, it takes another from the
+        iterable.  Also, it does not keep the results after yielding
+        them.  This bounds the memory executev_iter uses to process a
+        large number of elements, while still batching together the
+        operations of up to max_in_flight elements.  If one of the
+        elements raises an exception, the returned iterator raises it.
+
+        iterable generators_and_operations - The generators and / or
+            BatchableOperations.  We do not take an element from the
+            iterable until we are ready to execute it.
+        int max_in_flight - The maximum number of elements of
+            generators_and_operations to execute at a time.
+        dict kwargs - Keyword arguments for the execution, as in the
+            "kwargs" argument to "execute".
+        return iterator<tuple<int, mixed>> - An iterator over pairs
+            consisting of the index of an element of
+            generators_and_operations and its result, in the order in
+            which the elements finish.
+        """
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight must be at least 1')
+        return BatchExecutor([], **kwargs)._run_iter(
+            generators_and_operations, max_in_flight)
@@ -1,13 +1,93 @@
+import sys
+import threading
+
+from lru_cache import LruCache
+from shared_generator import SharedGenerator
+
+
 class GeneratorCache(object):
     """Cache for cached_generator to store SharedGenerators and exception info.
+
+    By default, a GeneratorCache stores the result of each call to a
+    function decorated with cached_generator until we call clear().  In
+    a long-running process, this may use an unbounded amount of memory.
+    To prevent this, we may bound the number of entries, their estimated
+    total size, and / or their age.  When the cache exceeds the bounds,
+    it evicts the least recently used entries.  Evicting an entry
+    merely causes the next call with the same arguments to call the
+    decorated function again.
+
+    A thread-safe GeneratorCache allows concurrent executions on
+    different threads to call the functions that use it.  If an
+    execution calls a function with the same arguments as a call that
+    another thread's execution is still running, it waits for and reuses
+    the result of that call, rather than failing or calling the function
+    again.  See the comments for SharedGenerator.
+
+    Public attributes:
+
+    int eviction_count - The number of entries we have evicted because
+        of the bounds on the number of entries, the size, or the age of
+        the entries.
+    int hit_count - The number of calls to decorated functions that
+        reused the result of a previous call.
+    int miss_count - The number of calls to decorated functions that
+        called the underlying function.
     """
 
     # Private attributes:
-    # list<dict> _shared_generators - A list of the SharedGenerator and
-    #     exception info maps stored in this GeneratorCache.
+    # LruCache _cache - The cache of the SharedGenerators and exception
+    #     info.  Each key is a pair consisting of the decorated function
+    #     and the hashable version of the arguments.
+    # bool _is_size_bounded - Whether there is a bound on the total
+    #     estimated size of the cached results.
+    # bool _is_thread_safe - Whether the cache is thread-safe.
+    # threading.Lock _lock - The lock for accessing _cache, or None if
+    #     the cache is not thread-safe.
+    # callable _sizeof - The function that returns the estimated size of
+    #     the result of a function, in bytes.
+
+    def __init__(
+            self, max_entries=None, max_bytes=None, ttl=None, sizeof=None,
+            is_thread_safe=False):
+        """Initialize a GeneratorCache.
+
+        int max_entries - The maximum number of cached calls, or None if
+            there is no maximum.
+        int max_bytes - The maximum total estimated size of the cached
+            results, in bytes, or None if there is no maximum.
+        float ttl - The number of seconds after which a cached call
+            expires, or None if cached calls do not expire.
+        callable sizeof - The function that returns the estimated size
+            of the result of a function in bytes, or None to use
+            sys.getsizeof.  Note that sys.getsizeof does not include the
+            sizes of the objects that a value refers to.
+        bool is_thread_safe - Whether the cache is thread-safe.
+        """
+        self._is_thread_safe = is_thread_safe
+        self._is_size_bounded = max_bytes is not None
+        if is_thread_safe:
+            self._lock = threading.Lock()
+        else:
+            self._lock = None
+        if sizeof is not None:
+            self._sizeof = sizeof
+        else:
+            self._sizeof = sys.getsizeof
+        self._cache = LruCache(
+            max_entries, max_bytes, ttl, self._shared_generator_sizeof)
+
+    @property
+    def hit_count(self):
+        return self._cache.hit_count
 
-    def __init__(self):
-        self._shared_generators = []
+    @property
+    def miss_count(self):
+        return self._cache.miss_count
+
+    @property
+    def eviction_count(self):
+        return self._cache.eviction_count
 
     def clear(self):
         """Clear the SharedGenerators from all functions using this.
@@ -16,13 +96,59 @@ class GeneratorCache(object):
         all of the functions decorated with this GeneratorCache.  This
         clears any cached results of such functions.
         """
-        for shared_generators in self._shared_generators:
-            shared_generators.clear()
-        self._shared_generators = []
+        if self._lock is None:
+            self._cache.clear()
+        else:
+            with self._lock:
+                self._cache.clear()
+
+    def _shared_generator_sizeof(self, shared_generator_or_exception_info):
+        """Return the estimated size of a cached call, in bytes.
+
+        mixed shared_generator_or_exception_info - The SharedGenerator or
+            exception info for the call.
+        return int - The estimated size.
+        """
+        if isinstance(shared_generator_or_exception_info, SharedGenerator):
+            result = shared_generator_or_exception_info._result
+            if result is not None:
+                return self._sizeof(result._value)
+        return sys.getsizeof(shared_generator_or_exception_info)
+
+    def _get(self, func, cache_key):
+        """Return the SharedGenerator or exception info for a call.
+
+        callable func - The decorated function.
+        object cache_key - The hashable version of the arguments.
+        return mixed - The SharedGenerator or exception info, or None if
+            we have not cached the call.
+        """
+        return self._cache.get((func, cache_key))
+
+    def _set(self, func, cache_key, shared_generator_or_exception_info):
+        """Store the SharedGenerator or exception info for a call.
+
+        callable func - The decorated function.
+        object cache_key - The hashable version of the arguments.
+        mixed shared_generator_or_exception_info - The SharedGenerator or
+            exception info.
+        """
+        key = (func, cache_key)
+        if (self._is_size_bounded and
+                isinstance(
+                    shared_generator_or_exception_info, SharedGenerator)):
+            # The size of a SharedGenerator grows when it finishes
+            shared_generator_or_exception_info._finished_callback = (
+                lambda: self._refresh_size(key))
+        self._cache.set(key, shared_generator_or_exception_info)
+
+    def _refresh_size(self, key):
+        """Re-estimate the size of a cached call whose generator finished.
 
-    def _create_shared_generators_map(self):
-        """Return a new map for storing SharedGenerators and exception info.
+        tuple<callable, object> key - The key of the call in _cache.
         """
-        shared_generators = {}
-        self._shared_generators.append(shared_generators)
-        return shared_generators
+        if self._lock is None:
+            self._cache.refresh_size(key)
+        else:
+            with self._lock:
+                self._cache.refresh_size(key)
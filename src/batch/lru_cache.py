@@ -0,0 +1,221 @@
+import collections
+import sys
+import time
+
+
+class _LruCacheEntry(object):
+    """A value stored in an LruCache."""
+
+    __slots__ = ('expiration_time', 'size', 'value')
+
+    def __init__(self, value, size, expiration_time):
+        self.value = value
+        self.size = size
+        self.expiration_time = expiration_time
+
+
+class LruCache(object):
+    """A map with optional bounds on its size and on the age of its entries.
+
+    When an LruCache exceeds its maximum number of entries or its
+    maximum estimated size in bytes, it evicts the least recently used
+    entries until it is within the bounds.  Entries also expire after a
+    fixed amount of time, if a TTL is specified.  We remove an expired
+    entry when we look it up, or when we store an entry while it is
+    among the least recently used entries.  An LruCache with no bounds
+    behaves like a dict.
+
+    Public attributes:
+
+    int eviction_count - The number of entries we have removed because
+        of the bounds on the number of entries, the size, or the age of
+        the entries.
+    int hit_count - The number of calls to "get" that found an entry.
+    int miss_count - The number of calls to "get" that did not find an
+        entry.
+    """
+
+    # Private attributes:
+    # dict<object, _LruCacheEntry> _entries - A map from the keys to
+    #     the entries.  This is an OrderedDict, from least to most
+    #     recently used, if the cache is bounded.
+    # bool _is_bounded - Whether there are any bounds on the entries.
+    # int _max_bytes - The maximum total estimated size of the values,
+    #     in bytes, or None if there is no maximum.
+    # int _max_entries - The maximum number of entries, or None if there
+    #     is no maximum.
+    # callable _sizeof - The function that returns the estimated size
+    #     of a value in bytes.
+    # int _total_bytes - The total estimated size of the values in
+    #     bytes, if _max_bytes is not None.
+    # float _ttl - The number of seconds after which an entry expires,
+    #     or None if entries do not expire.
+
+    def __init__(
+            self, max_entries=None, max_bytes=None, ttl=None, sizeof=None):
+        """Initialize an LruCache.
+
+        int max_entries - The maximum number of entries, or None if
+            there is no maximum.
+        int max_bytes - The maximum total estimated size of the values,
+            in bytes, or None if there is no maximum.
+        float ttl - The number of seconds after which an entry expires,
+            or None if entries do not expire.
+        callable sizeof - The function that returns the estimated size
+            of a value in bytes, or None to use sys.getsizeof.  Since
+            the value may change after we store it, we re-estimate its
+            size each time we return it from "get".
+        """
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        if sizeof is not None:
+            self._sizeof = sizeof
+        else:
+            self._sizeof = sys.getsizeof
+        self._is_bounded = (
+            max_entries is not None or max_bytes is not None or
+            ttl is not None)
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit_rate(self):
+        """Return the fraction of the calls to "get" that found an entry.
+
+        return float - The fraction, or None if we have not called "get".
+        """
+        lookup_count = self.hit_count + self.miss_count
+        if not lookup_count:
+            return None
+        return float(self.hit_count) / lookup_count
+
+    def clear(self):
+        """Remove all of the entries."""
+        if self._is_bounded:
+            self._entries = collections.OrderedDict()
+        else:
+            self._entries = {}
+        self._total_bytes = 0
+
+    def get(self, key):
+        """Return the value associated with the specified key.
+
+        Mark the entry as the most recently used entry.
+
+        object key - The hashable key.
+        return object - The value, or None if there is no such entry.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.miss_count += 1
+            return None
+        if not self._is_bounded:
+            self.hit_count += 1
+            return entry.value
+
+        if (entry.expiration_time is not None and
+                time.time() >= entry.expiration_time):
+            self._remove(key)
+            self.eviction_count += 1
+            self.miss_count += 1
+            return None
+        self.hit_count += 1
+        del self._entries[key]
+        self._entries[key] = entry
+        if self._max_bytes is not None:
+            size = self._sizeof(entry.value)
+            self._total_bytes += size - entry.size
+            entry.size = size
+            self._evict()
+        return entry.value
+
+    def set(self, key, value):
+        """Associate the specified key with the specified value.
+
+        Mark the entry as the most recently used entry, and evict
+        entries as necessary to remain within the bounds.
+
+        object key - The hashable key.
+        object value - The value.  This may not be None.
+        """
+        if key in self._entries:
+            self._remove(key)
+        if self._max_bytes is not None:
+            size = self._sizeof(value)
+            self._total_bytes += size
+        else:
+            size = None
+        if self._ttl is not None:
+            expiration_time = time.time() + self._ttl
+        else:
+            expiration_time = None
+        self._entries[key] = _LruCacheEntry(value, size, expiration_time)
+        if self._is_bounded:
+            self._evict()
+
+    def refresh_size(self, key):
+        """Re-estimate the size of the value associated with a key.
+
+        Call this when the value changes in a way that affects its size.
+        Evict entries as necessary to remain within the bounds.  This
+        does not mark the entry as recently used.
+
+        object key - The hashable key.  If there is no such entry, this
+            method has no effect.
+        """
+        if self._max_bytes is None:
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        size = self._sizeof(entry.value)
+        self._total_bytes += size - entry.size
+        entry.size = size
+        self._evict()
+
+    def pop(self, key):
+        """Remove the entry for the specified key, if any.
+
+        object key - The hashable key.
+        return object - The value associated with the key, or None if
+            there was no such entry.
+        """
+        if key not in self._entries:
+            return None
+        return self._remove(key)
+
+    def _remove(self, key):
+        """Remove the entry for the specified key, and return its value."""
+        entry = self._entries.pop(key)
+        if self._max_bytes is not None:
+            self._total_bytes -= entry.size
+        return entry.value
+
+    def _evict(self):
+        """Evict least recently used entries until we are within bounds.
+
+        First remove the expired entries among the least recently used
+        entries.  We always keep the most recently used entry, even if
+        it exceeds the maximum size on its own.
+        """
+        if self._ttl is not None:
+            now = time.time()
+            while self._entries:
+                key = next(iter(self._entries))
+                if self._entries[key].expiration_time > now:
+                    break
+                self._remove(key)
+                self.eviction_count += 1
+        while len(self._entries) > 1 and (
+                (self._max_entries is not None and
+                    len(self._entries) > self._max_entries) or
+                (self._max_bytes is not None and
+                    self._total_bytes > self._max_bytes)):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.eviction_count += 1
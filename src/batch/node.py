@@ -10,25 +10,84 @@ class BatchNode(object):
     BatchableExecutor's results, a generator node collects a generator's
     result, an operation node collects a BatchableOperation's result,
     and a batcher node collects the results of a batch of
-    BatchableOperations having the same Batcher.
+    BatchableOperations having the same Batcher.  Each type of node has
+    its own subclass of BatchNode.
 
-    BatchNodes have the following attributes:
+    Graphs may have millions of nodes, so nodes use __slots__ and store
+    as little as possible.  Rather than storing their children, root and
+    generator nodes store the number of children on which they are
+    waiting.  Operation and batcher nodes do not keep track of their
+    children at all, since nothing waits on them.
+    """
 
-    Root node:
+    __slots__ = ()
 
-    final batcher, final generator, final operation - None
-    set<BatchNode> children - The children: the generator and operation
-        nodes for the results of the BatchExecutor.
-    list results - The list in which we store the results of the
-        BatchExecutor.
+    def is_root_node(self):
+        return False
 
-    Generator node:
+    def is_generator_node(self):
+        return False
 
-    final batcher, final operation - None
-    set<BatchNode> children - The children: the generator and operation
-        nodes on which the node is waiting, from the value that
-        self.generator most recently yielded, excluding those whose
-        results we have already obtained.
+    def is_operation_node(self):
+        return False
+
+    def is_batcher_node(self):
+        return False
+
+    def iter_parents(self):
+        """Return an iterator over the node's parent BatchNodes."""
+        raise NotImplementedError('Subclass must override')
+
+
+class RootNode(BatchNode):
+    """A BatchNode that collects a BatchExecutor's results.
+
+    Public attributes:
+
+    int pending_count - The number of children: the generator and
+        operation nodes for the results of the BatchExecutor that are
+        not finished.
+    list|dict<int, mixed> results - The list in which we store the
+        results of the BatchExecutor, or a map from the indices of the
+        unreported results of BatchExecutor.executev_iter to the
+        results.
+    """
+
+    __slots__ = ('pending_count', 'results')
+
+    def __init__(self, result_count=None):
+        """Initialize a RootNode for the specified number of results.
+
+        int result_count - The number of results, or None if we are
+            computing the results of BatchExecutor.executev_iter.
+        """
+        self.pending_count = 0
+        if result_count is not None:
+            self.results = [None] * result_count
+        else:
+            self.results = {}
+
+    def is_root_node(self):
+        return True
+
+    def iter_parents(self):
+        return ()
+
+
+class GeneratorNode(BatchNode):
+    """A BatchNode that collects a generator's result.
+
+    Most generator nodes have exactly one parent, which we store in the
+    "parent" and result_index attributes.  Nodes for shared generators
+    store any additional parents in other_parents.
+
+    Public attributes:
+
+    list<BatchNode> children - The generator and operation nodes for the
+        values that self.generator most recently yielded, if the
+        BatchExecutor is in fail-fast mode.  This is None if the
+        BatchExecutor is not in fail-fast mode or if we have not
+        executed the generator's first iteration.
     tuple<type, mixed, traceback> exception_info - Information about the
         exception to propagate to self.generator, if any, as returned by
         sys.exc_info().  This is an exception produced in a generator or
@@ -38,10 +97,19 @@ class BatchNode(object):
     bool is_result_list - Whether the value self.generator most recently
         yielded is a list or tuple.  This is not assigned until we
         execute the generator's first iteration.
-    dict<BatchNode, int> parent_to_result_index - A map from the parents
-        to the index in their "results" fields in which to store the
-        result of the generator.  The result index is None for batcher
-        nodes.  The parents are root nodes, generator nodes, and / or
+    dict<BatchNode, int> other_parents - A map from the parents other
+        than self.parent to the index in their "results" fields in which
+        to store the result of the generator, or None if there are no
+        such parents.
+    BatchNode parent - The first parent, or None if the node has no
+        parents.  The parents are root nodes, generator nodes, and / or
+        batcher nodes.
+    int pending_count - The number of children: the generator and
+        operation nodes on which the node is waiting, from the value
+        that self.generator most recently yielded, excluding those whose
+        results we have already obtained.
+    int result_index - The index in self.parent.results in which to
+        store the result of the generator.  The result index is None for
         batcher nodes.
     list results - The list in which we store the results of the
         generators and BatchableOperations on which it is waiting, from
@@ -50,67 +118,115 @@ class BatchNode(object):
         The results for a generator or BatchableOperation that raised an
         exception are None.  The list is parallel to the values that
         self.generator most recently yielded.
+    """
+
+    __slots__ = (
+        'children', 'exception_info', 'generator', 'is_result_list',
+        'other_parents', 'parent', 'pending_count', 'result_index',
+        'results')
+
+    def __init__(self, generator):
+        """Initialize a GeneratorNode for the specified Generator.
+
+        The node does not have any parents until we call add_parent.
+        """
+        self.generator = generator
+        self.parent = None
+        self.result_index = None
+        self.other_parents = None
+        self.pending_count = 0
+        self.results = None
+        self.exception_info = None
+        self.children = None
 
-    Operation node:
+    def is_generator_node(self):
+        return True
+
+    def add_parent(self, parent, result_index):
+        """Add or update a parent of the node.
+
+        BatchNode parent - The parent.
+        int result_index - The index in parent.results in which to store
+            the result of the generator.
+        return bool - Whether "parent" was not already a parent of the
+            node.
+        """
+        if self.parent is None or self.parent is parent:
+            is_new = self.parent is None
+            self.parent = parent
+            self.result_index = result_index
+            return is_new
+        if self.other_parents is None:
+            self.other_parents = {}
+        is_new = parent not in self.other_parents
+        self.other_parents[parent] = result_index
+        return is_new
+
+    def remove_parent(self, parent):
+        """Remove the specified parent of the node, if it is a parent."""
+        if self.parent is parent:
+            if self.other_parents is None:
+                self.parent = None
+                self.result_index = None
+                return
+            self.parent, self.result_index = self.other_parents.popitem()
+        elif self.other_parents is not None:
+            self.other_parents.pop(parent, None)
+        else:
+            return
+        if not self.other_parents:
+            self.other_parents = None
+
+    def parent_items(self):
+        """Return the node's parents and result indices.
+
+        return list<tuple<BatchNode, int>> - The pairs consisting of
+            each parent and the index in its "results" field in which to
+            store the result of the generator.
+        """
+        if self.other_parents is None:
+            if self.parent is None:
+                return []
+            return [(self.parent, self.result_index)]
+        items = self.other_parents.items()
+        items.append((self.parent, self.result_index))
+        return items
+
+    def iter_parents(self):
+        for parent, result_index in self.parent_items():
+            yield parent
+
+
+class OperationNode(BatchNode):
+    """A BatchNode that collects a BatchableOperation's result.
+
+    Public attributes:
 
-    final generator - None
     final Batcher batcher - self.operation.batcher()
-    set<BatchNode> children - The batcher node for the result of the
-        operation.  This is empty if we have not yet started executing
-        the operation.
+    list<OperationNode> duplicates - The operation nodes for the other
+        operations in the node's batch that have the same identity key
+        as self.operation, and that therefore receive the same result,
+        or None if there are no such nodes.  This is only set for the
+        nodes whose operations we pass to Batcher.gen_batch.
+    bool is_cancelled - Whether we no longer need the result of
+        self.operation, because the BatchExecutor is in fail-fast mode
+        and the parent received an exception.
     final BatchableOperation operation - The operation.
-    final BatchNode parent - The parent: the generator node that will
-        collect the result of self.operation.
+    final BatchNode parent - The parent: the generator or root node
+        that will collect the result of self.operation.
     final int result_index - The index in self.parent.results in which
         to store the result of self.operation.
+    """
 
-    Batcher node:
+    __slots__ = (
+        'batcher', 'duplicates', 'is_cancelled', 'operation', 'parent',
+        'result_index')
 
-    final generator, final operation - None
-    final Batcher batcher - The batcher.
-    set<BatchNode> children - The children: the generator node that the
-        Batcher's gen_batch method returned.
-    final int operation_count - The number of BatchableOperations this
-        node is batching.
-    dict<BatchNode, int> parent_to_operation_index - A map from the
-        operation nodes for the BatchableOperations whose results this
-        node is computing to their indices in the results list.  Note
-        that the length of parent_to_operation_index may differ from
-        operation_count, due to exceptions.  If a generator X produced a
-        BatchableOperation Y for this, and a generator or
-        BatchableOperation Z that X is running in parallel with Y raises
-        an exception, then X no longer requires the results of operation
-        Y, and the node for Y does not appear in
-        parent_to_operation_index.
-    """
+    def __init__(self, operation, parent, result_index):
+        """Initialize an OperationNode.
 
-    def __init__(self, generator, operation, batcher):
-        """Private constructor."""
-        self.generator = generator
-        self.operation = operation
-        self.batcher = batcher
-        self.children = set()
-
-    @staticmethod
-    def create_root_node():
-        """Return a new root BatchNode."""
-        return BatchNode(None, None, None)
-
-    @staticmethod
-    def create_generator_node(generator):
-        """Return a new generator BatchNode for the specified Generator."""
-        node = BatchNode(generator, None, None)
-        node.results = None
-        node.exception_info = None
-        node.parent_to_result_index = {}
-        return node
-
-    @staticmethod
-    def create_operation_node(operation, parent, result_index):
-        """Return a new operation BatchNode.
-
-        Assign the arguments to the attributes of the same names.  Add
-        the node to the parent.children.
+        Assign the arguments to the attributes of the same names.
+        Increment parent.pending_count.
         """
         batcher = operation.batcher()
         if not isinstance(batcher, Batcher):
@@ -118,48 +234,70 @@ class BatchNode(object):
                 '{:s}.batcher() returned a {:s} rather than a Batcher'.format(
                     operation.__class__.__name__,
                     batcher.__class__.__name__))
-        node = BatchNode(None, operation, batcher)
-        node.parent = parent
-        parent.children.add(node)
-        node.result_index = result_index
-        return node
+        self.operation = operation
+        self.batcher = batcher
+        self.parent = parent
+        self.result_index = result_index
+        self.duplicates = None
+        self.is_cancelled = False
+        parent.pending_count += 1
+
+    def is_operation_node(self):
+        return True
 
-    @staticmethod
-    def create_batcher_node(batcher, operation_nodes):
-        """Return a new batcher BatchNode.
+    def iter_parents(self):
+        return (self.parent,)
 
-        Batcher batcher - The batcher.
-        object operation_nodes - A list or tuple of operation BatchNodes
-            whose results the batcher node will compute.  We add the
-            node to the operation nodes' "children" fields.
-        """
-        node = BatchNode(None, None, batcher)
-        node.parent_to_operation_index = {}
-        for (index, operation_node) in enumerate(operation_nodes):
-            node.parent_to_operation_index[operation_node] = index
-            operation_node.children.add(node)
-        node.operation_count = len(operation_nodes)
-        return node
 
-    def is_root_node(self):
-        return self.generator is None and self.batcher is None
+class BatcherNode(BatchNode):
+    """A BatchNode that collects the results of a batch of operations.
 
-    def is_generator_node(self):
-        return self.generator is not None
+    Public attributes:
 
-    def is_operation_node(self):
-        return self.operation is not None
+    final int attempt - The number of times we have attempted to execute
+        the operations, including this attempt.  We do not count the
+        attempts to execute them as part of larger batches that we split
+        by bisection.  See the comments for Batcher.retry_policy.
+    final Batcher batcher - The batcher.
+    final list<OperationNode> operation_nodes - The operation nodes for
+        the BatchableOperations whose results this node is computing.
+        The list is parallel to the results list.  The nodes in their
+        "duplicates" fields also receive the results.
+    """
+
+    __slots__ = ('attempt', 'batcher', 'operation_nodes')
+
+    def __init__(self, batcher, operation_nodes, attempt=1):
+        """Initialize a BatcherNode.
+
+        Batcher batcher - The batcher.
+        list<OperationNode> operation_nodes - The operation nodes whose
+            results the batcher node will compute, parallel to the
+            operations we pass to batcher.gen_batch.
+        int attempt - The number of times we have attempted to execute
+            the operations, including this attempt, as in the "attempt"
+            attribute.
+        """
+        self.batcher = batcher
+        self.operation_nodes = operation_nodes
+        self.attempt = attempt
 
     def is_batcher_node(self):
-        return self.batcher is not None and self.operation is None
+        return True
+
+    def iter_operation_nodes(self):
+        """Return an iterator over the nodes that receive the batch's results.
+
+        return iterator<tuple<OperationNode, int>> - The pairs
+            consisting of each operation node, including those in the
+            "duplicates" fields, and the index of its result.
+        """
+        for index, operation_node in enumerate(self.operation_nodes):
+            yield operation_node, index
+            if operation_node.duplicates is not None:
+                for duplicate in operation_node.duplicates:
+                    yield duplicate, index
 
     def iter_parents(self):
-        """Return an iterator over the node's parent BatchNodes."""
-        if self.is_root_node():
-            return ()
-        elif self.is_generator_node():
-            return self.parent_to_result_index.iterkeys()
-        elif self.is_operation_node():
-            return (self.parent,)
-        else:
-            return self.parent_to_operation_index.iterkeys()
+        for operation_node, index in self.iter_operation_nodes():
+            yield operation_node
@@ -1,3 +1,6 @@
+from gen_result import GenResult
+
+
 class BatchableOperation(object):
     """An operation that is capable of being batched with related operations.
 
@@ -22,6 +25,21 @@ class BatchableOperation(object):
         """
         raise NotImplementedError('Subclass must override')
 
+    def identity_key(self):
+        """Return a key identifying the result of this operation.
+
+        If two operations with equal batchers have equal, non-None
+        identity keys, as compared using ==, !=, and "hash", then they
+        must have the same result.  BatchExecutor only passes one of
+        them to Batcher.gen_batch, and it uses the result for both.  By
+        default, operations do not have identity keys, so BatchExecutor
+        does not perform such deduplication.
+
+        return object - The hashable identity key, or None if the
+            operation does not have one.
+        """
+        return None
+
 
 class Batcher(object):
     """Executes a batch of BatchableOperations of a certain type.
@@ -71,6 +89,11 @@ class Batcher(object):
         would be impossible for F to compute the appropriate condensed
         database query from a single user id.
 
+        If some of the operations fail, gen_batch may return
+        OperationErrors in place of their results, rather than raising
+        an exception for the entire batch.  See the comments for
+        OperationError.
+
         list<BatchableOperation<T>> operations - A non-empty list of the
             operations to batch.  This method may assume that each
             operation's batcher() method returns a Batcher that is equal
@@ -78,3 +101,174 @@ class Batcher(object):
         return list|tuple<T> - The results of the operations.
         """
         raise NotImplementedError('Subclass must override')
+
+    def max_batch_size(self):
+        """Return the maximum number of operations to pass to gen_batch.
+
+        If there are more operations to execute than this, BatchExecutor
+        splits them into multiple batches and executes the batches at
+        the same time.  See the comments for BatchExecutor.execute.
+
+        return int - The maximum number of operations, or None if there
+            is no maximum.
+        """
+        return None
+
+    def max_batch_bytes(self):
+        """Return the maximum payload size of a batch, in bytes.
+
+        If there are more operations to execute than fit in this many
+        bytes, as measured using operation_bytes, BatchExecutor splits
+        them into multiple batches and executes the batches at the same
+        time.  A batch consisting of a single operation may exceed the
+        maximum.  Subclasses that override this must also override
+        operation_bytes.
+
+        return int - The maximum number of bytes, or None if there is no
+            maximum.
+        """
+        return None
+
+    def operation_bytes(self, operation):
+        """Return the size of an operation's payload, in bytes.
+
+        See the comments for max_batch_bytes.
+
+        BatchableOperation<T> operation - The operation.
+        return int - The number of bytes.
+        """
+        raise NotImplementedError('Subclass must override')
+
+    def priority(self):
+        """Return the priority of the Batcher's batches.
+
+        BatcherPriorityScheduler executes the batches of Batchers with
+        higher priorities first.
+
+        return int - The priority.
+        """
+        return 0
+
+    def retry_policy(self):
+        """Return the RetryPolicy for batches that fail.
+
+        If a batch raises an exception, or if the Generator returned by
+        gen_batch or the future returned by AsyncBatcher.start_batch
+        raises an exception, BatchExecutor consults the RetryPolicy to
+        determine whether and when to execute the batch's operations
+        again.  Batchers that retry batches must be safe to execute
+        multiple times with the same operations.
+
+        return RetryPolicy - The retry policy, or None if we should not
+            retry batches.
+        """
+        return None
+
+    def result_cache(self):
+        """Return the cache of the results of the Batcher's operations.
+
+        If a Batcher returns an LruCache, BatchExecutor looks up each
+        operation with a non-None identity key in the cache before
+        executing a batch, and only passes the operations whose results
+        are not cached to gen_batch or AsyncBatcher.start_batch.  It
+        stores the results of the batch in the cache, keyed by identity
+        key, apart from results of None and OperationErrors.  This is
+        appropriate for operations whose results change rarely, such as
+        configuration lookups, since an execution may receive a result
+        that is as old as the cache's TTL.  The cache persists across
+        executions, so the Batcher must return the same LruCache each
+        time.  LruCache is not thread-safe, so a Batcher whose batches
+        may execute on multiple threads at the same time must not
+        return a shared LruCache.
+
+        return LruCache - The cache, or None if we should not cache the
+            results.
+        """
+        return None
+
+    def is_last_write_wins(self):
+        """Return whether the Batcher's operations are last-write-wins writes.
+
+        If this returns True, the Batcher's operations write data
+        identified by the keys returned by write_key, and when a batch
+        contains several operations with the same write key, executing
+        only the last of them has the same effect as executing all of
+        them in order.  BatchExecutor then passes only the last such
+        operation to gen_batch, and the other operations receive its
+        result.  BatchExecutor may also defer the Batcher's batches
+        until the end of the execution; see the comments for
+        BatchExecutor.execute.  Subclasses that override this to return
+        True must also override write_key.
+
+        return bool - Whether the operations are last-write-wins
+            writes.
+        """
+        return False
+
+    def must_precede(self, batcher):
+        """Return whether the Batcher's batches must finish before another's.
+
+        If this returns True, then when BatchExecutor has operations for
+        both Batchers ready to execute, or it is executing, deferring,
+        or waiting to retry a batch for this Batcher and has operations
+        for "batcher" ready to execute, it finishes this Batcher's batch
+        before starting the batch for "batcher".  A nested execution
+        does not take the operations for "batcher" from the enclosing
+        execution while they must wait.  For example, the Batcher for
+        writes to a cache may precede the Batcher for reads from the
+        cache, so that reads that become ready in the same round as
+        writes observe the writes.  This does not require any extra
+        rounds of batches.  If the constraints form a cycle,
+        BatchExecutor ignores them for the Batchers in the cycle.
+
+        Batcher batcher - The other Batcher.  This is not equal to this
+            Batcher.
+        return bool - Whether this Batcher's batches must precede those
+            of "batcher".
+        """
+        return False
+
+    def write_key(self, operation):
+        """Return the key of the data that a write operation overwrites.
+
+        See the comments for is_last_write_wins.
+
+        BatchableOperation<T> operation - The operation.
+        return object - The hashable key, or None if we should not
+            coalesce the operation with other operations.
+        """
+        raise NotImplementedError('Subclass must override')
+
+
+class AsyncBatcher(Batcher):
+    """A Batcher that executes batches using non-blocking I/O.
+
+    The abstract superclass of Batchers that start executing a batch of
+    BatchableOperations without waiting for the results, as in the case
+    of a request that we send over the network without waiting for the
+    response.  BatchExecutor starts executing an AsyncBatcher's batches
+    using start_batch, and it only waits for the results once it has
+    nothing else to do.  This keeps the round trips for multiple batches
+    in flight at the same time, so that the time we spend waiting for
+    them is the maximum of their latencies rather than the sum.
+
+    <T> - The type of the results of each operation.
+    """
+
+    def start_batch(self, operations):
+        """Start executing a batch of BatchableOperations.
+
+        list<BatchableOperation<T>> operations - A non-empty list of the
+            operations to batch, as in the argument to gen_batch.
+        return object - A future for the results of the operations.
+            This is an object with a result() method, such as a
+            concurrent.futures.Future.  result() waits until the batch
+            is finished executing, and then it returns a list or tuple
+            of the results of the operations or raises an exception.
+            The list or tuple is parallel to "operations".
+        """
+        raise NotImplementedError('Subclass must override')
+
+    def gen_batch(self, operations):
+        future = self.start_batch(operations)
+        yield GenResult(future.result())
@@ -0,0 +1,32 @@
+import sys
+
+
+class OperationError(object):
+    """Indicates that a single BatchableOperation in a batch failed.
+
+    Batcher.gen_batch may include an OperationError in its list of
+    results in place of the result of an operation that failed.
+    BatchExecutor raises the exception in the generator that yielded
+    that operation, and delivers the other results in the batch
+    normally.  This way, one failed operation does not cause the whole
+    batch to fail.
+    """
+
+    # Private attributes:
+    # tuple<type, mixed, traceback> _exception_info - Information about
+    #     the exception, in the format returned by sys.exc_info().
+
+    def __init__(self, exception):
+        """Initialize an OperationError for the specified exception.
+
+        If we are currently handling "exception", we include its
+        traceback.
+
+        Exception exception - The exception to raise in the generator
+            that yielded the failed operation.
+        """
+        exception_info = sys.exc_info()
+        if exception_info[1] is exception:
+            self._exception_info = exception_info
+        else:
+            self._exception_info = (exception.__class__, exception, None)
@@ -0,0 +1,68 @@
+class RetryPolicy(object):
+    """Indicates how BatchExecutor should retry a Batcher's failed batches.
+
+    When a batch fails with one of the retryable exception types, we
+    wait for a delay and then execute the batch again, up to a maximum
+    number of attempts.  The delay grows exponentially with each
+    attempt.  Optionally, rather than retrying the whole batch, we may
+    split it into halves and execute each half separately.  Repeated
+    bisection isolates operations that cause their entire batches to
+    fail, so that the other operations succeed.  Splitting a batch does
+    not count toward the maximum number of attempts, so we bisect
+    batches down to single operations, and then retry each operation
+    that still fails as usual.  See Batcher.retry_policy.
+
+    Public attributes:
+
+    final float backoff_factor - The factor by which the delay increases
+        with each attempt.
+    final bool bisect - Whether to split a failed batch of more than one
+        operation into halves rather than retrying it as is.
+    final float initial_delay - The number of seconds to wait before the
+        second attempt.
+    final int max_attempts - The maximum number of times to execute each
+        operation, including the first attempt.  If bisect is True, we
+        do not count the attempts to execute it as part of batches that
+        we split.
+    final float max_delay - The maximum number of seconds to wait before
+        an attempt, or None if there is no maximum.
+    final tuple<type> retryable_exceptions - The types of exceptions
+        after which we retry a batch.
+    """
+
+    def __init__(
+            self, max_attempts=3, initial_delay=0.1, backoff_factor=2,
+            max_delay=None, retryable_exceptions=(Exception,),
+            bisect=False):
+        if max_attempts < 1:
+            raise ValueError('max_attempts must be at least 1')
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.backoff_factor = backoff_factor
+        self.max_delay = max_delay
+        self.retryable_exceptions = tuple(retryable_exceptions)
+        self.bisect = bisect
+
+    def is_retryable(self, exception, attempt):
+        """Return whether to retry a batch that failed.
+
+        Exception exception - The exception the batch raised.
+        int attempt - The number of the attempt that failed, starting
+            with 1 for the first attempt.
+        return bool - The result.
+        """
+        return (
+            attempt < self.max_attempts and
+            isinstance(exception, self.retryable_exceptions))
+
+    def delay(self, attempt):
+        """Return the number of seconds to wait before an attempt.
+
+        int attempt - The number of the attempt that failed, starting
+            with 1 for the first attempt.
+        return float - The delay before the next attempt.
+        """
+        delay = self.initial_delay * self.backoff_factor ** (attempt - 1)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        return delay
@@ -0,0 +1,155 @@
+class BatchScheduler(object):
+    """Chooses the order in which BatchExecutor executes batches.
+
+    When BatchExecutor runs one batch at a time, it may have batches for
+    several Batchers ready to execute.  The order in which it executes
+    them affects how many batches it executes in total: executing a
+    batch whose results lead to long chains of further batches early
+    gives the other generators more time to add operations to the
+    batches that come later.  A BatchScheduler makes this choice.  We
+    may pass a BatchScheduler to BatchExecutor.execute using the
+    "scheduler" keyword argument.
+
+    A BatchScheduler may also learn from the executions in which we use
+    it, by observing the dependencies between Batchers.  A batcher Y
+    depends on a batcher X if a generator yielded an operation for Y
+    after receiving the result of an operation for X, possibly through
+    a chain of generators that finished in between.
+    """
+
+    def choose_batcher(self, batch_sizes):
+        """Return the Batcher whose batch to execute next.
+
+        dict<Batcher, int> batch_sizes - A map from the Batchers with
+            batches that are ready to execute to the number of
+            operations in their batches.  This is non-empty.
+        return Batcher - The key in batch_sizes to execute next.
+        """
+        raise NotImplementedError('Subclass must override')
+
+    def tracks_dependencies(self):
+        """Return whether to call observe_dependencies after executions.
+
+        Tracking dependencies adds a small overhead to each execution.
+        """
+        return False
+
+    def observe_dependencies(self, dependencies):
+        """Record the dependencies between Batchers from an execution.
+
+        BatchExecutor calls this at the end of each execution in which
+        we use the scheduler, if tracks_dependencies() returns True.
+
+        set<tuple<Batcher, Batcher>> dependencies - The pairs (X, Y) of
+            Batchers for which Y depended on X during the execution.
+        """
+        pass
+
+
+class LargestBatchFirstScheduler(BatchScheduler):
+    """A BatchScheduler that executes the largest batch first.
+
+    Executing the largest batch first resumes the most generators at
+    once, which tends to produce large batches in later rounds.
+    """
+
+    def choose_batcher(self, batch_sizes):
+        return max(batch_sizes.iteritems(), key=lambda item: item[1])[0]
+
+
+class BatcherPriorityScheduler(BatchScheduler):
+    """A BatchScheduler that executes batches in order of Batcher.priority().
+
+    We break ties in favor of the largest batch.
+    """
+
+    def choose_batcher(self, batch_sizes):
+        return max(
+            batch_sizes.iteritems(),
+            key=lambda item: (item[0].priority(), item[1]))[0]
+
+
+class CriticalPathScheduler(BatchScheduler):
+    """A BatchScheduler that favors Batchers on the longest dependency chain.
+
+    CriticalPathScheduler observes the dependencies between Batchers
+    across the executions in which we use it, and it estimates the
+    number of batches that follow each Batcher's batch as the length of
+    the longest chain of dependencies starting at the Batcher.  It
+    executes the batch with the longest such chain first, breaking ties
+    in favor of the largest batch.  This keeps the batches on the
+    critical path moving, so that the batches of Batchers at the end of
+    short chains can absorb the operations of several chains at once.
+    To be effective, the same instance must be reused across
+    executions, since it knows nothing about a Batcher the first time it
+    encounters it.
+    """
+
+    # Private attributes:
+    # dict<Batcher, int> _depths - A cache of the lengths of the longest
+    #     chains of dependencies starting at the Batchers, or None if we
+    #     need to recompute it.
+    # dict<Batcher, set<Batcher>> _successors - A map from each Batcher
+    #     to the Batchers we have observed depending on it.
+
+    def __init__(self):
+        self._successors = {}
+        self._depths = {}
+
+    def tracks_dependencies(self):
+        return True
+
+    def observe_dependencies(self, dependencies):
+        is_changed = False
+        for batcher, successor in dependencies:
+            successors = self._successors.setdefault(batcher, set())
+            if successor not in successors:
+                successors.add(successor)
+                is_changed = True
+        if is_changed:
+            self._depths = None
+
+    def _compute_depths(self):
+        """Return the lengths of the longest chains starting at Batchers.
+
+        The dependencies may contain cycles, e.g. for recursive
+        generators.  We ignore the dependencies that close a cycle.
+
+        return dict<Batcher, int> - A map from each Batcher with
+            observed dependencies to the number of Batchers in the
+            longest chain starting at the Batcher.
+        """
+        depths = {}
+        for root in self._successors:
+            if root in depths:
+                continue
+
+            # Iterative depth-first search, computing depths in postorder
+            visiting = set([root])
+            stack = [(root, iter(self._successors.get(root, ())))]
+            while stack:
+                batcher, successors = stack[-1]
+                for successor in successors:
+                    if successor not in depths and successor not in visiting:
+                        visiting.add(successor)
+                        stack.append((
+                            successor,
+                            iter(self._successors.get(successor, ()))))
+                        break
+                else:
+                    stack.pop()
+                    visiting.remove(batcher)
+                    depths[batcher] = 1 + max(
+                        [0] + list([
+                            depths.get(successor, 0)
+                            for successor in self._successors.get(
+                                batcher, ())]))
+        return depths
+
+    def choose_batcher(self, batch_sizes):
+        if self._depths is None:
+            self._depths = self._compute_depths()
+        depths = self._depths
+        return max(
+            batch_sizes.iteritems(),
+            key=lambda item: (depths.get(item[0], 1), item[1]))[0]
@@ -1,6 +1,16 @@
 import sys
+import threading
 
 from gen_result import GenResult
+from operation import AsyncBatcher
+from operation import BatchableOperation
+from operation_error import OperationError
+
+
+# The result of a _SharedGeneratorWaitOperation indicating that the
+# thread that claimed the shared generator released it without starting
+# it, so the waiting generator should try to claim it
+_RELEASED = object()
 
 
 class SharedGenerator(object):
@@ -44,6 +54,18 @@ class SharedGenerator(object):
       prevent this, a SharedGenerator caches and returns the result (or
       exception) of its generator when it is finished executing.
 
+    By default, the first of the above restrictions means that
+    concurrent executions on different threads that yield the same
+    SharedGenerator fail.  A thread-safe SharedGenerator instead lets
+    the first execution to yield it run the generator, and the others
+    wait for its result, so that they share the result without running
+    the generator twice.  A waiting execution continues to run its other
+    generators and batches, and only blocks once it has nothing else to
+    do, as for an AsyncBatcher.  If two executions each wait on a
+    SharedGenerator the other is running, they deadlock, so the
+    generators of thread-safe SharedGenerators should not depend on each
+    other in cycles.
+
     Note that despite the name, SharedGenerator is not a Generator.
     Rather, it wraps a Generator.
     """
@@ -57,12 +79,40 @@ class SharedGenerator(object):
     #     generator is not finished executing or raised an exception.
     # Generator _shared_generator - The shared Generator object to
     #     yield, or None if it is finished executing.
+    # threading.Condition _condition - The condition variable for
+    #     waiting for the result of the generator, which guards
+    #     _owner_thread.  This is None if the SharedGenerator is not
+    #     thread-safe.
+    # callable _finished_callback - The function to call with no
+    #     arguments when the shared Generator finishes executing without
+    #     raising an exception, or None.
+    # bool _is_abandoned - Whether the shared Generator was closed before
+    #     it finished executing.
+    # bool _is_started - Whether we have started executing the shared
+    #     Generator.
+    # threading.Thread _owner_thread - The thread that claimed the right
+    #     to execute the shared Generator, or None.  This is only set if
+    #     the SharedGenerator is thread-safe.
+
+    def __init__(self, generator, is_thread_safe=False):
+        """Initialize a SharedGenerator that wraps the specified Generator.
 
-    def __init__(self, generator):
-        """Initialize a SharedGenerator that wraps the specified Generator."""
+        Generator generator - The generator to share.
+        bool is_thread_safe - Whether executions on other threads that
+            yield the SharedGenerator while it is running wait for its
+            result, rather than failing.
+        """
         self._shared_generator = self._gen_wrap(generator)
         self._result = None
         self._exception_info = None
+        self._is_started = False
+        self._is_abandoned = False
+        self._owner_thread = None
+        self._finished_callback = None
+        if is_thread_safe:
+            self._condition = threading.Condition()
+        else:
+            self._condition = None
 
     def gen(self):
         """Return the result of the generator passed to the constructor."""
@@ -70,9 +120,92 @@ class SharedGenerator(object):
             yield self._result
         elif self._exception_info is not None:
             raise self._exception_info[1], None, self._exception_info[2]
-        else:
+        elif self._condition is None:
             result = yield self._shared_generator
             yield GenResult(result)
+        else:
+            result = yield self._gen_thread_safe()
+            yield GenResult(result)
+
+    def _claim(self):
+        """Claim the right to execute the shared Generator, if possible.
+
+        return bool - Whether the current thread may yield the shared
+            Generator, because no other thread claimed it first.
+        """
+        current_thread = threading.current_thread()
+        with self._condition:
+            if self._owner_thread is None:
+                self._owner_thread = current_thread
+            return self._owner_thread is current_thread
+
+    def _gen_thread_safe(self):
+        """Return the result of the shared Generator for a thread-safe gen().
+
+        Execute the shared Generator if we are the first to claim it, and
+        otherwise wait for the result of the thread that claimed it.
+        """
+        while self._result is None and self._exception_info is None:
+            if self._claim():
+                try:
+                    result = yield self._shared_generator
+                except GeneratorExit:
+                    # Let another thread execute the generator if we
+                    # never started it
+                    with self._condition:
+                        if not self._is_started:
+                            self._owner_thread = None
+                            self._condition.notify_all()
+                    raise
+                yield GenResult(result)
+                return
+            result = yield _SharedGeneratorWaitOperation(self)
+            if result is not _RELEASED:
+                yield GenResult(result)
+                return
+        if self._exception_info is not None:
+            raise self._exception_info[1], None, self._exception_info[2]
+        yield self._result
+
+    def _wait(self):
+        """Wait until another thread finishes or releases the generator.
+
+        return mixed - The result of the generator, or _RELEASED if the
+            thread that claimed it released it without starting it.
+        """
+        with self._condition:
+            while (self._result is None and
+                    self._exception_info is None and
+                    not self._is_abandoned and
+                    self._owner_thread is not None):
+                self._condition.wait()
+        if self._result is not None:
+            return self._result._value
+        elif self._exception_info is not None:
+            raise self._exception_info[1], None, self._exception_info[2]
+        elif self._is_abandoned:
+            raise RuntimeError(
+                'The execution that was running a shared generator stopped '
+                'before the generator finished')
+        else:
+            return _RELEASED
+
+    def _notify_finished(self):
+        """Wake the threads waiting on the generator, if it is thread-safe.
+        """
+        if self._condition is not None:
+            with self._condition:
+                self._condition.notify_all()
+
+    @staticmethod
+    def _is_shared_generator(generator):
+        """Return whether "generator" is the one a SharedGenerator shares.
+
+        BatchExecutor may not close such a Generator early, because
+        other generators may yield it later.
+        """
+        return (
+            generator.gi_code is SharedGenerator._gen_wrap.im_func.func_code)
 
     def _gen_wrap(self, generator):
         """Wrap the specified Generator.
@@ -81,6 +214,7 @@ class SharedGenerator(object):
         "generator", except that (a) it raises an exception if it is
         started multiple times and (b) it stores the result in _result.
         """
+        self._is_started = True
         try:
             value = generator.next()
             while not isinstance(value, GenResult):
@@ -114,8 +248,80 @@ class SharedGenerator(object):
                         value = generator.send(result[0])
             self._result = value
             self._shared_generator = None
+            self._notify_finished()
+            if self._finished_callback is not None:
+                self._finished_callback()
             yield value
         except Exception:
             # "generator" raised an exception
             self._exception_info = sys.exc_info()
+            self._notify_finished()
+            raise
+        except GeneratorExit:
+            if self._result is None:
+                self._is_abandoned = True
+                self._notify_finished()
             raise
+
+
+class _SharedGeneratorWaitOperation(BatchableOperation):
+    """An operation that waits for another thread's SharedGenerator result.
+
+    The result of the operation is the result of the SharedGenerator, or
+    _RELEASED if the thread that claimed it released it without starting
+    it.
+    """
+
+    # Private attributes:
+    # SharedGenerator _shared_generator - The SharedGenerator.
+
+    def __init__(self, shared_generator):
+        self._shared_generator = shared_generator
+
+    def batcher(self):
+        return _SharedGeneratorWaitBatcher.instance()
+
+    def identity_key(self):
+        return self._shared_generator
+
+
+class _SharedGeneratorWaitFuture(object):
+    """A future for the results of _SharedGeneratorWaitOperations."""
+
+    # Private attributes:
+    # list<_SharedGeneratorWaitOperation> _operations - The operations.
+
+    def __init__(self, operations):
+        self._operations = operations
+
+    def result(self):
+        results = []
+        for operation in self._operations:
+            try:
+                results.append(operation._shared_generator._wait())
+            except Exception as exception:
+                results.append(OperationError(exception))
+        return results
+
+
+class _SharedGeneratorWaitBatcher(AsyncBatcher):
+    """The Batcher for _SharedGeneratorWaitOperation.
+
+    Waiting for the results using an AsyncBatcher allows the execution
+    to make progress on its other generators in the meantime.
+    """
+
+    # The singleton instance of _SharedGeneratorWaitBatcher, or None if we
+    # have not created it yet.
+    _instance = None
+
+    @staticmethod
+    def instance():
+        """Return the singleton instance of _SharedGeneratorWaitBatcher."""
+        if _SharedGeneratorWaitBatcher._instance is None:
+            _SharedGeneratorWaitBatcher._instance = (
+                _SharedGeneratorWaitBatcher())
+        return _SharedGeneratorWaitBatcher._instance
+
+    def start_batch(self, operations):
+        return _SharedGeneratorWaitFuture(operations)
@@ -1,7 +1,14 @@
+from batching_analyzer_test import BatchingAnalyzerTest
+from caching_batcher_test import CachingBatcherTest
+from chrome_trace_tracer_test import ChromeTraceTracerTest
+from coalescing_executor_test import CoalescingBatchExecutorTest
 from executor_test import BatchExecutorTest
 from decorators_test import GenDecoratorsTest
 from gen_utils_test import GenUtilsTest
+from lru_cache_test import LruCacheTest
+from scheduler_test import SchedulerTest
 from shared_generator_test import SharedGeneratorTest
+from trace_collector_test import TraceCollectorTest
 
 if __name__ == '__main__':
     import unittest
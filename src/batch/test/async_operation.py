@@ -0,0 +1,162 @@
+import sys
+import threading
+import time
+
+from batch import AsyncBatcher
+from batch import BatchableOperation
+from cache_get_operation import TestCacheGetBatcher
+from error import BatchTestError
+from rendezvous_operation import TestRendezvousBatcher
+
+
+class TestFuture(object):
+    """A future for the result of a function running on another thread."""
+
+    # Private attributes:
+    # tuple<type, mixed, traceback> _exception_info - Information about
+    #     the exception the function raised, as returned by
+    #     sys.exc_info(), or None if it did not raise an exception.
+    # mixed _result - The return value of the function.
+    # threading.Thread _thread - The thread running the function.
+
+    def __init__(self, func):
+        """Start running the specified function on another thread."""
+        self._result = None
+        self._exception_info = None
+        self._thread = threading.Thread(target=self._run, args=(func,))
+        self._thread.start()
+
+    def _run(self, func):
+        try:
+            self._result = func()
+        except Exception:
+            self._exception_info = sys.exc_info()
+
+    def result(self):
+        """Wait for the function to finish, and return its return value."""
+        self._thread.join()
+        if self._exception_info is not None:
+            raise self._exception_info[1], None, self._exception_info[2]
+        return self._result
+
+
+class TestAsyncRendezvousOperation(BatchableOperation):
+    """An AsyncBatcher analog of TestRendezvousOperation.
+
+    The result of a TestAsyncRendezvousOperation is whether the batch
+    executing the operation observed the other batch start executing
+    while it was waiting.
+    """
+
+    # Private attributes:
+    # basestring _name - The name of the Batcher for the operation.
+    # basestring _other_name - The name of the Batcher for which the
+    #     batch waits.
+
+    def __init__(self, name, other_name):
+        self._name = name
+        self._other_name = other_name
+
+    def batcher(self):
+        return TestAsyncRendezvousBatcher(self._name, self._other_name)
+
+
+class TestAsyncRendezvousBatcher(AsyncBatcher):
+    # Private attributes:
+    # TestRendezvousBatcher _batcher - The batcher that performs the
+    #     rendezvous.
+
+    def __init__(self, name, other_name):
+        self._batcher = TestRendezvousBatcher(name, other_name)
+
+    def _rendezvous(self, operations):
+        generator = self._batcher.gen_batch(operations)
+        return generator.next()._value
+
+    def start_batch(self, operations):
+        return TestFuture(lambda: self._rendezvous(operations))
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, TestAsyncRendezvousBatcher) and
+            self._batcher == other._batcher)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash(self._batcher)
+
+
+class TestAsyncExceptionOperation(BatchableOperation):
+    """An operation whose AsyncBatcher's future raises a BatchTestError."""
+
+    def batcher(self):
+        return TestAsyncExceptionBatcher.instance()
+
+
+class TestAsyncExceptionBatcher(AsyncBatcher):
+    # The singleton instance of TestAsyncExceptionBatcher, or None if we have
+    # not created it yet.
+    _instance = None
+
+    @staticmethod
+    def instance():
+        """Return the singleton instance of TestAsyncExceptionBatcher."""
+        if TestAsyncExceptionBatcher._instance is None:
+            TestAsyncExceptionBatcher._instance = TestAsyncExceptionBatcher()
+        return TestAsyncExceptionBatcher._instance
+
+    def _raise(self):
+        raise BatchTestError()
+
+    def start_batch(self, operations):
+        return TestFuture(self._raise)
+
+
+class TestAsyncCacheSetOperation(BatchableOperation):
+    """An AsyncBatcher analog of TestCacheSetOperation.
+
+    The batches for TestAsyncCacheSetOperations store their values in
+    TestCacheGetBatcher.instance().cache after a short delay.
+    """
+
+    # Private attributes:
+    # basestring _key - The key for which to store the value.
+    # mixed _value - The non-None value to store.
+
+    def __init__(self, key, value):
+        self._key = key
+        self._value = value
+
+    def batcher(self):
+        return TestAsyncCacheSetBatcher.instance()
+
+
+class TestAsyncCacheSetBatcher(AsyncBatcher):
+    # The singleton instance of TestAsyncCacheSetBatcher, or None if we have
+    # not created it yet.
+    _instance = None
+
+    # The number of seconds a batch waits before storing its values.
+    DELAY = 0.01
+
+    @staticmethod
+    def instance():
+        """Return the singleton instance of TestAsyncCacheSetBatcher."""
+        if TestAsyncCacheSetBatcher._instance is None:
+            TestAsyncCacheSetBatcher._instance = TestAsyncCacheSetBatcher()
+        return TestAsyncCacheSetBatcher._instance
+
+    def must_precede(self, batcher):
+        return isinstance(batcher, TestCacheGetBatcher)
+
+    def _set(self, operations):
+        time.sleep(TestAsyncCacheSetBatcher.DELAY)
+        cache = TestCacheGetBatcher.instance().cache
+        for operation in operations:
+            cache[operation._key] = operation._value
+        return [None] * len(operations)
+
+    def start_batch(self, operations):
+        return TestFuture(lambda: self._set(operations))
@@ -0,0 +1,55 @@
+import unittest
+
+from batch import BatchExecutor
+from batch import BatchingAnalyzer
+from batch import GenResult
+from identity_operation import TestIdentityOperation
+
+
+class BatchingAnalyzerTest(unittest.TestCase):
+    def _gen_sequential(self, value):
+        value1 = yield TestIdentityOperation(value)
+        value2 = yield TestIdentityOperation(value + 1)
+        value3 = yield TestIdentityOperation(value + 2)
+        yield GenResult(value1 + value2 + value3)
+
+    def _gen_together(self, value):
+        values = yield [
+            TestIdentityOperation(value), TestIdentityOperation(value + 1),
+            TestIdentityOperation(value + 2)]
+        yield GenResult(sum(values))
+
+    def _gen_nested(self, value):
+        nested_value = BatchExecutor.execute(TestIdentityOperation(value))
+        result = yield self._gen_together(nested_value)
+        yield GenResult(result)
+
+    def _gen_all(self):
+        results = yield [
+            self._gen_sequential(1), self._gen_together(10),
+            self._gen_nested(20)]
+        yield GenResult(results)
+
+    def test_batching_analyzer(self):
+        """Test BatchingAnalyzer."""
+        analyzer = BatchingAnalyzer()
+        self.assertEqual(
+            [6, 33, 63],
+            BatchExecutor.execute(self._gen_all(), tracer=analyzer))
+        self.assertEqual(
+            {'_gen_all': 1, '_gen_nested': 1, '_gen_sequential': 1,
+                '_gen_together': 2},
+            analyzer.generator_counts)
+        self.assertEqual({'_gen_sequential': 2}, analyzer.round_trip_counts)
+        self.assertEqual(
+            {'_gen_sequential': 2}, analyzer.sequential_yield_counts)
+        self.assertEqual({'_gen_nested': 1}, analyzer.nested_execute_counts)
+        self.assertEqual(
+            [('_gen_sequential', 2), ('_gen_nested', 1)],
+            analyzer.ranked_generators())
+        self.assertEqual(
+            {'TestIdentityBatcher': 2}, analyzer.small_batch_counts)
+        report = analyzer.format()
+        self.assertLess(
+            report.index('_gen_sequential'), report.index('_gen_nested'))
+        self.assertIn('TestIdentityBatcher', report)
@@ -0,0 +1,64 @@
+import threading
+
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+
+
+class TestBlockingOperation(BatchableOperation):
+    """An operation whose batches wait until TestBlockingBatcher is released.
+
+    The result of a TestBlockingOperation is the argument to the
+    constructor.
+    """
+
+    # Private attributes:
+    # mixed _value - The result.
+
+    def __init__(self, value):
+        self._value = value
+
+    def batcher(self):
+        return TestBlockingBatcher.instance()
+
+
+class TestBlockingBatcher(Batcher):
+    """The Batcher for TestBlockingOperation.
+
+    Public attributes:
+
+    int batch_count - The number of batches we have executed.
+    threading.Event release - The event that batches wait for before
+        finishing.
+    threading.Event started - The event indicating that a batch started
+        executing.
+    """
+
+    # The maximum number of seconds for which a batch waits to be released
+    TIMEOUT = 2
+
+    # The singleton instance of TestBlockingBatcher, or None if we have not
+    # created it yet.
+    _instance = None
+
+    def __init__(self):
+        self.reset()
+
+    @staticmethod
+    def instance():
+        """Return the singleton instance of TestBlockingBatcher."""
+        if TestBlockingBatcher._instance is None:
+            TestBlockingBatcher._instance = TestBlockingBatcher()
+        return TestBlockingBatcher._instance
+
+    def reset(self):
+        """Reset the batch count and the events."""
+        self.batch_count = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def gen_batch(self, operations):
+        self.batch_count += 1
+        self.started.set()
+        self.release.wait(TestBlockingBatcher.TIMEOUT)
+        yield GenResult(list([operation._value for operation in operations]))
@@ -1,7 +1,9 @@
 from batch import BatchableOperation
 from batch import Batcher
 from batch import GenResult
+from batch import RetryPolicy
 from cache_get_operation import TestCacheGetBatcher
+from error import BatchTestError
 
 
 class TestCacheSetOperation(BatchableOperation):
@@ -30,8 +32,13 @@ class TestCacheSetBatcher(Batcher):
 
     Public attributes:
 
+    list<list<tuple<basestring, mixed>>> batches - The key-value pairs
+        of the operations in each batch we have executed, in order.
     dict<basestring, mixed> cache - A map from the keys to the values
         stored in the cache.
+    int failure_count - The number of batches to fail with a
+        BatchTestError before storing any values.  We retry failed
+        batches after a short delay.
     """
 
     # The singleton instance of TestCacheSetBatcher, or None if we have not
@@ -40,6 +47,8 @@ class TestCacheSetBatcher(Batcher):
 
     def __init__(self):
         self.cache = {}
+        self.batches = []
+        self.failure_count = 0
 
     @staticmethod
     def instance():
@@ -48,7 +57,24 @@ class TestCacheSetBatcher(Batcher):
             TestCacheSetBatcher._instance = TestCacheSetBatcher()
         return TestCacheSetBatcher._instance
 
+    def must_precede(self, batcher):
+        return isinstance(batcher, TestCacheGetBatcher)
+
+    def is_last_write_wins(self):
+        return True
+
+    def write_key(self, operation):
+        return operation._key
+
+    def retry_policy(self):
+        return RetryPolicy(initial_delay=0.01)
+
     def gen_batch(self, operations):
+        self.batches.append(list([
+            (operation._key, operation._value) for operation in operations]))
+        if self.failure_count > 0:
+            self.failure_count -= 1
+            raise BatchTestError()
         cache = TestCacheGetBatcher.instance().cache
         for operation in operations:
             cache[operation._key] = operation._value
@@ -0,0 +1,53 @@
+import unittest
+
+from batch import BatchExecutor
+from batch import CachedOperation
+from cache_get_operation import TestCacheGetBatcher
+from hash_caching_batcher import TestHashCachingBatcher
+from hash_operation import TestHashBatcher
+from hash_operation import TestHashOperation
+
+
+class CachingBatcherTest(unittest.TestCase):
+    def _cached_operation(self, key):
+        return CachedOperation(
+            TestHashOperation(key), TestHashCachingBatcher.instance())
+
+    def test_caching_batcher(self):
+        """Test fetching results through a cache using CachingBatcher."""
+        cache = TestCacheGetBatcher.instance().cache
+        cache.clear()
+        cache['coolUserId'] = 43
+        hash_batcher = TestHashBatcher.instance()
+        hash_batcher.batches = []
+        self.assertEqual(
+            [43, 60, {'favoriteFood': 'pizza'}, 60],
+            BatchExecutor.executeva(
+                self._cached_operation('coolUserId'),
+                self._cached_operation('coolChairId'),
+                self._cached_operation('user:42'),
+                self._cached_operation('coolChairId')))
+        self.assertEqual(1, len(hash_batcher.batches))
+        self.assertEqual(
+            ['coolChairId', 'user:42'], sorted(hash_batcher.batches[0]))
+        self.assertEqual(
+            {
+                'coolChairId': 60,
+                'coolUserId': 43,
+                'user:42': {'favoriteFood': 'pizza'},
+            },
+            cache)
+
+        hash_batcher.batches = []
+        self.assertEqual(
+            [60, 12],
+            BatchExecutor.executeva(
+                self._cached_operation('coolChairId'),
+                self._cached_operation('spouseId:42')))
+        self.assertEqual([['spouseId:42']], hash_batcher.batches)
+
+        with self.assertRaises(KeyError):
+            BatchExecutor.execute(self._cached_operation('missingKey'))
+        self.assertNotIn('missingKey', cache)
+        self.assertEqual(
+            43, BatchExecutor.execute(self._cached_operation('coolUserId')))
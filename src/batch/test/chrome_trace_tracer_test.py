@@ -0,0 +1,171 @@
+import json
+from multiprocessing.pool import ThreadPool
+import os
+import shutil
+import tempfile
+import unittest
+
+from batch import BatchExecutor
+from batch import ChromeTraceTracer
+from batch import GenResult
+from chunked_operation import TestChunkedOperation
+from db_object_operation import TestDbObjectOperation
+from error import BatchTestError
+from exception_operation import TestExceptionOperation
+from identity_operation import TestIdentityOperation
+
+
+class ChromeTraceTracerTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def _gen_objects(self):
+        chair, user = yield (
+            TestDbObjectOperation('chair', 60),
+            TestDbObjectOperation('user', 42))
+        value = yield TestIdentityOperation(chair['color'])
+        yield GenResult((value, user['favoriteFood']))
+
+    def _gen_raise(self):
+        yield TestExceptionOperation()
+
+    def _batch_spans(self, events):
+        """Return the spans of the batches in the specified trace events.
+
+        list<dict<basestring, object>> events - The events.
+        return dict<int, dict<basestring, object>> - A map from the IDs
+            of the batches' asynchronous events to their "b" events,
+            with the addition of an "end" field indicating the
+            timestamp of the corresponding "e" event.
+        """
+        spans = {}
+        for event in events:
+            if event['ph'] == 'b':
+                self.assertNotIn(event['id'], spans)
+                spans[event['id']] = dict(event)
+        for event in events:
+            if event['ph'] == 'e':
+                span = spans[event['id']]
+                self.assertNotIn('end', span)
+                self.assertEqual(span['name'], event['name'])
+                span['end'] = event['ts']
+        for span in spans.itervalues():
+            self.assertEqual('batch', span['cat'])
+            self.assertGreaterEqual(span['end'], span['ts'])
+        return spans
+
+    def test_chrome_trace_tracer(self):
+        """Test writing a Chrome trace file using ChromeTraceTracer."""
+        path = os.path.join(self._dir, 'trace.json')
+        tracer = ChromeTraceTracer(path)
+        self.assertEqual(
+            ('brown', 'pizza'),
+            BatchExecutor.execute(self._gen_objects(), tracer=tracer))
+        with open(path) as file_:
+            trace = json.load(file_)
+        events = trace['traceEvents']
+
+        thread_names = {}
+        for event in events:
+            if event['ph'] == 'M':
+                thread_names[event['tid']] = event['args']['name']
+        self.assertEqual({0: 'executor'}, thread_names)
+        batch_tracks = {}
+        for span in self._batch_spans(events).itervalues():
+            batch_tracks.setdefault(
+                span['name'].split(' ')[0], set()).add(span['name'])
+            self.assertGreaterEqual(span['args']['operations'], 1)
+        self.assertIn('TestDbObjectBatcher', batch_tracks)
+        self.assertEqual(1, len(batch_tracks['TestIdentityBatcher']))
+
+        executor_names = set([
+            event['name'] for event in events
+            if event['ph'] == 'X' and event['tid'] == 0])
+        self.assertIn('execute #1', executor_names)
+        self.assertIn('round 1', executor_names)
+        self.assertIn('_gen_objects', executor_names)
+
+        with self.assertRaises(BatchTestError):
+            BatchExecutor.execute(self._gen_raise(), tracer=tracer)
+        with open(path) as file_:
+            events = json.load(file_)['traceEvents']
+        self.assertIn(
+            'raise in _gen_raise',
+            set([event['name'] for event in events if event['ph'] == 'i']))
+        execute_events = list([
+            event for event in events if event['name'] == 'execute #2'])
+        self.assertEqual(1, len(execute_events))
+        self.assertIn('BatchTestError', execute_events[0]['args']['exception'])
+
+        # We append the events of each execution to the file, rather than
+        # keeping them in memory
+        self.assertEqual([], tracer.events)
+        names = set([event['name'] for event in events])
+        self.assertIn('execute #1', names)
+        self.assertIn('thread_name', names)
+        self.assertEqual(
+            1, len([event for event in events if event['ph'] == 'M']))
+
+    def test_overlapping_batches(self):
+        """Test recording batches of one Batcher that overlap in time."""
+        tracer = ChromeTraceTracer()
+        thread_pool = ThreadPool(4)
+        try:
+            self.assertEqual(
+                ['a', 'b', 'c', 'd'],
+                BatchExecutor.executev(
+                    list([
+                        TestChunkedOperation(value, 1)
+                        for value in ['a', 'b', 'c', 'd']]),
+                    thread_pool=thread_pool, tracer=tracer))
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+        spans = self._batch_spans(tracer.events)
+        self.assertEqual(4, len(spans))
+        self.assertEqual(
+            1, len(set([span['name'] for span in spans.itervalues()])))
+
+    def _gen_nested_execute(self, tracer):
+        value = BatchExecutor.execute(
+            TestIdentityOperation('nested'), tracer=tracer)
+        chair = yield TestDbObjectOperation('chair', 60)
+        yield GenResult((value, chair['color']))
+
+    def test_nested_execute(self):
+        """Test recording a nested execution."""
+        tracer = ChromeTraceTracer()
+        self.assertEqual(
+            ('nested', 'brown'),
+            BatchExecutor.execute(
+                self._gen_nested_execute(tracer), tracer=tracer))
+        thread_names = dict([
+            (event['tid'], event['args']['name'])
+            for event in tracer.events if event['ph'] == 'M'])
+        self.assertEqual(
+            {0: 'executor', 1: 'executor (nested 1)'}, thread_names)
+
+        executions = dict([
+            (event['name'], event) for event in tracer.events
+            if event['ph'] == 'X' and event['name'].startswith('execute')])
+        self.assertEqual(0, executions['execute #1']['tid'])
+        self.assertEqual(1, executions['execute #2']['tid'])
+        self.assertLessEqual(
+            executions['execute #1']['ts'], executions['execute #2']['ts'])
+        self.assertGreaterEqual(
+            executions['execute #1']['ts'] + executions['execute #1']['dur'],
+            executions['execute #2']['ts'] + executions['execute #2']['dur'])
+
+        # The nested execution does not disturb the outer one's rounds
+        outer_rounds = list([
+            event['name'] for event in tracer.events
+            if event['ph'] == 'X' and event['tid'] == 0 and
+            event['name'].startswith('round')])
+        self.assertEqual(
+            list([
+                'round {:d}'.format(index)
+                for index in xrange(1, len(outer_rounds) + 1)]),
+            outer_rounds)
@@ -0,0 +1,72 @@
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+
+
+class TestChunkedOperation(BatchableOperation):
+    """An operation whose result is a string passed to the constructor.
+
+    The Batcher for a TestChunkedOperation limits the size of its
+    batches.  The payload size of a TestChunkedOperation is the length
+    of its string.
+    """
+
+    # Private attributes:
+    # int _max_batch_bytes - The maximum payload size of a batch.
+    # int _max_batch_size - The maximum number of operations in a batch.
+    # basestring _value - The result.
+
+    def __init__(self, value, max_batch_size, max_batch_bytes=None):
+        self._value = value
+        self._max_batch_size = max_batch_size
+        self._max_batch_bytes = max_batch_bytes
+
+    def batcher(self):
+        return TestChunkedBatcher(self._max_batch_size, self._max_batch_bytes)
+
+
+class TestChunkedBatcher(Batcher):
+    """The Batcher for TestChunkedOperation.
+
+    Public attributes:
+
+    list<list<basestring>> batches - The values of the operations in
+        each batch we have executed, in order, for all
+        TestChunkedBatchers.
+    """
+
+    batches = []
+
+    # Private attributes:
+    # int _max_batch_bytes - The maximum payload size of a batch.
+    # int _max_batch_size - The maximum number of operations in a batch.
+
+    def __init__(self, max_batch_size, max_batch_bytes):
+        self._max_batch_size = max_batch_size
+        self._max_batch_bytes = max_batch_bytes
+
+    def max_batch_size(self):
+        return self._max_batch_size
+
+    def max_batch_bytes(self):
+        return self._max_batch_bytes
+
+    def operation_bytes(self, operation):
+        return len(operation._value)
+
+    def gen_batch(self, operations):
+        values = list([operation._value for operation in operations])
+        TestChunkedBatcher.batches.append(values)
+        yield GenResult(values)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, TestChunkedBatcher) and
+            self._max_batch_size == other._max_batch_size and
+            self._max_batch_bytes == other._max_batch_bytes)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash((self._max_batch_size, self._max_batch_bytes))
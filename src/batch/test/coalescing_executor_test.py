@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+
+from batch import CoalescingBatchExecutor
+from batch import GenResult
+from blocking_operation import TestBlockingBatcher
+from blocking_operation import TestBlockingOperation
+from error import BatchTestError
+from identity_operation import TestIdentityBatcher
+from identity_operation import TestIdentityOperation
+
+
+class CoalescingBatchExecutorTest(unittest.TestCase):
+    def _gen_double(self, value):
+        result = yield TestIdentityOperation(value)
+        if result < 0:
+            raise BatchTestError()
+        yield GenResult(2 * result)
+
+    def test_coalescing(self):
+        """Test batching the roots that multiple threads submit."""
+        TestIdentityBatcher.instance().batches = []
+        executor = CoalescingBatchExecutor(max_delay=10, max_pending=20)
+        try:
+            results = {}
+
+            def execute(value):
+                try:
+                    results[value] = executor.execute(self._gen_double(value))
+                except BatchTestError:
+                    results[value] = 'error'
+
+            threads = list([
+                threading.Thread(target=execute, args=(value,))
+                for value in xrange(-1, 19)])
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            expected_results = dict(
+                [(value, 2 * value) for value in xrange(19)])
+            expected_results[-1] = 'error'
+            self.assertEqual(expected_results, results)
+            self.assertEqual(
+                [set(xrange(-1, 19))],
+                list([
+                    set(batch)
+                    for batch in TestIdentityBatcher.instance().batches]))
+        finally:
+            executor.shutdown()
+
+    def test_delay(self):
+        """Test that we execute roots once the time window elapses."""
+        executor = CoalescingBatchExecutor(max_delay=0.01)
+        try:
+            future1 = executor.submit(self._gen_double(3))
+            future2 = executor.submit(TestIdentityOperation(4))
+            self.assertEqual(6, future1.result(5))
+            self.assertEqual(4, future2.result(5))
+            self.assertEqual(10, executor.execute(self._gen_double(5)))
+            with self.assertRaises(BatchTestError):
+                executor.execute(self._gen_double(-1))
+
+            # Invalid roots do not reach the worker thread
+            with self.assertRaises(TypeError):
+                executor.submit(3)
+            self.assertEqual(6, executor.execute(self._gen_double(3)))
+        finally:
+            executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            executor.submit(self._gen_double(3))
+
+    def test_leftover_delay(self):
+        """Test the delay of roots left over from a full window.
+
+        Roots that do not fit in a window must not wait for a new window
+        to elapse if they already waited for max_delay seconds.
+        """
+        batcher = TestBlockingBatcher.instance()
+        batcher.reset()
+        executor = CoalescingBatchExecutor(max_delay=0.3, max_pending=2)
+        try:
+            future = executor.submit(TestBlockingOperation(0))
+            self.assertTrue(batcher.started.wait(TestBlockingBatcher.TIMEOUT))
+            futures = list([
+                executor.submit(TestIdentityOperation(value))
+                for value in xrange(3)])
+            time.sleep(0.35)
+            start_time = time.time()
+            batcher.release.set()
+            self.assertEqual(0, future.result(5))
+            self.assertEqual(
+                [0, 1, 2], list([future.result(5) for future in futures]))
+            self.assertLess(time.time() - start_time, 0.2)
+        finally:
+            executor.shutdown()
@@ -0,0 +1,48 @@
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+
+
+class TestCyclicOperation(BatchableOperation):
+    """An operation whose result is the argument to the constructor.
+
+    The Batchers for TestCyclicOperations with different names must
+    precede each other, so their Batcher.must_precede constraints form a
+    cycle.
+    """
+
+    # Private attributes:
+    # basestring _name - The name of the Batcher for the operation.
+    # mixed _value - The result.
+
+    def __init__(self, name, value):
+        self._name = name
+        self._value = value
+
+    def batcher(self):
+        return TestCyclicBatcher(self._name)
+
+
+class TestCyclicBatcher(Batcher):
+    # Private attributes:
+    # basestring _name - The name of the Batcher.
+
+    def __init__(self, name):
+        self._name = name
+
+    def must_precede(self, batcher):
+        return isinstance(batcher, TestCyclicBatcher)
+
+    def gen_batch(self, operations):
+        yield GenResult(list([operation._value for operation in operations]))
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, TestCyclicBatcher) and
+            self._name == other._name)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash(self._name)
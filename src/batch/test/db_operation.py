@@ -25,6 +25,13 @@ class TestDbOperation(BatchableOperation):
 
 
 class TestDbBatcher(Batcher):
+    """The Batcher for TestDbOperation.
+
+    Public attributes:
+
+    int batch_count - The number of batches we have executed.
+    """
+
     # dict<str, dict<int, dict<str, mixed>>> - A map from object type to
     # a map from object id to a dictionary describing the object.
     _dict = {
@@ -52,7 +59,11 @@ class TestDbBatcher(Batcher):
             TestDbBatcher._instance = TestDbBatcher()
         return TestDbBatcher._instance
 
+    def __init__(self):
+        self.batch_count = 0
+
     def gen_batch(self, operations):
+        self.batch_count += 1
         results = []
         for operation in operations:
             if operation._query[0] == 'value':
@@ -1,6 +1,11 @@
+import sys
+import threading
+import time
+import traceback
 import unittest
 
 from batch import BatchExecutor
+from blocking_operation import TestBlockingBatcher
 from decorators_test_object import GenDecoratorsTestObject
 from error import BatchTestError
 
@@ -142,6 +147,23 @@ class GenDecoratorsTest(unittest.TestCase):
             127, BatchExecutor.execute(obj.gen_cached_generator(8, 9, 10, 11)))
         self.assertEqual([(8, 9, 10, 11)], obj.cached_generator_args)
 
+    def test_cached_generator_key(self):
+        """Test the "key" argument to the cached_generator decorator."""
+        obj = GenDecoratorsTestObject()
+        self.assertEqual(
+            [2, 2, 3],
+            BatchExecutor.executeva(
+                obj.gen_count_with_key([1, 2]),
+                obj.gen_count_with_key([2, 1, 2], label='foo'),
+                obj.gen_count_with_key([1, 2, 3])))
+        self.assertEqual(
+            [[1, 2], [1, 2, 3]], sorted(obj.count_with_key_args))
+
+        obj = GenDecoratorsTestObject()
+        self.assertEqual(
+            2, BatchExecutor.execute(obj.gen_count_with_key([2, 1])))
+        self.assertEqual([[2, 1]], obj.count_with_key_args)
+
     def test_cached_raise(self):
         """Test that the cached_generator decorator works with exceptions.
 
@@ -164,6 +186,16 @@ class GenDecoratorsTest(unittest.TestCase):
         self.assertEqual(
             {-5: 1, -1: 1, 6: 1, 42: 1}, obj.cached_identity_call_counts)
 
+        # Cached exceptions keep the traceback of the original call
+        try:
+            obj.gen_cached_identity(-5)
+        except BatchTestError:
+            self.assertEqual(
+                'gen_cached_identity',
+                traceback.extract_tb(sys.exc_info()[2])[-1][2])
+        else:
+            self.fail('Expected a BatchTestError')
+
         with self.assertRaises(BatchTestError):
             BatchExecutor.execute(obj.gen_cached_identity_with_yield(-1))
         obj.gen_cached_identity_with_yield(-1)
@@ -219,3 +251,108 @@ class GenDecoratorsTest(unittest.TestCase):
         self.assertEqual({1: 2, 5: 1}, obj.identity_with_cache1_call_counts)
         self.assertEqual({(3, 4): 2}, obj.sum_with_cache1_call_counts)
         self.assertEqual({5: 1}, obj.identity_with_cache2_call_counts)
+
+    def test_bounded_generator_cache(self):
+        """Test using cached_generator with a bounded GeneratorCache."""
+        obj = GenDecoratorsTestObject()
+        cache = GenDecoratorsTestObject.BOUNDED_CACHE
+        cache.clear()
+        hit_count = cache.hit_count
+        miss_count = cache.miss_count
+        eviction_count = cache.eviction_count
+        self.assertEqual(
+            [1, 2, 1],
+            BatchExecutor.executeva(
+                obj.gen_identity_with_bounded_cache(1),
+                obj.gen_identity_with_bounded_cache(2),
+                obj.gen_identity_with_bounded_cache(1)))
+        self.assertEqual(
+            {1: 1, 2: 1}, obj.identity_with_bounded_cache_call_counts)
+
+        # Evict the least recently used call, which is the call for 2
+        self.assertEqual(
+            3, BatchExecutor.execute(obj.gen_identity_with_bounded_cache(3)))
+        self.assertEqual(
+            1, BatchExecutor.execute(obj.gen_identity_with_bounded_cache(1)))
+        self.assertEqual(
+            {1: 1, 2: 1, 3: 1}, obj.identity_with_bounded_cache_call_counts)
+        self.assertEqual(
+            2, BatchExecutor.execute(obj.gen_identity_with_bounded_cache(2)))
+        self.assertEqual(
+            {1: 1, 2: 2, 3: 1}, obj.identity_with_bounded_cache_call_counts)
+
+        self.assertEqual(2, cache.hit_count - hit_count)
+        self.assertEqual(4, cache.miss_count - miss_count)
+        self.assertEqual(2, cache.eviction_count - eviction_count)
+
+    def test_size_bounded_generator_cache(self):
+        """Test bounding the total size of the results in a GeneratorCache.
+        """
+        obj = GenDecoratorsTestObject()
+        cache = GenDecoratorsTestObject.SIZE_BOUNDED_CACHE
+        cache.clear()
+        eviction_count = cache.eviction_count
+        for length in xrange(400, 405):
+            self.assertEqual(
+                length,
+                len(
+                    BatchExecutor.execute(
+                        obj.gen_string_with_size_bounded_cache(length))))
+        self.assertEqual(3, cache.eviction_count - eviction_count)
+
+        # The two most recent calls fit in the cache
+        for length in [404, 403, 402]:
+            BatchExecutor.execute(
+                obj.gen_string_with_size_bounded_cache(length))
+        self.assertEqual(
+            {400: 1, 401: 1, 402: 2, 403: 1, 404: 1},
+            obj.string_with_size_bounded_cache_call_counts)
+
+    def test_thread_safe_generator_cache(self):
+        """Test sharing cached_generator calls between threads."""
+        obj = GenDecoratorsTestObject()
+        batcher = TestBlockingBatcher.instance()
+        batcher.reset()
+        results = {}
+
+        def execute(name):
+            results[name] = BatchExecutor.execute(
+                obj.gen_blocking_identity_with_thread_safe_cache(7))
+
+        thread1 = threading.Thread(target=execute, args=('thread1',))
+        thread1.start()
+        self.assertTrue(batcher.started.wait(TestBlockingBatcher.TIMEOUT))
+
+        # Give the second execution time to start waiting for the first
+        thread2 = threading.Thread(target=execute, args=('thread2',))
+        thread2.start()
+        time.sleep(0.05)
+        batcher.release.set()
+        thread1.join()
+        thread2.join()
+        self.assertEqual({'thread1': 7, 'thread2': 7}, results)
+        self.assertEqual({7: 1}, obj.thread_safe_call_counts)
+        self.assertEqual(1, batcher.batch_count)
+        self.assertEqual(
+            7,
+            BatchExecutor.execute(
+                obj.gen_blocking_identity_with_thread_safe_cache(7)))
+        self.assertEqual({7: 1}, obj.thread_safe_call_counts)
+
+        # A slow call does not block calls on other threads
+        slow_event = threading.Event()
+        thread = threading.Thread(
+            target=obj.gen_identity_after_event, args=(1, slow_event))
+        thread.start()
+        try:
+            time.sleep(0.05)
+            fast_event = threading.Event()
+            fast_event.set()
+            self.assertEqual(
+                2,
+                BatchExecutor.execute(
+                    obj.gen_identity_after_event(2, fast_event)))
+            self.assertTrue(thread.is_alive())
+        finally:
+            slow_event.set()
+            thread.join()
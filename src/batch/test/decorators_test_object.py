@@ -1,6 +1,8 @@
 from batch import cached_generator
 from batch import GenResult
 from batch import GeneratorCache
+from blocking_operation import TestBlockingBatcher
+from blocking_operation import TestBlockingOperation
 from error import BatchTestError
 from identity_operation import TestIdentityOperation
 
@@ -26,16 +28,29 @@ class GenDecoratorsTestObject(object):
         argument.
     list<list<object>> fibonacci_obj_args - A list of the arguments
         passed to successive calls to gen_fibonacci_from_obj, in order.
+    list<list<int>> count_with_key_args - A list of the values passed
+        to successive calls to gen_count_with_key, in order.
+    dict<mixed, int> identity_with_bounded_cache_call_counts - A map
+        from each value passed to gen_identity_with_bounded_cache to the
+        number of times we called the method with the value as an
+        argument.
     dict<mixed, int> identity_with_cache1_call_counts - A map from each
         value passed to gen_identity_with_cache1 to the number of times
         we called the method with the value as an argument.
     dict<mixed, int> identity_with_cache2_call_counts - A map from each
         value passed to gen_identity_with_cache2 to the number of times
         we called the method with the value as an argument.
+    dict<int, int> string_with_size_bounded_cache_call_counts - A map
+        from each length passed to gen_string_with_size_bounded_cache to
+        the number of times we called the method with the length as an
+        argument.
     dict<tuple<int, int>, int> sum_with_cache1_call_counts - A map from
         each tuple of the positional arguments passed to
         gen_sum_with_cache1 to the number of times we called the method
         with the arguments.
+    dict<int, int> thread_safe_call_counts - A map from each value passed
+        to gen_blocking_identity_with_thread_safe_cache to the number of
+        times we called the method with the value as an argument.
     """
 
     # The GeneratorCache for gen_identity_with_cache1 and gen_sum_with_cache1
@@ -44,6 +59,16 @@ class GenDecoratorsTestObject(object):
     # The GeneratorCache for gen_identity_with_cache2
     CACHE2 = GeneratorCache()
 
+    # The GeneratorCache for gen_identity_with_bounded_cache
+    BOUNDED_CACHE = GeneratorCache(max_entries=2)
+
+    # The GeneratorCache for gen_string_with_size_bounded_cache
+    SIZE_BOUNDED_CACHE = GeneratorCache(max_bytes=1000, sizeof=len)
+
+    # The GeneratorCache for gen_blocking_identity_with_thread_safe_cache and
+    # gen_identity_after_event
+    THREAD_SAFE_CACHE = GeneratorCache(is_thread_safe=True)
+
     def __init__(self):
         self.fibonacci_call_counts = {}
         self.fibonacci_obj_args = []
@@ -53,6 +78,10 @@ class GenDecoratorsTestObject(object):
         self.identity_with_cache1_call_counts = {}
         self.sum_with_cache1_call_counts = {}
         self.identity_with_cache2_call_counts = {}
+        self.identity_with_bounded_cache_call_counts = {}
+        self.string_with_size_bounded_cache_call_counts = {}
+        self.count_with_key_args = []
+        self.thread_safe_call_counts = {}
 
     @cached_generator
     def gen_fibonacci_without_operations(self, i):
@@ -157,3 +186,42 @@ class GenDecoratorsTestObject(object):
             self.identity_with_cache2_call_counts.get(value, 0) + 1)
         result = yield TestIdentityOperation(value)
         yield GenResult(result)
+
+    @cached_generator(BOUNDED_CACHE)
+    def gen_identity_with_bounded_cache(self, value):
+        self.identity_with_bounded_cache_call_counts[value] = (
+            self.identity_with_bounded_cache_call_counts.get(value, 0) + 1)
+        result = yield TestIdentityOperation(value)
+        yield GenResult(result)
+
+    @cached_generator(SIZE_BOUNDED_CACHE)
+    def gen_string_with_size_bounded_cache(self, length):
+        """Return a string of the specified length."""
+        self.string_with_size_bounded_cache_call_counts[length] = (
+            self.string_with_size_bounded_cache_call_counts.get(length, 0) +
+            1)
+        result = yield TestIdentityOperation('x' * length)
+        yield GenResult(result)
+
+    @cached_generator(key=lambda self, values, label=None: (
+        self, frozenset(values)))
+    def gen_count_with_key(self, values, label=None):
+        self.count_with_key_args.append(values)
+        result = yield TestIdentityOperation(len(set(values)))
+        yield GenResult(result)
+
+    @cached_generator(THREAD_SAFE_CACHE)
+    def gen_blocking_identity_with_thread_safe_cache(self, value):
+        self.thread_safe_call_counts[value] = (
+            self.thread_safe_call_counts.get(value, 0) + 1)
+        result = yield TestBlockingOperation(value)
+        yield GenResult(result)
+
+    @cached_generator(THREAD_SAFE_CACHE)
+    def gen_identity_after_event(self, value, event):
+        """Wait for the specified threading.Event, then return a generator.
+
+        The generator returns "value".
+        """
+        event.wait(TestBlockingBatcher.TIMEOUT)
+        return self._gen_identity(value)
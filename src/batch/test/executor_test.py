@@ -1,20 +1,42 @@
+from multiprocessing.pool import ThreadPool
 import unittest
 
+from async_operation import TestAsyncCacheSetOperation
+from async_operation import TestAsyncExceptionOperation
+from async_operation import TestAsyncRendezvousOperation
 from batch import BatchExecutor
+from batch import ChromeTraceTracer
 from batch import GenResult
+from batch import LargestBatchFirstScheduler
+from batch import RetryPolicy
+from batch import SharedGenerator
 from cache_get_operation import TestCacheGetOperation
 from cache_get_operation import TestCacheGetBatcher
+from cache_set_operation import TestCacheSetBatcher
 from cache_set_operation import TestCacheSetOperation
+from chunked_operation import TestChunkedBatcher
+from chunked_operation import TestChunkedOperation
+from cyclic_operation import TestCyclicOperation
 from db_object_operation import TestDbObjectOperation
+from db_operation import TestDbBatcher
 from db_operation import TestDbOperation
 from error import BatchTestError
 from exception_operation import TestExceptionOperation
+from flaky_operation import TestFlakyBatcher
+from flaky_operation import TestFlakyOperation
 from hash_operation import TestHashOperation
+from identity_operation import TestIdentityBatcher
 from identity_operation import TestIdentityOperation
 from operation_with_exception_batcher import (
     TestOperationWithExceptionBatcherOperation)
 from operation_with_nested_exception_batcher import (
     TestOperationWithNestedExceptionBatcherOperation)
+from partial_failure_operation import TestPartialFailureBatcher
+from partial_failure_operation import TestPartialFailureOperation
+from rendezvous_operation import TestRendezvousBatcher
+from rendezvous_operation import TestRendezvousOperation
+from result_cache_operation import TestResultCacheBatcher
+from result_cache_operation import TestResultCacheOperation
 from user import TestUser
 
 
@@ -208,6 +230,22 @@ class BatchExecutorTest(unittest.TestCase):
         self.assertEqual('brown', chair_data['color'])
         self.assertEqual(2, user_count)
 
+    def test_strict_rounds(self):
+        """Test the strict_rounds option of BatchExecutor.execute.
+
+        Test that TestDbOperations the TestDbObjectBatchers for
+        different object types yield go in the same batch.
+        """
+        db_batcher = TestDbBatcher.instance()
+        db_batcher.batch_count = 0
+        user1, user2, chair_data, user_count = BatchExecutor.execute(
+            self._gen_db_info(), strict_rounds=True)
+        self.assertEqual('pizza', user1.favorite_food())
+        self.assertEqual('ice cream', user2.favorite_food())
+        self.assertEqual('brown', chair_data['color'])
+        self.assertEqual(2, user_count)
+        self.assertEqual(2, db_batcher.batch_count)
+
     def _gen_hash_with_cache(self, key):
         """Fetch a hash key using the cache.
 
@@ -482,3 +520,618 @@ class BatchExecutorTest(unittest.TestCase):
         generator[0] = self._gen_recursive(generator)
         with self.assertRaises(Exception):
             BatchExecutor.execute(generator[0])
+
+    def _gen_rendezvous(self):
+        yield GenResult((
+            yield [
+                TestRendezvousOperation('a', 'b'),
+                TestRendezvousOperation('b', 'a')]))
+
+    def test_thread_pool(self):
+        """Test executing batches concurrently using a thread pool."""
+        thread_pool = ThreadPool(4)
+        try:
+            TestRendezvousBatcher.reset()
+            self.assertEqual(
+                [True, True],
+                BatchExecutor.execute(
+                    self._gen_rendezvous(), thread_pool=thread_pool))
+
+            spouses = BatchExecutor.execute(
+                self._gen_spouses(42), thread_pool=thread_pool)
+            favorite_foods = list(
+                [spouse.favorite_food() for spouse in spouses])
+            self.assertEqual(set(['ice cream', 'pizza']), set(favorite_foods))
+            user1, user2, chair_data, user_count = BatchExecutor.execute(
+                self._gen_db_info(), thread_pool=thread_pool)
+            self.assertEqual('pizza', user1.favorite_food())
+            self.assertEqual('ice cream', user2.favorite_food())
+            self.assertEqual('brown', chair_data['color'])
+            self.assertEqual(2, user_count)
+            self.assertEqual(
+                [89, 233],
+                BatchExecutor.executeva(
+                    self._gen_fibonacci_with_intermediate_operations(10),
+                    self._gen_fibonacci_with_intermediate_operations(12),
+                    thread_pool=thread_pool))
+
+            self.assertEqual(
+                60,
+                BatchExecutor.execute(
+                    self._gen_catch_nested_batcher_exception(),
+                    thread_pool=thread_pool))
+            with self.assertRaises(BatchTestError):
+                BatchExecutor.execute(
+                    self._gen_raise_batcher_exception(),
+                    thread_pool=thread_pool)
+            reached_end = [False]
+            with self.assertRaises(BatchTestError):
+                BatchExecutor.execute(
+                    self._gen_exception_and_take_a_while(reached_end),
+                    thread_pool=thread_pool)
+            self.assertTrue(reached_end[0])
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+
+    def _gen_async_rendezvous(self):
+        did_rendezvous = yield (
+            TestAsyncRendezvousOperation('a', 'b'),
+            self._gen_async_rendezvous_after_hash())
+        yield GenResult(did_rendezvous)
+
+    def _gen_async_rendezvous_after_hash(self):
+        yield TestHashOperation('coolUserId')
+        did_rendezvous = yield TestAsyncRendezvousOperation('b', 'a')
+        yield GenResult(did_rendezvous)
+
+    def _gen_catch_async_exception(self):
+        try:
+            yield (
+                TestAsyncExceptionOperation(),
+                TestAsyncRendezvousOperation('a', 'a'))
+        except BatchTestError:
+            chair_data = yield TestHashOperation('coolChairId')
+            yield GenResult(chair_data)
+
+    def test_async_batcher(self):
+        """Test executing batches using AsyncBatchers."""
+        TestRendezvousBatcher.reset()
+        self.assertEqual(
+            [True, True], BatchExecutor.execute(self._gen_async_rendezvous()))
+        self.assertEqual(
+            60, BatchExecutor.execute(self._gen_catch_async_exception()))
+        with self.assertRaises(BatchTestError):
+            BatchExecutor.execute(TestAsyncExceptionOperation())
+
+        thread_pool = ThreadPool(4)
+        try:
+            TestRendezvousBatcher.reset()
+            self.assertEqual(
+                [True, True],
+                BatchExecutor.execute(
+                    self._gen_async_rendezvous(), thread_pool=thread_pool))
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+
+    def _gen_chunked(self, values, max_batch_size, max_batch_bytes=None):
+        yield GenResult((
+            yield list([
+                TestChunkedOperation(value, max_batch_size, max_batch_bytes)
+                for value in values])))
+
+    def test_max_batch_size(self):
+        """Test splitting batches that exceed Batchers' size limits."""
+        values = list(['value{:d}'.format(index) for index in xrange(10)])
+        TestChunkedBatcher.batches = []
+        self.assertEqual(
+            values, BatchExecutor.execute(self._gen_chunked(values, 3)))
+        self.assertEqual(
+            [3, 3, 3, 1],
+            sorted(
+                [len(batch) for batch in TestChunkedBatcher.batches],
+                reverse=True))
+        self.assertEqual(
+            set(values),
+            set([value for batch in TestChunkedBatcher.batches
+                 for value in batch]))
+
+        TestChunkedBatcher.batches = []
+        self.assertEqual(
+            values, BatchExecutor.execute(self._gen_chunked(values, 10)))
+        self.assertEqual(1, len(TestChunkedBatcher.batches))
+
+        # Each value is 6 bytes long, so at most 2 fit in 15 bytes
+        TestChunkedBatcher.batches = []
+        self.assertEqual(
+            values, BatchExecutor.execute(self._gen_chunked(values, 4, 15)))
+        self.assertEqual(5, len(TestChunkedBatcher.batches))
+        for batch in TestChunkedBatcher.batches:
+            self.assertEqual(2, len(batch))
+
+        TestChunkedBatcher.batches = []
+        self.assertEqual(
+            ['long value'],
+            BatchExecutor.execute(self._gen_chunked(['long value'], 4, 5)))
+        self.assertEqual([['long value']], TestChunkedBatcher.batches)
+
+        thread_pool = ThreadPool(4)
+        try:
+            TestChunkedBatcher.batches = []
+            self.assertEqual(
+                values,
+                BatchExecutor.execute(
+                    self._gen_chunked(values, 3), thread_pool=thread_pool))
+            self.assertEqual(4, len(TestChunkedBatcher.batches))
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+
+    def _gen_identity(self, value):
+        result = yield TestIdentityOperation(value)
+        yield GenResult(result)
+
+    def _gen_duplicate_operations(self):
+        yield GenResult((
+            yield [
+                TestIdentityOperation(1), TestIdentityOperation(2),
+                TestIdentityOperation(1), self._gen_identity(1),
+                self._gen_identity(3), TestChunkedOperation('foo', 10),
+                TestChunkedOperation('foo', 10)]))
+
+    def test_deduplication(self):
+        """Test deduplicating operations with equal identity keys."""
+        TestIdentityBatcher.instance().batches = []
+        TestChunkedBatcher.batches = []
+        self.assertEqual(
+            [1, 2, 1, 1, 3, 'foo', 'foo'],
+            BatchExecutor.execute(self._gen_duplicate_operations()))
+        self.assertEqual(
+            [set([1, 2, 3])],
+            list([
+                set(batch)
+                for batch in TestIdentityBatcher.instance().batches]))
+        for batch in TestIdentityBatcher.instance().batches:
+            self.assertEqual(len(set(batch)), len(batch))
+
+        # TestChunkedOperation does not have identity keys
+        self.assertEqual([['foo', 'foo']], TestChunkedBatcher.batches)
+
+    def _gen_repeated_identity(self, value, count):
+        """Return "value" after "count" rounds of TestIdentityOperations."""
+        for _ in xrange(count):
+            result = yield TestIdentityOperation(value)
+        yield GenResult(result)
+
+    def test_executev_iter(self):
+        """Test BatchExecutor.executev_iter."""
+        taken_counts = [0]
+
+        def roots():
+            for value in xrange(100):
+                taken_counts[0] += 1
+                if value % 10 == 9:
+                    yield TestIdentityOperation(value)
+                else:
+                    yield self._gen_repeated_identity(value, 1 + value % 3)
+
+        TestIdentityBatcher.instance().batches = []
+        results = {}
+        for index, result in BatchExecutor.executev_iter(
+                roots(), max_in_flight=8):
+            self.assertNotIn(index, results)
+            results[index] = result
+            self.assertLessEqual(taken_counts[0] - len(results), 8)
+        self.assertEqual(
+            dict((value, value) for value in xrange(100)), results)
+        for batch in TestIdentityBatcher.instance().batches:
+            self.assertLessEqual(len(batch), 8)
+
+        # The results appear in the order in which they finish
+        self.assertEqual(
+            [1, 0],
+            list([
+                index for index, result in BatchExecutor.executev_iter([
+                    self._gen_repeated_identity(1, 2),
+                    self._gen_repeated_identity(2, 1)])]))
+
+        self.assertEqual([], list(BatchExecutor.executev_iter([])))
+        with self.assertRaises(BatchTestError):
+            list(
+                BatchExecutor.executev_iter([
+                    self._gen_repeated_identity(1, 1),
+                    TestExceptionOperation()]))
+        with self.assertRaises(ValueError):
+            BatchExecutor.executev_iter([], max_in_flight=0)
+
+        # Stopping early finishes the execution for the tracer
+        tracer = ChromeTraceTracer()
+        iterator = BatchExecutor.executev_iter(
+            roots(), max_in_flight=8, tracer=tracer)
+        for index, result in iterator:
+            break
+        iterator.close()
+        BatchExecutor.execute(TestIdentityOperation(1), tracer=tracer)
+        self.assertEqual(
+            [('execute #1', 0), ('execute #2', 0)],
+            list([
+                (event['name'], event['tid']) for event in tracer.events
+                if event['ph'] == 'X' and
+                event['name'].startswith('execute')]))
+
+    def _gen_raise(self):
+        raise BatchTestError()
+        yield
+
+    def _gen_catch_parallel_exception(self, shared_generator):
+        """Return 'caught' after yielding a generator that raises.
+
+        In parallel with the generator that raises, we yield
+        TestIdentityOperations with the values 100 and 101, and
+        shared_generator.gen().
+        """
+        try:
+            yield [
+                self._gen_raise(), self._gen_repeated_identity(100, 3),
+                shared_generator.gen(), TestIdentityOperation(101)]
+        except BatchTestError:
+            yield GenResult('caught')
+
+    def test_fail_fast(self):
+        """Test the fail_fast option of BatchExecutor.execute."""
+        shared_generator = SharedGenerator(
+            self._gen_repeated_identity(200, 2))
+        TestIdentityBatcher.instance().batches = []
+        self.assertEqual(
+            'caught',
+            BatchExecutor.execute(
+                self._gen_catch_parallel_exception(shared_generator)))
+        values = set()
+        for batch in TestIdentityBatcher.instance().batches:
+            values.update(batch)
+        self.assertEqual(set([100, 101, 200]), values)
+
+        shared_generator = SharedGenerator(
+            self._gen_repeated_identity(200, 2))
+        TestIdentityBatcher.instance().batches = []
+        self.assertEqual(
+            'caught',
+            BatchExecutor.execute(
+                self._gen_catch_parallel_exception(shared_generator),
+                fail_fast=True))
+        values = set()
+        for batch in TestIdentityBatcher.instance().batches:
+            values.update(batch)
+        self.assertFalse(values & set([100, 101]))
+
+        # We may not close the generator a SharedGenerator shares
+        self.assertEqual(200, BatchExecutor.execute(shared_generator.gen()))
+        self.assertEqual(
+            [200, 'caught'],
+            BatchExecutor.executeva(
+                shared_generator.gen(),
+                self._gen_catch_parallel_exception(shared_generator),
+                fail_fast=True))
+
+    def _gen_partial_failure(self, value):
+        """Return the result of TestPartialFailureOperation(value).
+
+        Return 'failed' if the operation fails.
+        """
+        try:
+            result = yield TestPartialFailureOperation(value)
+        except BatchTestError:
+            yield GenResult('failed')
+        yield GenResult(result)
+
+    def test_operation_error(self):
+        """Test returning OperationErrors from Batcher.gen_batch."""
+        batcher = TestPartialFailureBatcher.instance()
+        batcher.batch_count = 0
+        self.assertEqual(
+            [1, 'failed', 3, 'failed'],
+            BatchExecutor.executeva(
+                self._gen_partial_failure(1), self._gen_partial_failure(-2),
+                self._gen_partial_failure(3), self._gen_partial_failure(-4)))
+        self.assertEqual(1, batcher.batch_count)
+
+        self.assertEqual(
+            5, BatchExecutor.execute(TestPartialFailureOperation(5)))
+        with self.assertRaises(BatchTestError):
+            BatchExecutor.executeva(
+                TestPartialFailureOperation(6),
+                TestPartialFailureOperation(-7))
+
+    def _gen_flaky(self, value):
+        """Return the result of TestFlakyOperation(value).
+
+        Return 'failed' if the operation fails.
+        """
+        try:
+            result = yield TestFlakyOperation(value)
+        except BatchTestError:
+            yield GenResult('failed')
+        yield GenResult(result)
+
+    def test_retry_policy(self):
+        """Test retrying failed batches using Batcher.retry_policy()."""
+        batcher = TestFlakyBatcher.instance()
+        batcher.reset(
+            RetryPolicy(max_attempts=3, initial_delay=0.001), failure_count=2)
+        self.assertEqual(
+            [1, 2],
+            BatchExecutor.executeva(
+                TestFlakyOperation(1), self._gen_flaky(2)))
+        self.assertEqual(3, len(batcher.batches))
+
+        batcher.reset(
+            RetryPolicy(max_attempts=3, initial_delay=0.001), failure_count=3)
+        self.assertEqual(
+            'failed', BatchExecutor.execute(self._gen_flaky(1)))
+        self.assertEqual(3, len(batcher.batches))
+
+        batcher.reset(
+            RetryPolicy(
+                max_attempts=3, initial_delay=0.001,
+                retryable_exceptions=[KeyError]),
+            failure_count=1)
+        self.assertEqual(
+            'failed', BatchExecutor.execute(self._gen_flaky(1)))
+        self.assertEqual(1, len(batcher.batches))
+
+        batcher.reset(None, failure_count=1)
+        with self.assertRaises(BatchTestError):
+            BatchExecutor.execute(TestFlakyOperation(1))
+
+    def test_retry_bisection(self):
+        """Test isolating operations that cause their batches to fail."""
+        batcher = TestFlakyBatcher.instance()
+        batcher.reset(
+            RetryPolicy(max_attempts=3, initial_delay=0.001, bisect=True),
+            poison_values=[5])
+        self.assertEqual(
+            [0, 1, 2, 3, 4, 'failed', 6, 7],
+            BatchExecutor.executev(
+                list([self._gen_flaky(value) for value in xrange(8)])))
+        self.assertEqual(
+            [8, 4, 4, 2, 2, 1, 1, 1, 1],
+            list([len(batch) for batch in batcher.batches]))
+        self.assertEqual(3, batcher.batches.count([5]))
+
+        # Bisection does not count toward max_attempts, so we isolate
+        # operations in batches of any size
+        batcher.reset(
+            RetryPolicy(max_attempts=2, initial_delay=0.001, bisect=True),
+            poison_values=[37])
+        expected_results = range(1000)
+        expected_results[37] = 'failed'
+        self.assertEqual(
+            expected_results,
+            BatchExecutor.executev(
+                list([self._gen_flaky(value) for value in xrange(1000)])))
+        self.assertEqual(2, batcher.batches.count([37]))
+
+    def _gen_nested_execute(self, value):
+        result = BatchExecutor.execute(TestIdentityOperation(value))
+        yield GenResult(result)
+
+    def _gen_nested_execute_raise(self, value):
+        yield TestIdentityOperation(value)
+        raise BatchTestError()
+
+    def _gen_catch_nested_execute(self, value):
+        try:
+            BatchExecutor.execute(self._gen_nested_execute_raise(value))
+        except BatchTestError:
+            yield GenResult('caught')
+
+    def _gen_with_nested_execute(self, gen_nested):
+        results = yield [
+            TestIdentityOperation(1), gen_nested(2),
+            TestDbOperation(['count', 'user'])]
+        yield GenResult(results)
+
+    def test_nested_execute(self):
+        """Test merging nested calls to "execute" into the outer batches."""
+        TestIdentityBatcher.instance().batches = []
+        TestDbBatcher.instance().batch_count = 0
+        self.assertEqual(
+            [1, 2, 2],
+            BatchExecutor.execute(
+                self._gen_with_nested_execute(self._gen_nested_execute)))
+        self.assertEqual(
+            [[1, 2]],
+            list([
+                sorted(batch)
+                for batch in TestIdentityBatcher.instance().batches]))
+        self.assertEqual(1, TestDbBatcher.instance().batch_count)
+
+        TestIdentityBatcher.instance().batches = []
+        self.assertEqual(
+            [1, 'caught', 2],
+            BatchExecutor.execute(
+                self._gen_with_nested_execute(
+                    self._gen_catch_nested_execute)))
+        self.assertEqual(
+            [[1, 2]],
+            list([
+                sorted(batch)
+                for batch in TestIdentityBatcher.instance().batches]))
+
+    def _gen_result_cache_values(self, values):
+        results = yield list([
+            TestResultCacheOperation(value) for value in values])
+        yield GenResult(results)
+
+    def test_result_cache(self):
+        """Test caching the results of operations using Batcher.result_cache.
+        """
+        batcher = TestResultCacheBatcher.instance()
+        batcher.reset()
+        self.assertEqual(
+            [1, 2, 1, None],
+            BatchExecutor.execute(
+                self._gen_result_cache_values([1, 2, 1, None])))
+        self.assertEqual([[1, 2, None]], batcher.batches)
+
+        batcher.batches = []
+        self.assertEqual(
+            [[2, 3], 1],
+            BatchExecutor.executeva(
+                self._gen_result_cache_values([2, 3]),
+                TestResultCacheOperation(1)))
+        self.assertEqual([[3]], batcher.batches)
+        self.assertEqual(2, batcher.cache.hit_count)
+        self.assertAlmostEqual(1.0 / 3, batcher.cache.hit_rate())
+
+        # Caching 4 evicts 1, the least recently used result
+        batcher.batches = []
+        self.assertEqual(
+            [4, 1, 2, 3],
+            BatchExecutor.execute(
+                self._gen_result_cache_values([4, 1, 2, 3])))
+        self.assertEqual(
+            1, BatchExecutor.execute(TestResultCacheOperation(1)))
+        self.assertEqual([[4], [1]], batcher.batches)
+
+    def _gen_write_then_read(self):
+        yield TestCacheSetOperation('a', 1)
+        value = yield TestIdentityOperation(1)
+        yield GenResult(value)
+
+    def _gen_read_then_write(self):
+        value = yield TestIdentityOperation(2)
+        yield TestCacheSetOperation('a', value)
+        yield GenResult(value)
+
+    def test_coalesce_writes(self):
+        """Test coalescing the operations of last-write-wins Batchers."""
+        set_batcher = TestCacheSetBatcher.instance()
+        set_batcher.batches = []
+        BatchExecutor.executeva(
+            TestCacheSetOperation('a', 1), TestCacheSetOperation('b', 2),
+            TestCacheSetOperation('a', 3))
+        self.assertEqual(1, len(set_batcher.batches))
+        self.assertEqual([('a', 3), ('b', 2)], sorted(set_batcher.batches[0]))
+        self.assertEqual(3, TestCacheGetBatcher.instance().cache['a'])
+
+        # Use strict rounds, so that we execute the first write before
+        # the second regardless of the order in which we choose batches
+        set_batcher.batches = []
+        self.assertEqual(
+            [1, 2],
+            BatchExecutor.executeva(
+                self._gen_write_then_read(), self._gen_read_then_write(),
+                strict_rounds=True))
+        self.assertEqual([[('a', 1)], [('a', 2)]], set_batcher.batches)
+
+        set_batcher.batches = []
+        self.assertEqual(
+            [1, 2],
+            BatchExecutor.executeva(
+                self._gen_write_then_read(), self._gen_read_then_write(),
+                defer_writes=True))
+        self.assertEqual([[('a', 2)]], set_batcher.batches)
+        self.assertEqual(2, TestCacheGetBatcher.instance().cache['a'])
+
+    def _gen_cache_get(self, key):
+        value = yield TestCacheGetOperation(key)
+        yield GenResult(value)
+
+    def _gen_cache_set(self, key, value):
+        yield TestCacheSetOperation(key, value)
+
+    def test_must_precede(self):
+        """Test ordering batches using Batcher.must_precede."""
+        cache = TestCacheGetBatcher.instance().cache
+        thread_pool = ThreadPool(2)
+        try:
+            for kwargs in [
+                    {}, {'strict_rounds': True},
+                    {'thread_pool': thread_pool}]:
+                for index in xrange(10):
+                    cache.clear()
+                    key = 'key{:d}'.format(index)
+                    self.assertEqual(
+                        [index, None, index],
+                        BatchExecutor.executeva(
+                            self._gen_cache_get(key),
+                            self._gen_cache_set(key, index),
+                            self._gen_cache_get(key), **kwargs))
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+
+    def _gen_async_cache_set(self, key, value):
+        yield TestAsyncCacheSetOperation(key, value)
+
+    def test_must_precede_waiting_batches(self):
+        """Test Batcher.must_precede for batches that are not ready yet.
+
+        Test batches that we are deferring, waiting to retry, or
+        executing using an AsyncBatcher, along with constraints that
+        form a cycle.
+        """
+        cache = TestCacheGetBatcher.instance().cache
+        set_batcher = TestCacheSetBatcher.instance()
+        thread_pool = ThreadPool(2)
+        try:
+            for kwargs in [
+                    {}, {'strict_rounds': True},
+                    {'thread_pool': thread_pool}]:
+                cache.clear()
+                self.assertEqual(
+                    [None, 1],
+                    BatchExecutor.executeva(
+                        self._gen_cache_set('a', 1), self._gen_cache_get('a'),
+                        defer_writes=True, **kwargs))
+
+                set_batcher.batches = []
+                set_batcher.failure_count = 1
+                self.assertEqual(
+                    [None, 2],
+                    BatchExecutor.executeva(
+                        self._gen_cache_set('a', 2), self._gen_cache_get('a'),
+                        **kwargs))
+                self.assertEqual(2, len(set_batcher.batches))
+
+                cache.clear()
+                self.assertEqual(
+                    [3, None, 3],
+                    BatchExecutor.executeva(
+                        self._gen_cache_get('a'),
+                        self._gen_async_cache_set('a', 3),
+                        self._gen_cache_get('a'), **kwargs))
+
+                self.assertEqual(
+                    [1, 2],
+                    BatchExecutor.executeva(
+                        TestCyclicOperation('a', 1),
+                        TestCyclicOperation('b', 2), **kwargs))
+        finally:
+            thread_pool.close()
+            thread_pool.join()
+
+    def _gen_nested_cache_get(self, key):
+        yield [TestIdentityOperation(1), TestIdentityOperation(2)]
+        value = BatchExecutor.execute(TestCacheGetOperation(key))
+        yield GenResult(value)
+
+    def test_must_precede_nested_execute(self):
+        """Test Batcher.must_precede for operations of nested executions.
+
+        A nested execution must not take operations from the enclosing
+        execution that have to wait for other batches.
+        """
+        TestCacheGetBatcher.instance().cache.clear()
+
+        # The scheduler executes the batch of two TestIdentityOperations
+        # before the TestCacheSetOperation, so that the nested execution
+        # starts while the TestCacheSetOperation is still waiting
+        self.assertEqual(
+            [None, 1, None],
+            BatchExecutor.executeva(
+                self._gen_cache_set('a', 1), self._gen_cache_get('a'),
+                self._gen_nested_cache_get('a'),
+                scheduler=LargestBatchFirstScheduler()))
@@ -0,0 +1,74 @@
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+from error import BatchTestError
+
+
+class TestFlakyOperation(BatchableOperation):
+    """An operation whose result is the argument to the constructor.
+
+    The Batcher for TestFlakyOperation fails some of its batches, as
+    configured using the attributes of TestFlakyBatcher.
+    """
+
+    # Private attributes:
+    # int _value - The result.
+
+    def __init__(self, value):
+        self._value = value
+
+    def batcher(self):
+        return TestFlakyBatcher.instance()
+
+
+class TestFlakyBatcher(Batcher):
+    """The Batcher for TestFlakyOperation.
+
+    A batch raises a BatchTestError if failure_count is positive, in
+    which case it decrements failure_count, or if it includes an
+    operation whose value is in poison_values.
+
+    Public attributes:
+
+    list<list<int>> batches - The values of the operations in each batch
+        we have attempted to execute, in order.
+    int failure_count - The number of batches to fail, regardless of
+        their operations.
+    set<int> poison_values - The values of the operations that cause
+        their batches to fail.
+    RetryPolicy policy - The value to return from retry_policy().
+    """
+
+    # The singleton instance of TestFlakyBatcher, or None if we have not
+    # created it yet.
+    _instance = None
+
+    def __init__(self):
+        self.reset(None)
+
+    @staticmethod
+    def instance():
+        """Return the singleton instance of TestFlakyBatcher."""
+        if TestFlakyBatcher._instance is None:
+            TestFlakyBatcher._instance = TestFlakyBatcher()
+        return TestFlakyBatcher._instance
+
+    def reset(self, policy, failure_count=0, poison_values=()):
+        """Clear "batches" and set the other public attributes."""
+        self.batches = []
+        self.policy = policy
+        self.failure_count = failure_count
+        self.poison_values = set(poison_values)
+
+    def gen_batch(self, operations):
+        values = list([operation._value for operation in operations])
+        self.batches.append(values)
+        if self.failure_count > 0:
+            self.failure_count -= 1
+            raise BatchTestError()
+        if self.poison_values.intersection(values):
+            raise BatchTestError()
+        yield GenResult(values)
+
+    def retry_policy(self):
+        return self.policy
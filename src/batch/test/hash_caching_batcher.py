@@ -0,0 +1,31 @@
+from batch import CachingBatcher
+from cache_get_operation import TestCacheGetOperation
+from cache_set_operation import TestCacheSetOperation
+
+
+class TestHashCachingBatcher(CachingBatcher):
+    """A CachingBatcher for TestHashOperations.
+
+    TestHashCachingBatcher uses the cache suggested by
+    TestCacheGetOperation.
+    """
+
+    # The singleton instance of TestHashCachingBatcher, or None if we have
+    # not created it yet.
+    _instance = None
+
+    @staticmethod
+    def instance():
+        """Return the singleton instance of TestHashCachingBatcher."""
+        if TestHashCachingBatcher._instance is None:
+            TestHashCachingBatcher._instance = TestHashCachingBatcher()
+        return TestHashCachingBatcher._instance
+
+    def cache_key(self, operation):
+        return operation._key
+
+    def cache_get_operation(self, key):
+        return TestCacheGetOperation(key)
+
+    def cache_set_operation(self, key, value):
+        return TestCacheSetOperation(key, value)
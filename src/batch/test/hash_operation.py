@@ -17,6 +17,14 @@ class TestHashOperation(BatchableOperation):
 
 
 class TestHashBatcher(Batcher):
+    """The Batcher for TestHashOperation.
+
+    Public attributes:
+
+    list<list<basestring>> batches - The keys of the operations in each
+        batch we have executed, in order.
+    """
+
     # The key-value pairs in the simulated data store.
     _dict = {
         'chair:60': {
@@ -37,6 +45,9 @@ class TestHashBatcher(Batcher):
     # it yet.
     _instance = None
 
+    def __init__(self):
+        self.batches = []
+
     @staticmethod
     def instance():
         """Return the singleton instance of TestHashBatcher."""
@@ -45,6 +56,8 @@ class TestHashBatcher(Batcher):
         return TestHashBatcher._instance
 
     def gen_batch(self, operations):
+        self.batches.append(
+            list([operation._key for operation in operations]))
         yield GenResult(
             list([
                 TestHashBatcher._dict[operation._key]
@@ -15,12 +15,26 @@ class TestIdentityOperation(BatchableOperation):
     def batcher(self):
         return TestIdentityBatcher.instance()
 
+    def identity_key(self):
+        return self._value
+
 
 class TestIdentityBatcher(Batcher):
+    """The Batcher for TestIdentityOperation.
+
+    Public attributes:
+
+    list<list<mixed>> batches - The values of the operations in each
+        batch we have executed, in order.
+    """
+
     # The singleton instance of TestIdentityBatcher, or None if we have not
     # created it yet.
     _instance = None
 
+    def __init__(self):
+        self.batches = []
+
     @staticmethod
     def instance():
         """Return the singleton instance of TestIdentityBatcher."""
@@ -29,4 +43,6 @@ class TestIdentityBatcher(Batcher):
         return TestIdentityBatcher._instance
 
     def gen_batch(self, operations):
-        yield GenResult(list([operation._value for operation in operations]))
+        values = list([operation._value for operation in operations])
+        self.batches.append(values)
+        yield GenResult(values)
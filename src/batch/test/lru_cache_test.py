@@ -0,0 +1,94 @@
+import time
+import unittest
+
+from batch import LruCache
+
+
+class LruCacheTest(unittest.TestCase):
+    def test_unbounded(self):
+        """Test an LruCache with no bounds."""
+        cache = LruCache()
+        for index in xrange(100):
+            cache.set(index, str(index))
+        self.assertEqual(100, len(cache))
+        self.assertEqual('42', cache.get(42))
+        self.assertIsNone(cache.get(100))
+        self.assertEqual('42', cache.pop(42))
+        self.assertIsNone(cache.get(42))
+        self.assertEqual(1, cache.hit_count)
+        self.assertEqual(2, cache.miss_count)
+        self.assertEqual(0, cache.eviction_count)
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
+    def test_max_entries(self):
+        """Test evicting the least recently used entries."""
+        cache = LruCache(max_entries=3)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('d', 4)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual(4, cache.get('d'))
+        cache.set('a', 5)
+        cache.set('e', 6)
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(5, cache.get('a'))
+        self.assertEqual(3, len(cache))
+        self.assertEqual(2, cache.eviction_count)
+
+    def test_max_bytes(self):
+        """Test evicting entries when their total size is too large."""
+        cache = LruCache(max_bytes=10, sizeof=len)
+        cache.set('a', 'xxxx')
+        cache.set('b', 'xxxx')
+        self.assertEqual(2, len(cache))
+        cache.set('c', 'xxxx')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual('xxxx', cache.get('b'))
+
+        # The size of a value may change after we store it
+        value = ['x']
+        cache.set('d', value)
+        value.extend(['x'] * 7)
+        self.assertEqual(value, cache.get('d'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNone(cache.get('c'))
+
+        # We may re-estimate the size without using the entry
+        value = ['x']
+        cache.set('f', 'xxxx')
+        cache.set('g', value)
+        value.extend(['x'] * 7)
+        cache.refresh_size('g')
+        self.assertIsNone(cache.get('f'))
+        self.assertEqual(value, cache.get('g'))
+
+        # We keep the most recently used entry even if it is too large
+        cache.set('e', 'x' * 20)
+        self.assertEqual('x' * 20, cache.get('e'))
+        self.assertEqual(1, len(cache))
+
+    def test_ttl(self):
+        """Test expiring entries."""
+        cache = LruCache(ttl=0.05)
+        cache.set('a', 1)
+        self.assertEqual(1, cache.get('a'))
+        time.sleep(0.1)
+        cache.set('b', 2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(2, cache.get('b'))
+        self.assertEqual(1, cache.eviction_count)
+
+    def test_purge_expired(self):
+        """Test removing expired entries that we do not look up again."""
+        cache = LruCache(ttl=0.05)
+        for index in xrange(100):
+            cache.set(index, index)
+        time.sleep(0.1)
+        cache.set('a', 1)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(100, cache.eviction_count)
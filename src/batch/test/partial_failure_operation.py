@@ -0,0 +1,59 @@
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+from batch import OperationError
+from error import BatchTestError
+
+
+class TestPartialFailureOperation(BatchableOperation):
+    """An operation whose result is the argument to the constructor.
+
+    If the argument is negative, the operation fails with a
+    BatchTestError, without causing the other operations in its batch
+    to fail.
+    """
+
+    # Private attributes:
+    # int _value - The result.
+
+    def __init__(self, value):
+        self._value = value
+
+    def batcher(self):
+        return TestPartialFailureBatcher.instance()
+
+
+class TestPartialFailureBatcher(Batcher):
+    """The Batcher for TestPartialFailureOperation.
+
+    Public attributes:
+
+    int batch_count - The number of batches we have executed.
+    """
+
+    # The singleton instance of TestPartialFailureBatcher, or None if we have
+    # not created it yet.
+    _instance = None
+
+    def __init__(self):
+        self.batch_count = 0
+
+    @staticmethod
+    def instance():
+        """Return the singleton instance of TestPartialFailureBatcher."""
+        if TestPartialFailureBatcher._instance is None:
+            TestPartialFailureBatcher._instance = TestPartialFailureBatcher()
+        return TestPartialFailureBatcher._instance
+
+    def gen_batch(self, operations):
+        self.batch_count += 1
+        results = []
+        for operation in operations:
+            if operation._value >= 0:
+                results.append(operation._value)
+            else:
+                try:
+                    raise BatchTestError()
+                except BatchTestError as exception:
+                    results.append(OperationError(exception))
+        yield GenResult(results)
@@ -0,0 +1,58 @@
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+
+
+class TestRecordingOperation(BatchableOperation):
+    """An operation whose result is the value passed to the constructor.
+
+    TestRecordingOperations with different Batcher names have different
+    Batchers, which record the order in which we execute their batches.
+    """
+
+    # Private attributes:
+    # basestring _name - The name of the Batcher.
+    # int _priority - The priority of the Batcher.
+    # mixed _value - The result.
+
+    def __init__(self, name, value, priority=0):
+        self._name = name
+        self._value = value
+        self._priority = priority
+
+    def batcher(self):
+        return TestRecordingBatcher(self._name, self._priority)
+
+
+class TestRecordingBatcher(Batcher):
+    """The Batcher for TestRecordingOperation."""
+
+    # The names of the TestRecordingBatchers of the batches we have executed,
+    # in order
+    batch_names = []
+
+    # Private attributes:
+    # basestring _name - The name of the Batcher.
+    # int _priority - The value to return from priority().
+
+    def __init__(self, name, priority):
+        self._name = name
+        self._priority = priority
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, TestRecordingBatcher) and
+            self._name == other._name)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash(self._name)
+
+    def gen_batch(self, operations):
+        TestRecordingBatcher.batch_names.append(self._name)
+        yield GenResult(list([operation._value for operation in operations]))
+
+    def priority(self):
+        return self._priority
@@ -0,0 +1,71 @@
+import threading
+
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+
+
+class TestRendezvousOperation(BatchableOperation):
+    """An operation that waits for another batch to start executing.
+
+    The result of a TestRendezvousOperation is whether the batch
+    executing the operation observed the other batch start executing
+    while it was waiting.  Two batches of TestRendezvousOperations can
+    only both observe each other if they execute at the same time.
+    """
+
+    # Private attributes:
+    # basestring _name - The name of the Batcher for the operation.
+    # basestring _other_name - The name of the Batcher for which the
+    #     batch waits.
+
+    def __init__(self, name, other_name):
+        self._name = name
+        self._other_name = other_name
+
+    def batcher(self):
+        return TestRendezvousBatcher(self._name, self._other_name)
+
+
+class TestRendezvousBatcher(Batcher):
+    # dict<basestring, threading.Event> - A map from the names of the Batchers
+    # to events indicating that a batch for the Batcher started executing.
+    events = {}
+
+    # The maximum number of seconds for which a batch waits for the other
+    # batch to start executing.
+    TIMEOUT = 2
+
+    # Private attributes:
+    # basestring _name - The name of the Batcher.
+    # basestring _other_name - The name of the Batcher for which a batch
+    #     waits.
+
+    def __init__(self, name, other_name):
+        self._name = name
+        self._other_name = other_name
+
+    @staticmethod
+    def reset():
+        """Clear the events indicating that batches started executing."""
+        TestRendezvousBatcher.events = {}
+
+    def gen_batch(self, operations):
+        events = TestRendezvousBatcher.events
+        events.setdefault(self._name, threading.Event()).set()
+        did_rendezvous = events.setdefault(
+            self._other_name, threading.Event()).wait(
+                TestRendezvousBatcher.TIMEOUT)
+        yield GenResult([bool(did_rendezvous)] * len(operations))
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, TestRendezvousBatcher) and
+            self._name == other._name and
+            self._other_name == other._other_name)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash((self._name, self._other_name))
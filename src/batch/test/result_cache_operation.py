@@ -0,0 +1,63 @@
+from batch import BatchableOperation
+from batch import Batcher
+from batch import GenResult
+from batch import LruCache
+
+
+class TestResultCacheOperation(BatchableOperation):
+    """An operation whose Batcher caches its results across executions.
+
+    The result of a TestResultCacheOperation is the argument to the
+    constructor.
+    """
+
+    # Private attributes:
+    # mixed _value - The result.
+
+    def __init__(self, value):
+        self._value = value
+
+    def batcher(self):
+        return TestResultCacheBatcher.instance()
+
+    def identity_key(self):
+        return self._value
+
+
+class TestResultCacheBatcher(Batcher):
+    """The Batcher for TestResultCacheOperation.
+
+    Public attributes:
+
+    list<list<mixed>> batches - The values of the operations in each
+        batch we have executed, in order.
+    LruCache cache - The result cache, which holds at most three
+        results.
+    """
+
+    # The singleton instance of TestResultCacheBatcher, or None if we have
+    # not created it yet.
+    _instance = None
+
+    def __init__(self):
+        self.reset()
+
+    @staticmethod
+    def instance():
+        """Return the singleton instance of TestResultCacheBatcher."""
+        if TestResultCacheBatcher._instance is None:
+            TestResultCacheBatcher._instance = TestResultCacheBatcher()
+        return TestResultCacheBatcher._instance
+
+    def reset(self):
+        """Clear the batches and the result cache."""
+        self.batches = []
+        self.cache = LruCache(max_entries=3)
+
+    def result_cache(self):
+        return self.cache
+
+    def gen_batch(self, operations):
+        values = list([operation._value for operation in operations])
+        self.batches.append(values)
+        yield GenResult(values)
@@ -0,0 +1,68 @@
+import unittest
+
+from batch import BatchExecutor
+from batch import BatcherPriorityScheduler
+from batch import CriticalPathScheduler
+from batch import GenResult
+from batch import LargestBatchFirstScheduler
+from recording_operation import TestRecordingBatcher
+from recording_operation import TestRecordingOperation
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        TestRecordingBatcher.batch_names = []
+
+    def test_largest_batch_first(self):
+        """Test LargestBatchFirstScheduler."""
+        self.assertEqual(
+            [1, 2, 3],
+            BatchExecutor.executeva(
+                TestRecordingOperation('a', 1), TestRecordingOperation('b', 2),
+                TestRecordingOperation('b', 3),
+                scheduler=LargestBatchFirstScheduler()))
+        self.assertEqual(['b', 'a'], TestRecordingBatcher.batch_names)
+
+    def test_batcher_priority(self):
+        """Test BatcherPriorityScheduler."""
+        self.assertEqual(
+            [1, 2, 3, 4],
+            BatchExecutor.executeva(
+                TestRecordingOperation('a', 1), TestRecordingOperation('b', 2),
+                TestRecordingOperation('b', 3),
+                TestRecordingOperation('c', 4, priority=1),
+                scheduler=BatcherPriorityScheduler()))
+        self.assertEqual(['c', 'b', 'a'], TestRecordingBatcher.batch_names)
+
+    def _gen_long_chain(self):
+        value1 = yield TestRecordingOperation('a', 1)
+        value2 = yield TestRecordingOperation('b', 2)
+        yield GenResult(value1 + value2)
+
+    def _gen_nested_long_chain(self):
+        value = yield self._gen_long_chain()
+        yield GenResult(value)
+
+    def _gen_short_chain(self):
+        value = yield TestRecordingOperation('b', 3)
+        yield GenResult(value)
+
+    def test_critical_path(self):
+        """Test CriticalPathScheduler."""
+        scheduler = CriticalPathScheduler()
+        self.assertEqual(
+            [3, 3],
+            BatchExecutor.executeva(
+                self._gen_nested_long_chain(), self._gen_short_chain(),
+                scheduler=scheduler))
+
+        # Now that the scheduler knows that "b" depends on "a", it executes
+        # "a" first, so that we only need one batch for "b"
+        for _ in xrange(3):
+            TestRecordingBatcher.batch_names = []
+            self.assertEqual(
+                [3, 3],
+                BatchExecutor.executeva(
+                    self._gen_short_chain(), self._gen_nested_long_chain(),
+                    scheduler=scheduler))
+            self.assertEqual(['a', 'b'], TestRecordingBatcher.batch_names)
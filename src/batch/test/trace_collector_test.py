@@ -0,0 +1,89 @@
+import time
+import unittest
+
+from batch import BatchExecutor
+from batch import GenResult
+from batch import Histogram
+from batch import TraceCollector
+from error import BatchTestError
+from flaky_operation import TestFlakyBatcher
+from flaky_operation import TestFlakyOperation
+from identity_operation import TestIdentityBatcher
+from identity_operation import TestIdentityOperation
+
+
+class TraceCollectorTest(unittest.TestCase):
+    def test_histogram(self):
+        """Test Histogram."""
+        histogram = Histogram()
+        self.assertIsNone(histogram.mean())
+        self.assertIsNone(histogram.percentile(0.5))
+        for value in [0, 1, 2, 3, 5, 100]:
+            histogram.add(value)
+        self.assertEqual(6, histogram.count)
+        self.assertEqual(111, histogram.total)
+        self.assertEqual(0, histogram.min)
+        self.assertEqual(100, histogram.max)
+        self.assertAlmostEqual(18.5, histogram.mean())
+        self.assertEqual(4, histogram.percentile(0.5))
+        self.assertEqual(100, histogram.percentile(1))
+        self.assertEqual(
+            [(1, 1), (2, 1), (4, 2), (8, 1), (128, 1)], histogram.buckets())
+
+        histogram = Histogram(0.001)
+        histogram.add(0.0015)
+        self.assertEqual([(0.002, 1)], histogram.buckets())
+
+    def _gen_sum(self, values):
+        results = yield list([
+            TestIdentityOperation(value) for value in values])
+        yield GenResult(sum(results))
+
+    def _gen_sums(self):
+        sum1, sum2 = yield [self._gen_sum([1, 2, 3]), self._gen_sum([4])]
+        total = yield TestIdentityOperation(sum1 + sum2)
+        yield GenResult(total)
+
+    def test_trace_collector(self):
+        """Test collecting statistics using TraceCollector."""
+        collector = TraceCollector()
+        TestIdentityBatcher.instance().batches = []
+        self.assertEqual(
+            10, BatchExecutor.execute(self._gen_sums(), tracer=collector))
+        self.assertEqual(1, collector.execute_count)
+        self.assertEqual(0, collector.failed_execute_count)
+        self.assertEqual(3, collector.round_count)
+        sizes = collector.batch_sizes['TestIdentityBatcher']
+        self.assertEqual(2, sizes.count)
+        self.assertEqual(5, sizes.total)
+        self.assertEqual(4, sizes.max)
+        self.assertEqual(
+            2, collector.batch_seconds['TestIdentityBatcher'].count)
+        self.assertEqual(
+            3, collector.generator_seconds['_gen_sums'].count)
+        self.assertEqual(
+            4, collector.generator_seconds['_gen_sum'].count)
+        self.assertIn('TestIdentityBatcher', collector.format())
+
+        TestFlakyBatcher.instance().reset(None, failure_count=1)
+        with self.assertRaises(BatchTestError):
+            BatchExecutor.execute(self._gen_flaky_sum(), tracer=collector)
+        self.assertEqual(2, collector.execute_count)
+        self.assertEqual(1, collector.failed_execute_count)
+        self.assertEqual(1, collector.batch_failure_counts['TestFlakyBatcher'])
+        self.assertEqual(2, collector.generator_exception_count)
+
+    def _gen_flaky_sum(self):
+        values = yield [TestFlakyOperation(1), TestFlakyOperation(2)]
+        yield GenResult(sum(values))
+
+    def _gen_sleep(self):
+        time.sleep(0.05)
+        yield GenResult(None)
+
+    def test_generator_seconds(self):
+        """Test that generator iterations' durations include blocking."""
+        collector = TraceCollector()
+        BatchExecutor.execute(self._gen_sleep(), tracer=collector)
+        self.assertGreaterEqual(
+            collector.generator_seconds['_gen_sleep'].max, 0.04)
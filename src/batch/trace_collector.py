@@ -0,0 +1,198 @@
+import math
+
+from tracer import Tracer
+
+
+class Histogram(object):
+    """A histogram of non-negative values, with exponentially sized buckets.
+
+    Bucket 0 contains the values less than "smallest", and for i > 0,
+    bucket i contains the values in the range
+    [smallest * 2 ** (i - 1), smallest * 2 ** i).  Thus, a Histogram uses
+    little memory regardless of the number of values, at the expense of
+    only approximating percentiles.
+
+    Public attributes:
+
+    int count - The number of values.
+    float max - The largest value, or None if there are no values.
+    float min - The smallest value, or None if there are no values.
+    float total - The sum of the values.
+    """
+
+    # Private attributes:
+    # dict<int, int> _bucket_counts - A map from the index of each
+    #     non-empty bucket to the number of values in the bucket.
+    # float _smallest - The upper bound of bucket 0.
+
+    def __init__(self, smallest=1):
+        self._smallest = smallest
+        self._bucket_counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _bucket_index(self, value):
+        """Return the index of the bucket for the specified value."""
+        if value < self._smallest:
+            return 0
+        return 1 + int(math.floor(math.log(value / self._smallest, 2)))
+
+    def add(self, value):
+        """Add the specified value to the histogram."""
+        index = self._bucket_index(value)
+        self._bucket_counts[index] = self._bucket_counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        """Return the mean of the values, or None if there are no values."""
+        if not self.count:
+            return None
+        return float(self.total) / self.count
+
+    def percentile(self, fraction):
+        """Return an upper bound on the specified percentile of the values.
+
+        Return the upper bound of the bucket that contains the
+        percentile, or the largest value if it is smaller.
+
+        float fraction - The percentile, as a fraction from 0 to 1.
+        return float - The upper bound, or None if there are no values.
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(fraction * self.count)))
+        seen_count = 0
+        for index in sorted(self._bucket_counts.iterkeys()):
+            seen_count += self._bucket_counts[index]
+            if seen_count >= rank:
+                return min(self.max, self._smallest * 2 ** index)
+        return self.max
+
+    def buckets(self):
+        """Return the non-empty buckets.
+
+        return list<tuple<float, int>> - The pairs consisting of the
+            exclusive upper bound of each non-empty bucket and the number
+            of values in the bucket, in increasing order.
+        """
+        return list([
+            (self._smallest * 2 ** index, self._bucket_counts[index])
+            for index in sorted(self._bucket_counts.iterkeys())])
+
+
+class TraceCollector(Tracer):
+    """A Tracer that aggregates statistics about executions.
+
+    TraceCollector collects histograms of the sizes and durations of the
+    batches of each type of Batcher, and of the durations of the
+    iterations of each generator function, across all of the executions
+    in which we use it.  We identify Batchers by their class names and
+    generator functions by their names.
+
+    Public attributes:
+
+    dict<basestring, int> batch_failure_counts - A map from the names of
+        the Batcher classes to the number of batches that raised
+        exceptions.
+    dict<basestring, Histogram> batch_seconds - A map from the names of
+        the Batcher classes to histograms of the wall-clock durations of
+        their batches, in seconds.
+    dict<basestring, Histogram> batch_sizes - A map from the names of the
+        Batcher classes to histograms of the numbers of operations in
+        their batches.
+    int execute_count - The number of executions.
+    int failed_execute_count - The number of executions that raised
+        exceptions.
+    int generator_exception_count - The number of times a generator
+        raised an exception.
+    dict<basestring, Histogram> generator_seconds - A map from the names
+        of the generator functions to histograms of the wall-clock
+        durations of their iterations, in seconds.
+    int round_count - The number of rounds.
+    """
+
+    # The upper bound of bucket 0 in the histograms of durations, in seconds
+    _SMALLEST_SECONDS = 1e-6
+
+    def __init__(self):
+        self.execute_count = 0
+        self.failed_execute_count = 0
+        self.round_count = 0
+        self.generator_exception_count = 0
+        self.batch_sizes = {}
+        self.batch_seconds = {}
+        self.batch_failure_counts = {}
+        self.generator_seconds = {}
+
+    def execute_started(self):
+        self.execute_count += 1
+
+    def execute_finished(self, exception_info):
+        if exception_info is not None:
+            self.failed_execute_count += 1
+
+    def round_started(self):
+        self.round_count += 1
+
+    def batch_started(self, batcher, operation_count):
+        name = batcher.__class__.__name__
+        histogram = self.batch_sizes.get(name)
+        if histogram is None:
+            histogram = Histogram()
+            self.batch_sizes[name] = histogram
+        histogram.add(operation_count)
+
+    def batch_finished(
+            self, batcher, operation_count, seconds, exception_info):
+        name = batcher.__class__.__name__
+        histogram = self.batch_seconds.get(name)
+        if histogram is None:
+            histogram = Histogram(TraceCollector._SMALLEST_SECONDS)
+            self.batch_seconds[name] = histogram
+        histogram.add(seconds)
+        if exception_info is not None:
+            self.batch_failure_counts[name] = (
+                self.batch_failure_counts.get(name, 0) + 1)
+
+    def generator_stepped(self, generator, seconds):
+        name = generator.gi_code.co_name
+        histogram = self.generator_seconds.get(name)
+        if histogram is None:
+            histogram = Histogram(TraceCollector._SMALLEST_SECONDS)
+            self.generator_seconds[name] = histogram
+        histogram.add(seconds)
+
+    def generator_raised(self, generator, exception_info):
+        self.generator_exception_count += 1
+
+    def format(self):
+        """Return a human-readable summary of the batch statistics.
+
+        return str - A table with one row per Batcher class.
+        """
+        lines = [
+            '{:<30s}{:>9s}{:>10s}{:>10s}{:>10s}{:>10s}{:>10s}'.format(
+                'batcher', 'batches', 'mean size', 'max size', 'p50 ms',
+                'p99 ms', 'failures')]
+        for name in sorted(self.batch_sizes.iterkeys()):
+            sizes = self.batch_sizes[name]
+            seconds = self.batch_seconds.get(name)
+            if seconds is not None and seconds.count:
+                p50_ms = 1000 * seconds.percentile(0.5)
+                p99_ms = 1000 * seconds.percentile(0.99)
+            else:
+                p50_ms = 0
+                p99_ms = 0
+            lines.append(
+                '{:<30s}{:>9d}{:>10.1f}{:>10d}{:>10.2f}{:>10.2f}'
+                '{:>10d}'.format(
+                    name, sizes.count, sizes.mean(), sizes.max, p50_ms,
+                    p99_ms, self.batch_failure_counts.get(name, 0)))
+        return '\n'.join(lines)
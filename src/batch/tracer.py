@@ -0,0 +1,107 @@
+class Tracer(object):
+    """Receives notifications of the events in a BatchExecutor execution.
+
+    We may pass a Tracer to BatchExecutor.execute using the "tracer"
+    keyword argument in order to monitor the execution.  The methods of
+    the base class do nothing, so subclasses only need to override the
+    methods for the events they are interested in.  BatchExecutor only
+    calls a Tracer's methods from the thread that is running the
+    execution.
+
+    A "round" is one step of BatchExecutor's main loop, in which it runs
+    the generators that are ready to run and executes one or more
+    batches, or waits for the results of a batch.
+    """
+
+    def execute_started(self):
+        """Respond to the start of an execution."""
+        pass
+
+    def execute_finished(self, exception_info):
+        """Respond to the end of an execution.
+
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception that ended the execution, as returned by
+            sys.exc_info(), or None if it finished successfully.
+        """
+        pass
+
+    def round_started(self):
+        """Respond to the start of a round."""
+        pass
+
+    def round_finished(self):
+        """Respond to the end of a round."""
+        pass
+
+    def batch_started(self, batcher, operation_count):
+        """Respond to the start of the execution of a batch.
+
+        Batcher batcher - The Batcher for the batch.
+        int operation_count - The number of operations we passed to
+            gen_batch or AsyncBatcher.start_batch.
+        """
+        pass
+
+    def batch_finished(
+            self, batcher, operation_count, seconds, exception_info):
+        """Respond to the end of the execution of a batch.
+
+        Batcher batcher - The Batcher for the batch.
+        int operation_count - The number of operations in the batch.
+        float seconds - The wall-clock time from the start of the batch
+            to the end, in seconds.
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception the batch raised, as returned by
+            sys.exc_info(), or None if it did not raise an exception.
+        """
+        pass
+
+    def generator_stepped(self, generator, seconds):
+        """Respond to one iteration of a generator.
+
+        Generator generator - The generator.  We may obtain the name of
+            its function using generator.gi_code.co_name.
+        float seconds - The wall-clock duration of the iteration, as
+            measured using timeit.default_timer.  This includes any time
+            the generator spent blocking or waiting for other threads.
+        """
+        pass
+
+    def generator_yielded(self, generator, generators_and_operations):
+        """Respond to a generator yielding generators and operations.
+
+        This is not called when a generator yields a GenResult.
+
+        Generator generator - The generator.
+        list<object> generators_and_operations - The generators and
+            BatchableOperations the generator yielded.  If it yielded a
+            single generator or BatchableOperation, this is a list
+            containing it.
+        """
+        pass
+
+    def nested_execute_started(self, generator):
+        """Respond to a generator starting a nested execution.
+
+        BatchExecutor calls this when one of the execution's generators
+        calls BatchExecutor.execute or a similar method during one of
+        its iterations.  This is called on the thread that started the
+        nested execution, which may differ from the thread that is
+        running the outer execution.
+
+        Generator generator - The generator.
+        """
+        pass
+
+    def generator_raised(self, generator, exception_info):
+        """Respond to a generator raising an exception.
+
+        This includes exceptions that the generator received from the
+        generators and BatchableOperations it yielded and did not catch.
+
+        Generator generator - The generator.
+        tuple<type, mixed, traceback> exception_info - Information about
+            the exception, as returned by sys.exc_info().
+        """
+        pass